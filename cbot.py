@@ -1,10 +1,8 @@
 import discord
 from discord.ext import commands
 
-import default_config
-from modules import bot_utils, utils, messaging, misc, checks
+from modules import bot_utils, messaging, misc, checks, translation, scheduler, message_router, analytics, cog_loader, log_queue, config_store, gateway
 
-import logging
 import os
 import traceback
 import glob
@@ -12,25 +10,13 @@ import yaml
 import sys
 import atexit
 import psutil
-import importlib
 import aiohttp
 import sqlite3
 from random import randint
 from datetime import datetime
-from googletrans import Translator
-
-# set up logger
-logger = logging.getLogger("discord")
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename="discord.log", encoding="utf-8", mode="w")
-handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s"))
 
 class CBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix="!",
-                         description="CBot rewrite",
-                         intents=discord.Intents.all()) # TODO: ownerid here, help formatter that DMs help message
-
         self.source_url = "https://github.com/FFrost/CBot"
         
         self.bot_restart_arg = "-restarted"
@@ -78,50 +64,76 @@ class CBot(commands.Bot):
 
         self.get_token()
 
-        self.CONFIG = {}
         self.CONFIG_PATH = self.REAL_PATH + "/config.yml"
-        
-        self.load_config()
+
+        # the current config is a snapshot that's replaced when it changes, use self.CONFIG to read it
+        self.config_store = config_store.ConfigStore(self, self.CONFIG_PATH)
+        self.config_store.load()
+
+        # what we get from discord and what's kept in memory is set in the config,
+        # so it has to be loaded before connecting
+        options = self.CONFIG["gateway"]
+        intents = gateway.create_intents(options)
+
+        super().__init__(command_prefix="!",
+                         description="CBot rewrite",
+                         intents=intents,
+                         member_cache_flags=gateway.create_member_cache_flags(options, intents),
+                         max_messages=(options["message_cache_size"] or None),
+                         chunk_guilds_at_startup=options["chunk_guilds_at_startup"]) # TODO: ownerid here, help formatter that DMs help message
+
+        # counts events for !cmd gateway
+        self.event_counter = gateway.EventCounter()
+
+        # logs are written by a background thread
+        self.log_queue = log_queue.LogQueue(self.CONFIG["logging"], f"{self.REAL_PATH}/discord.log", self.ERROR_FILEPATH)
+        self.log_queue.start()
 
         # connect to database
         self.DATABASE_FILEPATH = f"{self.REAL_PATH}/cbot_database.db"
-        self.db = sqlite3.connect(self.DATABASE_FILEPATH)
+        # the analytics module writes from its own thread
+        self.db = sqlite3.connect(self.DATABASE_FILEPATH, check_same_thread=False)
 
         # remove any leftover files in the youtubedl download directory
         self.cleanup_youtubedl_directory()
 
         checks.owner_id = self.dev_id
 
-        self.session = aiohttp.ClientSession(loop=self.loop)
+        # pooled http session shared by every cog
+        self.session = self.create_http_session()
         
         print("Loading modules...")
         
         self.bot_utils = bot_utils.BotUtils(self)
         self.messaging = messaging.Messaging(self)
         self.misc = misc.Misc(self)
+
+        # runs timed events for the cogs (expiring searches, closing votes, etc)
+        self.scheduler = scheduler.Scheduler(self)
+
+        # passes messages to the cogs that react to links and keywords in them
+        self.message_router = message_router.MessageRouter(self)
+
+        # records how long commands take for !stats
+        options = self.CONFIG["analytics"]
+        self.analytics = analytics.CommandAnalytics(self,
+                                                    self.db,
+                                                    options["flush_interval"],
+                                                    options["batch_size"],
+                                                    options["max_buffered"],
+                                                    options["retention_days"])
         
         print("Loaded modules")
         
         print("Loading cogs...")
         
-        self.loaded_cogs = {}
-        
         self.cog_path = self.REAL_PATH + "/cogs/"
-        cogs = glob.glob(self.cog_path + "*.py")
-              
-        # load all cogs from the directory
-        for i, path in enumerate(cogs):
-            cog_name = os.path.basename(path).replace(".py", "")
-            ext = "cogs." + cog_name
-            
-            try:
-                self.load_extension(ext)
-            except Exception as e:
-                print("\tFailed to load cog \"{}\" ({})".format(ext, e))
-                self.loaded_cogs[cog_name] = {"ext": ext, "loaded": False}
-            else:
-                print("\tLoaded cog {}/{}: {}".format(i + 1, len(cogs), ext))
-                self.loaded_cogs[cog_name] = {"ext": ext, "loaded": True}
+
+        # load all cogs from the directory, or only add their commands if they're loaded lazily
+        self.cog_loader = cog_loader.CogLoader(self, self.cog_path, self.CONFIG["cogs"]["lazy_load"])
+        self.cog_loader.load_startup_cogs()
+
+        self.loaded_cogs = self.cog_loader.cogs
                 
         print("Finished loading cogs")
         
@@ -129,10 +141,14 @@ class CBot(commands.Bot):
 
         atexit.register(self.on_exit)
 
-        self.translator = Translator()
+        # googletrans is blocking, so translations are run in threads
+        options = self.CONFIG["translation"]
+        self.translator = translation.TranslationService(self.loop, options["workers"], options["cache_size"])
 
     # called when the script terminates
     def on_exit(self):
+        self.log_queue.stop()
+
         print("Unlinking PID file...")
         os.unlink(self.PID_FILEPATH)
         
@@ -183,97 +199,25 @@ class CBot(commands.Bot):
                 print("Failed to read token from file, please reenter it")
                 self.save_token()
 
-    def get_all_keys(self, d: dict, parent: str=""):
-        keys = {}
-
-        for k, v in d.items():
-            if (isinstance(v, dict) and k not in keys):
-                keys.update({k: {}})
-                keys.update(self.get_all_keys(v, parent=f"{k}."))
-
-            keys.update({f"{parent}{k}": v})
-
-        return keys
-
-    # creates a config file if it doesn't exist,
-    # updates it if needed,
-    # and loads it
-    def load_config(self):
-        importlib.reload(default_config)
-
-        data = default_config.DEFAULT_CONFIG
-
-        if (not os.path.exists(self.CONFIG_PATH)):
-            print("Saving config file to {}".format(self.CONFIG_PATH))
-        else:
-            # saved config exists, read it
-            disk_config = self.get_config()
-
-            if (not disk_config):
-                print("Failed to load disk config, falling back to default config")
-                self.CONFIG = default_config.DEFAULT_CONFIG
-                return
-
-            # check if the saved config is up to date (do the keys match?)
-            # if they do, no need to update it
-            disk_dicts = self.get_all_keys(disk_config)
-            default_dicts = self.get_all_keys(data)
-
-            if (set(default_dicts.keys()) == set(disk_dicts.keys())):
-                self.CONFIG = disk_config
-                print("Loaded config from file")
-                return
-
-            # it's outdated
-            print("Updating config....")
-
-            # update the new config with the old values if they exist
-            for k, v in disk_dicts.items():
-                # if the disk config has an outdated key, discard it
-                if (k not in default_dicts.keys()):
-                    continue
-                
-                # otherwise, try to save the old value
-                if ("." in k):
-                    try:
-                        utils.nested_set(data, k.split("."), v)
-                    except KeyError as e:
-                        print(e)
-                        continue
-                else:
-                    data[k] = v
-        
-        with open(self.CONFIG_PATH, "w") as f:
-            yaml.dump(data, f, default_flow_style=False)
-
-        self.CONFIG = data
-
-        print("Saved config")
+    # creates the http session used for all outbound requests
+    # connections are kept alive and reused, and dns lookups are cached
+    # output: the session
+    def create_http_session(self) -> aiohttp.ClientSession:
+        options = self.CONFIG["http"]
 
-    # gets the config from disk
-    def get_config(self):
-        try:
-            with open(self.CONFIG_PATH, "r") as f:
-                return yaml.safe_load(f)
+        connector = aiohttp.TCPConnector(limit=options["connection_limit"],
+                                         limit_per_host=options["connection_limit_per_host"],
+                                         keepalive_timeout=options["keepalive_timeout"],
+                                         use_dns_cache=True,
+                                         ttl_dns_cache=options["dns_cache_ttl"],
+                                         loop=self.loop)
 
-        except yaml.scanner.ScannerError as e:
-            print("Config file could not be loaded (scanner error), make sure config.yml is formatted properly: {}".format(e))
-            return None
+        timeout = aiohttp.ClientTimeout(total=options["timeout"])
 
-        except Exception as e:
-            print("Config file could not be loaded (general error): {}".format(e))
-            return None
+        # time spent in requests is recorded for each command
+        trace_configs = [analytics.create_trace_config()]
 
-    def save_config(self) -> bool:
-        try:
-            with open(self.CONFIG_PATH, "w") as f:
-                yaml.dump(self.CONFIG, f, default_flow_style=False)
-
-            return True
-        except Exception as e:
-            print(e)
-        
-        return False
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=trace_configs, loop=self.loop)
 
     def cleanup_youtubedl_directory(self):
         path = self.CONFIG["youtube-dl"]["download_directory"]
@@ -297,6 +241,9 @@ class CBot(commands.Bot):
         if (not hasattr(self, "uptime")):
             self.uptime = datetime.utcnow()
 
+        # this is a new gateway session, so we may have missed messages while disconnected
+        self.bot_utils.message_index.clear()
+
         print("Logged in as {name}#{disc} [{uid}]".format(name=self.user.name, disc=self.user.discriminator, uid=self.user.id))
         
         await self.change_presence(activity=discord.Game(name="!help for info"))
@@ -311,6 +258,10 @@ class CBot(commands.Bot):
 
         self.invite_url = f"https://discordapp.com/oauth2/authorize?client_id={self.user.id}&scope=bot"
         print(f"Invite url: {self.invite_url}")
+
+        # load the cogs that haven't been used yet in the background
+        if (self.cog_loader.deferred and self.CONFIG["cogs"]["warm_up"]):
+            self.loop.create_task(self.cog_loader.warm_up(self.CONFIG["cogs"]["warm_up_delay"]))
     
     # print info about where the bot is
     async def print_bot_info(self):
@@ -340,7 +291,10 @@ class CBot(commands.Bot):
             
         if (isinstance(error, commands.CommandNotFound)):
             return
-        elif (isinstance(error, checks.NoVoiceChannel)):
+
+        self.analytics.finish(ctx, self.get_error_outcome(error))
+
+        if (isinstance(error, checks.NoVoiceChannel)):
             await ctx.send(f"{ctx.author.mention} You must be in a voice channel to use this command")
             return
         elif (isinstance(error, commands.CheckFailure)):
@@ -355,6 +309,49 @@ class CBot(commands.Bot):
             
         await ctx.send(f"{ctx.author.mention} {error}")
     
+    # output: how a failed command ended, for !stats
+    def get_error_outcome(self, error: commands.CommandError) -> str:
+        if (isinstance(error, commands.CheckFailure)):
+            return "check_failed"
+        elif (isinstance(error, commands.CommandOnCooldown)):
+            return "cooldown"
+        elif (isinstance(error, commands.UserInputError)):
+            return "bad_input"
+
+        return "error"
+
+    # every event passes through here
+    def dispatch(self, event_name, *args, **kwargs):
+        self.event_counter.add(event_name)
+        super().dispatch(event_name, *args, **kwargs)
+
+    # commands are timed from here so checks and cooldowns are included
+    async def invoke(self, ctx):
+        # lazily loaded cogs are loaded the first time one of their commands is used
+        cog_name = self.cog_loader.get_stub_cog(ctx.command) if (ctx.command is not None) else None
+
+        if (cog_name is not None):
+            try:
+                await self.cog_loader.load(cog_name)
+            except Exception as e:
+                self.bot_utils.log_error_to_file(e, prefix="CogLoader")
+                await ctx.send(f"{ctx.author.mention} Failed to load `{cog_name}`")
+                return
+
+            # parse the message again now that the real command exists
+            ctx = await self.get_context(ctx.message)
+
+        if (ctx.command is None):
+            await super().invoke(ctx)
+            return
+
+        self.analytics.start(ctx)
+
+        try:
+            await super().invoke(ctx)
+        finally:
+            analytics.current_record.set(None)
+
     # only output command messages
     async def on_command(self, ctx):
         if (ctx.command.name == "eval" and checks.is_owner(ctx)):
@@ -362,12 +359,14 @@ class CBot(commands.Bot):
 
         await self.bot_utils.output_log(ctx.message)
             
-    # TODO: track completed commands for !stats
     async def on_command_completion(self, ctx):
-        pass
+        self.analytics.finish(ctx, "success")
     
     async def on_message(self, message):
         try:
+            # remember every message, including our own, for the find_last_* functions
+            self.bot_utils.message_index.add(message)
+
             if (not message.content or not message.author):
                 return
             
@@ -380,7 +379,8 @@ class CBot(commands.Bot):
             if (message.author.bot):
                 return
                 
-            # TODO: reactions will go here
+            # link embeds, keyword replies, etc
+            self.message_router.route(message)
             
             # process commands
             await self.process_commands(message)
@@ -394,8 +394,48 @@ class CBot(commands.Bot):
         except Exception as e:
             await self.messaging.error_alert(e)
                 
+    # keep the message index up to date, raw events are used so messages that aren't in the client's cache are updated too
+    async def on_raw_message_edit(self, payload):
+        self.bot_utils.message_index.edit(payload)
+
+    async def on_raw_message_delete(self, payload):
+        self.bot_utils.message_index.delete(payload.channel_id, [payload.message_id])
+        self.messaging.unregister_reaction_handler(payload.message_id)
+
+    async def on_raw_bulk_message_delete(self, payload):
+        self.bot_utils.message_index.delete(payload.channel_id, payload.message_ids)
+
+        for message_id in payload.message_ids:
+            self.messaging.unregister_reaction_handler(message_id)
+                
+    # reactions are only handled for messages registered with the messaging module
+    async def on_raw_reaction_add(self, payload):
+        await self.messaging.dispatch_reaction(payload)
+
+    async def on_raw_reaction_remove(self, payload):
+        await self.messaging.dispatch_reaction(payload)
+
+    async def close(self):
+        await super().close()
+
+        # write any command stats that haven't been saved yet
+        await self.analytics.close()
+
+        self.scheduler.clear()
+        self.translator.shutdown()
+
+        if (not self.session.closed):
+            await self.session.close()
+
+    # the current config snapshot, read it once and use that if several values are needed together
+    @property
+    def CONFIG(self) -> config_store.ConfigSnapshot:
+        return self.config_store.snapshot
+
     def run(self):
         super().run(self.token)
         
-bot = CBot()
-bot.run()
+# the image workers import this file when they start, only run the bot when it's run directly
+if (__name__ == "__main__"):
+    bot = CBot()
+    bot.run()
@@ -3,7 +3,6 @@ from discord.ext import commands
 
 from modules import utils
 
-import aiohttp
 import re
 from lxml import html
 from typing import Optional
@@ -14,28 +13,42 @@ class Amazon(commands.Cog):
 
         self.amazon_url_regex = re.compile(r"(https?:\/\/)?(www\.)?(amazon)\.(com|co\.uk|ca|de|fr|co\.jp|br|at|it|es|cn|nl|in)(\.(mx|au))?\/(\S)+", re.IGNORECASE)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if (not self.bot.CONFIG["embeds"]["enabled"] or not self.bot.CONFIG["embeds"]["amazon"]):
-            return
+        self.embeds_enabled = False
 
-        try:
-            if (not message.content or not message.author):
-                return
+        self.apply_config(self.bot.CONFIG)
+        self.bot.config_store.subscribe(self.apply_config, "embeds")
+
+        # only messages with amazon links are passed to on_amazon_link
+        self.bot.message_router.add_route("Amazon",
+                                          r"amazon\.(?:com|co\.uk|ca|de|fr|co\.jp|br|at|it|es|cn|nl|in)",
+                                          self.on_amazon_link,
+                                          enabled=lambda: self.embeds_enabled)
+
+    def cog_unload(self):
+        self.bot.message_router.remove_route("Amazon")
+        self.bot.config_store.unsubscribe(self.apply_config)
 
-            url = self.has_amazon_url(message.content)
+    # keeps the config values used for every message up to date
+    # input: config, the new config
+    #        changes, what changed, unused
+    def apply_config(self, config, changes=None):
+        self.embeds_enabled = config.embeds.enabled and config.embeds.amazon
 
-            if (url):
-                embed = await self.create_amazon_embed(message.author, url)
+    # embeds amazon items
+    # input: message, the message with the link
+    #        content, lowercased content of the message
+    async def on_amazon_link(self, message: discord.Message, content: str):
+        # item urls are case sensitive, so use the original content
+        url = self.has_amazon_url(message.content)
 
-                if (embed):
-                    try:
-                        await message.channel.send(embed=embed)
-                    except discord.errors.HTTPException:
-                        pass
+        if (url):
+            embed = await self.create_amazon_embed(message.author, url)
 
-        except Exception as e:
-            self.bot.bot_utils.log_error_to_file(e, prefix="Amazon")
+            if (embed):
+                try:
+                    await message.channel.send(embed=embed)
+                except discord.errors.HTTPException:
+                    pass
 
     def has_amazon_url(self, content: str) -> Optional[str]:
         try:
@@ -47,12 +60,11 @@ class Amazon(commands.Cog):
 
     async def get_item_page(self, url: str) -> Optional[str]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as r:
-                    if (r.status != 200):
-                        return None
+            async with self.bot.session.get(url) as r:
+                if (r.status != 200):
+                    return None
 
-                    return await r.text()
+                return await r.text()
 
         except Exception:
             return None
@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 
-from modules import checks, utils
+from modules import checks, utils, config_store
 
 import json
 import strconv
@@ -25,11 +25,11 @@ class Config(commands.Cog):
         await ctx.trigger_typing()
     
         try:
-            self.bot.load_config()
+            changes = await self.bot.config_store.reload()
         except Exception as e:
             await ctx.send(f"Failed to reload config: `{e}`")
         else:
-            await ctx.send("Reloaded config")
+            await ctx.send(f"Reloaded config ({utils.pluralize(len(changes), 'change')})")
 
     @cfg.command(description="reports the bot's current config (MAY CONTAIN SENSITIVE INFO)",
                   brief="reports the bot's current config (MAY CONTAIN SENSITIVE INFO)",
@@ -39,14 +39,14 @@ class Config(commands.Cog):
             await ctx.send(f"{ctx.author.mention} This command can only be used in a private message")
             return
 
-        data = json.dumps(self.bot.CONFIG, indent=2)
+        data = json.dumps(self.bot.CONFIG.to_dict(), indent=2)
 
         await ctx.send(f"```\n{data}\n```")
 
-    @cfg.command(description="edits a value in the config and reloads it\n" \
+    @cfg.command(description="edits a value in the config and saves it\n" \
                              "to edit a subvalue (embeds -> enabled), type the key as embeds.enabled\n" \
                              "ex: !cfg edit embeds.enabled False",
-                 brief="edits a value in the config and reloads it")
+                 brief="edits a value in the config and saves it")
     async def edit(self, ctx, key: str, *, value):
         # convert the string to the python type
         try:
@@ -55,29 +55,19 @@ class Config(commands.Cog):
             await ctx.send(f"Invalid value `{value}`")
             return
 
-        key_list = key.split(".")
+        # set the value, only this key changes and it's saved to disk
+        try:
+            old_val = config_store.get_path(self.bot.CONFIG, key)
+            await self.bot.config_store.patch({key: literal_val})
 
-        # check if the key exists
-        d = self.bot.CONFIG.copy()
+        except KeyError:
+            await ctx.send(f"Key `{key}` not found")
 
-        for k in key_list:
-            try:
-                d = d[k]
-            except KeyError:
-                await ctx.send(f"Key `{key}` not found")
-                return
-        
-        # set value
-        old_val = utils.nested_set(self.bot.CONFIG, key_list, literal_val)
+        except Exception as e:
+            await ctx.send(f"An error occured saving the config: `{e}`")
 
-        # save to disk
-        if (self.bot.save_config()):
-            await ctx.send(f"Set `{key}`: `{literal_val}` (old value: `{old_val}`)")
         else:
-            await ctx.send(f"An error occured saving the config")
-
-        # reload
-        await ctx.invoke(self.reload)
+            await ctx.send(f"Set `{key}`: `{literal_val}` (old value: `{old_val}`)")
 
 def setup(bot):
     bot.add_cog(Config(bot))
@@ -4,7 +4,6 @@ from discord.ext import commands
 from modules import utils
 
 import asyncio
-import aiohttp
 from http.client import responses
 from typing import Optional
 
@@ -20,12 +19,11 @@ class Fortnite(commands.Cog):
         url = "https://api.fortnitetracker.com/v1/profile/{platform}/{name}".format(platform=platform, name=name)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as r:
-                    if (r.status != 200):
-                        return r.status
+            async with self.bot.session.get(url, headers=headers) as r:
+                if (r.status != 200):
+                    return r.status
 
-                    return await r.json()
+                return await r.json()
 
         except Exception:
             return None
@@ -5,8 +5,6 @@ from modules import utils, checks
 
 import re
 import random
-import aiohttp
-import asyncio
 from random import randint, uniform
 from lxml import html
 from urllib.parse import quote
@@ -125,34 +123,33 @@ class Fun(commands.Cog):
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/43.0.2357.134 Safari/537.36"}
             url = "https://images.google.com/searchbyimage?image_url={}&encoded_image=&image_content=&filename=&hl=en".format(quote(query))
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as r:
-                    if (r.status != 200):
-                        await ctx.send(f"{ctx.author.mention} Query for `{query}` failed with status code `{r.status} ({responses[r.status]})` (maybe try again)")
-                        return
-                    
-                    text = await r.text()
+            async with self.bot.session.get(url, headers=headers) as r:
+                if (r.status != 200):
+                    await ctx.send(f"{ctx.author.mention} Query for `{query}` failed with status code `{r.status} ({responses[r.status]})` (maybe try again)")
+                    return
+                
+                text = await r.text()
         
-                    tree = html.fromstring(text)
-                    
-                    path = tree.xpath("//div[@class='_hUb']/a/text()")
+                tree = html.fromstring(text)
+                
+                path = tree.xpath("//div[@class='_hUb']/a/text()")
+                
+                if (not path):
+                    await ctx.send(f"{ctx.author.mention} Query for `{query}` failed (maybe try again)")
+                    return
                     
-                    if (not path):
-                        await ctx.send(f"{ctx.author.mention} Query for `{query}` failed (maybe try again)")
-                        return
-                        
-                    if (isinstance(path, list)):
-                        path = path[0].strip()
-                    elif (isinstance(path, str)):
-                        path = path.strip()
-                        
-                    embed = utils.create_image_embed(message.author,
-                                                            title="Best guess for this image:",
-                                                            description=path,
-                                                            thumbnail=query,
-                                                            color=discord.Color.green())
+                if (isinstance(path, list)):
+                    path = path[0].strip()
+                elif (isinstance(path, str)):
+                    path = path.strip()
                     
-                    await ctx.send(embed=embed)
+                embed = utils.create_image_embed(message.author,
+                                                        title="Best guess for this image:",
+                                                        description=path,
+                                                        thumbnail=query,
+                                                        color=discord.Color.green())
+                
+                await ctx.send(embed=embed)
         
     @commands.command(description="ask the magic 8 ball something",
                       brief="ask the magic 8 ball something",
@@ -167,15 +164,10 @@ class Fun(commands.Cog):
             emoji = "\N{Clockwise Rightwards and Leftwards Open Circle Arrows}"
             await msg.add_reaction(emoji)
 
-            def check(reaction, user):
-                return (user == ctx.author and str(reaction.emoji) == emoji)
-
             try:
-                await self.bot.wait_for("reaction_add", timeout=60.0, check=check)
-                choice = random.choice([s for s in self.magic8ball_choices if s[1] != "maybe"])
-                await msg.edit(content=f"{ctx.author.mention} {choice[0]}")
-            except asyncio.TimeoutError:
-                pass
+                if (await self.bot.messaging.wait_for_reaction(msg, ctx.author, emoji, timeout=60.0)):
+                    choice = random.choice([s for s in self.magic8ball_choices if s[1] != "maybe"])
+                    await msg.edit(content=f"{ctx.author.mention} {choice[0]}")
             finally:
                 await msg.clear_reaction(emoji)
 
@@ -300,7 +292,7 @@ class Fun(commands.Cog):
             text = self.mention_regex.sub("", text)
 
             # save original language
-            source_lang_code = self.bot.translator.detect(text).lang
+            source_lang_code = await self.bot.translator.detect(text)
 
             if (source_lang_code not in list(LANGUAGES.keys())):
                 await ctx.send(f"{ctx.author.mention} Can't detect language, defaulting source language to English")
@@ -314,7 +306,7 @@ class Fun(commands.Cog):
                 dest_lang_code = random.choice(list(LANGUAGES.keys()))
 
                 try:
-                    result = self.bot.translator.translate(text, dest=dest_lang_code)
+                    result = await self.bot.translator.translate(text, dest=dest_lang_code)
                     text = result.text
                     languages.append(result.dest)
                 except Exception:
@@ -322,7 +314,7 @@ class Fun(commands.Cog):
                     return
 
             # translate it back to the original language
-            result = self.bot.translator.translate(text, dest=source_lang_code)
+            result = await self.bot.translator.translate(text, dest=source_lang_code)
             text = result.text
             languages.append(source_lang_code)
 
@@ -363,18 +355,10 @@ class Fun(commands.Cog):
         if True:
             # remove discord mentions
             word = self.mention_regex.sub("", word)
-            ret = {}
 
-            for lang_code in LANGUAGES.keys():
-                try:
-                    result = self.bot.translator.translate(word, dest=lang_code)
-                    if (not result or not result.text):
-                        continue
-
-                    ret[lang_code] = result.text
-                except Exception as e:
-                    print(e)
-                    continue
+            # translations run in parallel, any that fail are left out
+            results = await self.bot.translator.translate_many(word, list(LANGUAGES.keys()))
+            ret = {lang_code: result.text for lang_code, result in results.items()}
 
             if (not ret):
                 await ctx.send("Failed to get translations, try again later")
@@ -1,26 +1,27 @@
 import discord
 from discord.ext import commands
 
-from modules import enums, utils
+from modules import enums, utils, workers, image_ops, image_search, cache, download_cache, image_header
 
-import os
+import asyncio
+import io
 import time
 import ipaddress
 import json
-import tempfile
-import asyncio
+import hashlib
 import aiohttp
-import pytesseract
 from lxml import html
 from urllib.parse import quote
 from collections import OrderedDict
-from PIL import Image as Img
-from typing import Optional, Union
+from typing import Optional, Union, Callable, Tuple, Any, List
 
 liquid_command_enabled = True
 
+# bytes to read from an image download at a time
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 try:
-    import wand, wand.color, wand.drawing
+    import wand, wand.color
 
 except Exception as e:
     print(f"{e}\nDisabling liquid command.")
@@ -32,10 +33,80 @@ class Image(commands.Cog):
 
         self.SEARCH_CACHE = OrderedDict()
 
-        self.remove_inactive_image_searches_task = self.bot.loop.create_task(self.remove_inactive_image_searches())
+        search_options = self.bot.CONFIG["image_search"]
+        processing_options = self.bot.CONFIG["image_processing"]
+        cache_options = self.bot.CONFIG["download_cache"]
+
+        # image search results are checked concurrently, this limits how many are checked at once across every search
+        self.search_validation_slots = asyncio.Semaphore(search_options["max_concurrent_validations"])
+
+        # query -> results of the search, from export(), shared by every guild so repeated searches skip google and checking results
+        self.search_results_cache = cache.LRUCache(search_options["results_cache_size"], ttl=search_options["results_cache_ttl"])
+
+        # downloaded images larger than this are written to a temp file instead of being kept in memory
+        self.spill_to_disk_size = int(processing_options["spill_to_disk_size"] * 1024 * 1024)
+
+        # downloaded images are kept so commands on the same image don't download it again
+        self.download_cache = download_cache.DownloadCache(memory_size=int(cache_options["memory_size"] * 1024 * 1024),
+                                                           disk_size=int(cache_options["disk_size"] * 1024 * 1024),
+                                                           max_urls=cache_options["max_urls"],
+                                                           revalidate_after=cache_options["revalidate_after"])
+
+        # (content hash of the image, transform, arguments) -> result of the transform, so the same edit isn't done twice
+        self.transform_cache = cache.SizedLRUCache(int(processing_options["transform_cache_size"] * 1024 * 1024))
+
+        # image transforms are cpu heavy, so they run in worker processes instead of on the event loop
+        self.workers = workers.WorkerPool(self.bot.loop,
+                                          max_workers=processing_options["workers"],
+                                          max_queued=processing_options["max_queued_jobs"],
+                                          job_timeout=processing_options["job_timeout"],
+                                          memory_limit=processing_options["worker_memory_limit"] * 1024 * 1024,
+                                          preload=[image_ops.__name__])
 
     def cog_unload(self):
-        self.remove_inactive_image_searches_task.cancel()
+        for cached_msg in self.SEARCH_CACHE.values():
+            cached_msg["expiry"].cancel()
+            cached_msg["search"].close()
+
+        self.workers.shutdown()
+        self.download_cache.close()
+
+    # runs an image transform from image_ops in a worker process, results are cached so the same edit of the same image is only done once
+    # only images in the download cache are cached, their content hash is already known
+    # input: func, the transform to run
+    #        source, the image
+    #        args, other arguments to pass to the transform
+    # output: return code of the transform and its result
+    async def run_transform(self, func: Callable, source: image_ops.ImageSource, *args) -> Tuple[enums.ImageCodes, Any]:
+        digest = self.download_cache.get_digest(source)
+        key = (digest, func.__name__, args)
+
+        if (digest is not None):
+            result = self.transform_cache.get(key)
+
+            if (result is not None):
+                return enums.ImageCodes.SUCCESS, result
+
+        try:
+            code, result = await self.workers.run(func, source, *args)
+
+        except workers.PoolBusy:
+            return enums.ImageCodes.BUSY, None
+
+        except workers.JobTimeout:
+            return enums.ImageCodes.TIMED_OUT, None
+
+        except Exception as e:
+            self.bot.bot_utils.log_error_to_file(e, prefix="Image")
+            return enums.ImageCodes.MISC_ERROR, None
+
+        if (digest is not None and code == enums.ImageCodes.SUCCESS):
+            # an edited image and its extension, or text
+            size = len(result[0]) if (isinstance(result, tuple)) else len(result)
+
+            self.transform_cache.set(key, result, size)
+
+        return code, result
 
     # find images in message or attachments and pass to liquify function
     @commands.command(description="liquidizes an image",
@@ -62,12 +133,12 @@ class Image(commands.Cog):
             msg = await ctx.send(f"{ctx.author.mention} Liquidizing image...")
             
             async with ctx.channel.typing():
-                path = await self.download_image(url)
+                source = await self.download_image(url)
                 
-                if (isinstance(path, enums.ImageCodes)):
-                    await self.image_error_message(message, path, url)
+                if (isinstance(source, enums.ImageCodes)):
+                    await self.image_error_message(message, source, url)
                 else:
-                    code = await self.do_magic(ctx, path)
+                    code = await self.do_magic(ctx, source)
                     
                     if (code != enums.ImageCodes.SUCCESS):
                         await self.image_error_message(message, code, url)
@@ -80,8 +151,8 @@ class Image(commands.Cog):
             
     # finds the last image sent from a message
     # input: message, the message the user sent and where to start the search
-    # output: path to the downloaded file or None if the download failed
-    async def find_and_download_image(self, message: discord.Message) -> Optional[str]:
+    # output: the downloaded image or None if the download failed
+    async def find_and_download_image(self, message: discord.Message) -> Optional[image_ops.ImageSource]:
         url = None
 
         if (message.attachments):
@@ -95,41 +166,34 @@ class Image(commands.Cog):
         if (not url):
             return None
         
-        path = await self.download_image(url)
+        source = await self.download_image(url)
             
-        if (isinstance(path, enums.ImageCodes)):
-            await self.image_error_message(message, path, url)
+        if (isinstance(source, enums.ImageCodes)):
+            await self.image_error_message(message, source, url)
             return None
         
-        return path
-        
-    # save an image file with a new filename and upload it to a discord channel
-    # input: message, command message
-    #        path, path to the original downloaded file
-    #        image, edited image file currently open
-    #        url, the url of the original image that was downloaded
-    async def save_and_upload(self, message: discord.Message, path: str, image: Img, url: str) -> None:
-        file_path = os.path.splitext(path)[0]
-        edited_file_path = file_path + "_edited.png"
-        
-        # now save the magickd image
-        image.save(edited_file_path, format="PNG")
-        
-        # upload liquidized image
-        if (message.channel.permissions_for(message.author).attach_files):
-            await message.channel.send(file=discord.File(edited_file_path))
-        else:
-            utils.remove_file_safe(path)
-            utils.remove_file_safe(edited_file_path)
-            await self.image_error_message(message, enums.ImageCodes.NO_PERMISSIONS, url)
-            return
-        
-        # just in case
-        await asyncio.sleep(1)
+        return source
+
+    # frees a downloaded image, only images that spilled over to a temp file need anything done
+    # input: source, the downloaded image
+    def discard_image(self, source: Optional[image_ops.ImageSource]) -> None:
+        self.download_cache.release(source)
         
-        # delete leftover file(s)
-        utils.remove_file_safe(path)
-        utils.remove_file_safe(edited_file_path)
+    # upload an edited image to a discord channel straight from memory
+    # input: channel, channel to upload the image to
+    #        result, the encoded image and its extension from an image_ops transform
+    # output: return code of the upload
+    async def upload_edited_image(self, channel: discord.abc.Messageable, result: Tuple[bytes, str]) -> enums.ImageCodes:
+        me = channel.guild.me if (getattr(channel, "guild", None)) else self.bot.user
+
+        if (not channel.permissions_for(me).attach_files):
+            return enums.ImageCodes.NO_PERMISSIONS
+
+        data, ext = result
+
+        await channel.send(file=discord.File(io.BytesIO(data), filename=f"image.{ext}"))
+
+        return enums.ImageCodes.SUCCESS
             
     # message the user an error if liquidizing fails
     # input: message, message to reply to
@@ -148,86 +212,131 @@ class Image(commands.Cog):
             await message.channel.send(f"{message.author.mention} Failed to download image")
         elif (code == enums.ImageCodes.NO_PERMISSIONS):
             await message.channel.send(f"{message.author.mention} Missing attach file permissions, can't upload image file")
+        elif (code == enums.ImageCodes.TIMED_OUT):
+            await message.channel.send(f"{message.author.mention} Image took too long to process")
+        elif (code == enums.ImageCodes.BUSY):
+            await message.channel.send(f"{message.author.mention} Too many images are being processed right now, try again in a bit")
     
-    # download an image from a url and save it as a temp file
-    # input: url, image to download
-    #        simulate, should the image be downloaded or only checked to see if it's valid
-    # output: if successful: string; path to temp file;
-    #         if unsuccessful: ImageCodes; error code
-    async def download_image(self, url: str, simulate: bool = False) -> Union[str, enums.ImageCodes]:
+    # checks for private ips and adds a scheme to a url
+    # input: url, the url
+    # output: the url to request or None if it isn't allowed
+    @staticmethod
+    def prepare_image_url(url: str) -> Optional[str]:
         # check for private ip
         try:
             ip = ipaddress.ip_address(url)
             
             if (ip.is_private):
-                return enums.ImageCodes.BAD_URL
+                return None
             
         except Exception: # if it's not an ip (i.e. an actual url like a website)
             pass
         
         if (not url.startswith("http")):
             url = "http://" + url
+
+        return url
+
+    # checks a response's headers to see if it's an image discord can embed
+    # input: r, the response
+    #        allow_partial, is a 206 response to a range request ok, the size is read from Content-Range then
+    #        require_length, if the size has to be known, otherwise it's checked while the body is read
+    # output: return code and the image's extension if it's valid
+    @staticmethod
+    def check_image_headers(r: aiohttp.ClientResponse, allow_partial: bool = False, require_length: bool = True) -> Tuple[enums.ImageCodes, Optional[str]]:
+        content_type = r.headers.get("Content-Type")
+
+        if (r.status == 206 and allow_partial):
+            # bytes 0-0/12345, or bytes 0-0/* if the size isn't known
+            content_length = r.headers.get("Content-Range", "").rpartition("/")[2]
+
+            if (content_length == "*"):
+                content_length = None
+        elif (r.status == 200):
+            content_length = r.headers.get("Content-Length")
+        else:
+            return enums.ImageCodes.BAD_URL, None
+
+        # check if empty file, chunked responses don't have a length
+        if (content_length is not None or require_length):
+            try:
+                content_length = int(content_length)
+            except (TypeError, ValueError):
+                return enums.ImageCodes.BAD_URL, None
+
+            if (content_length < 1):
+                return enums.ImageCodes.BAD_URL, None
+            elif (content_length > enums.DISCORD_MAX_FILESIZE):
+                return enums.ImageCodes.MAX_FILESIZE, None
+
+        # check for file type
+        if (not content_type or "/" not in content_type):
+            return enums.ImageCodes.BAD_URL, None
+
+        mime, _slash, ext = content_type.partition(";")[0].strip().partition("/")
+
+        if (mime.lower() != "image"):
+            return enums.ImageCodes.INVALID_FORMAT, None
+
+        return enums.ImageCodes.SUCCESS, ext
+
+    # download an image from a url, keeping it in memory unless it's large enough to spill over to a temp file
+    # images that were downloaded recently are reused from the download cache
+    # input: url, image to download
+    # output: if successful: bytes; the image, or string; path to temp file if it spilled over to disk;
+    #         if unsuccessful: ImageCodes; error code
+    #         pass the image to discard_image when done with it
+    async def download_image(self, url: str) -> Union[image_ops.ImageSource, enums.ImageCodes]:
+        # urls in the cache already passed the checks
+        entry = self.download_cache.lookup(url)
+
+        if (entry is not None and self.download_cache.is_fresh(entry)):
+            source = self.download_cache.acquire(entry)
+
+            if (source is not None):
+                return source
+
+        request_url = self.prepare_image_url(url)
+
+        if (request_url is None):
+            return enums.ImageCodes.BAD_URL
+
+        source = await self.fetch_image(url, request_url, entry)
+
+        # the cached copy was evicted while it was being revalidated, so download it again
+        if (source is None):
+            self.download_cache.forget(url)
+            source = await self.fetch_image(url, request_url, None)
+
+        return source
+
+    # downloads an image and adds it to the download cache
+    # input: url, the url as given, the cache's key
+    #        request_url, the url to request
+    #        entry, the cached download to revalidate or None to download it unconditionally
+    # output: same as download_image, or None if the server said the cached copy was still good but it's been evicted
+    async def fetch_image(self, url: str, request_url: str, entry: Optional[download_cache.CachedUrl]) -> Optional[Union[image_ops.ImageSource, enums.ImageCodes]]:
+        headers = self.download_cache.revalidation_headers(entry) if (entry is not None) else {}
         
         try:
-            conn = aiohttp.TCPConnector(verify_ssl=False) # for https
-            async with aiohttp.ClientSession(connector=conn) as session:
-                async with session.get(url, timeout=10) as r:
-                    if (r.status == 200):
-                        if ("Content-Type" in r.headers):
-                            content_type = r.headers["Content-Type"]
-                        else:
-                            return enums.ImageCodes.BAD_URL
-                        
-                        if ("Content-Length" in r.headers):
-                            content_length = r.headers["Content-Length"]
-                        else:
-                            return enums.ImageCodes.BAD_URL
-                        
-                        # check if empty file
-                        if (content_length):
-                            content_length = int(content_length)
-                            
-                            if (content_length < 1):
-                                return enums.ImageCodes.BAD_URL
-                            elif (content_length > enums.DISCORD_MAX_FILESIZE):
-                                return enums.ImageCodes.MAX_FILESIZE
-                        else:
-                            return enums.ImageCodes.BAD_URL
-                        
-                        # check for file type
-                        if (not content_type):
-                            return enums.ImageCodes.BAD_URL
-                        
-                        content_type = content_type.split("/")
-                        
-                        mime = content_type[0]
-                        ext = content_type[1]
-                        
-                        if (mime.lower() != "image"):
-                            return enums.ImageCodes.INVALID_FORMAT
-                        
-                        # return if the simulation reached this far
-                        if (simulate):
-                            return enums.ImageCodes.SUCCESS
-        
-                        # make a new 'unique' tmp file with the correct extension
-                        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix="." + ext)
-                        tmp_file_path = tmp_file.name
-        
-                        # write bytes to tmp file
-                        with tmp_file as f:
-                            while True:
-                                chunk = await r.content.read(1024)
-                                
-                                if (not chunk):
-                                    break
-                                
-                                f.write(chunk)
-                                
-                        return tmp_file_path
-                    else:
-                        return enums.ImageCodes.BAD_URL
-                    
+            async with self.bot.session.get(request_url, headers=headers, timeout=aiohttp.ClientTimeout(total=10), ssl=False) as r: # ssl=False for https
+                # the cached copy is still good
+                if (r.status == 304 and entry is not None):
+                    return self.download_cache.acquire(entry, revalidated=True)
+
+                code, ext = self.check_image_headers(r, require_length=False)
+
+                if (code != enums.ImageCodes.SUCCESS):
+                    return code
+
+                digest = hashlib.sha256()
+                source = await self.read_image_body(r, ext, digest)
+
+                if (isinstance(source, enums.ImageCodes)):
+                    return source
+
+                return self.download_cache.add(url, source, digest.hexdigest(), r.headers)
+                
         except aiohttp.ClientError as e:
             return enums.ImageCodes.BAD_URL
         
@@ -236,78 +345,128 @@ class Image(commands.Cog):
             return enums.ImageCodes.MISC_ERROR
                 
         return enums.ImageCodes.MISC_ERROR
+
+    # reads an image response into a bounded buffer, moving it to a temp file if it gets too large
+    # the size is checked as the body arrives and the start of the file is checked to see if it's an image,
+    # so the download is stopped as soon as it's known to be too large or not an image
+    # input: r, the response
+    #        ext, extension to give the temp file
+    #        digest, hashlib hash that's updated with the body
+    # output: the image's bytes, the temp file's path or ImageCodes if the body was too large or not a valid image
+    async def read_image_body(self, r: aiohttp.ClientResponse, ext: str, digest) -> Union[image_ops.ImageSource, enums.ImageCodes]:
+        buffer = bytearray()
+        size = 0
+        tmp_file = None
+
+        # the start of the file until it's been recognized
+        header = bytearray()
+        sniffed = False
+
+        code = enums.ImageCodes.SUCCESS
+
+        try:
+            while True:
+                chunk = await r.content.read(DOWNLOAD_CHUNK_SIZE)
+                
+                if (not chunk):
+                    break
+
+                size += len(chunk)
+
+                if (size > enums.DISCORD_MAX_FILESIZE):
+                    code = enums.ImageCodes.MAX_FILESIZE
+                    break
+
+                if (not sniffed):
+                    header += chunk
+                    code = self.check_image_header(header, complete=False)
+
+                    if (code is None):
+                        code = enums.ImageCodes.SUCCESS
+                    elif (code != enums.ImageCodes.SUCCESS):
+                        break
+                    else:
+                        sniffed = True
+                        header = None
+
+                digest.update(chunk)
+
+                if (tmp_file is not None):
+                    tmp_file.write(chunk)
+                    continue
+
+                buffer += chunk
+
+                # spill over to disk
+                if (size > self.spill_to_disk_size):
+                    # make a new 'unique' tmp file with the correct extension, in the download cache so it can be kept
+                    tmp_file = open(self.download_cache.create_file(ext), "wb")
+                    tmp_file.write(buffer)
+                    buffer = None
+
+            # the whole file was smaller than what's needed to recognize it
+            if (code == enums.ImageCodes.SUCCESS and not sniffed):
+                code = self.check_image_header(header, complete=True) if (size > 0) else enums.ImageCodes.BAD_URL
+
+        except BaseException:
+            # don't leave a partial file behind
+            code = enums.ImageCodes.MISC_ERROR
+            raise
+
+        finally:
+            if (tmp_file is not None):
+                tmp_file.close()
+
+                if (code != enums.ImageCodes.SUCCESS):
+                    utils.remove_file_safe(tmp_file.name)
+
+        if (code != enums.ImageCodes.SUCCESS):
+            # stop downloading instead of letting the connection read the rest of the body
+            r.close()
+            return code
+
+        if (tmp_file is not None):
+            return tmp_file.name
+
+        return bytes(buffer)
+
+    # checks the start of a file to see if it's an image that isn't too large
+    # input: data, the start of the file
+    #        complete, if that's the whole file
+    # output: return code, or None if more data is needed to tell
+    @staticmethod
+    def check_image_header(data: bytes, complete: bool) -> Optional[enums.ImageCodes]:
+        header = image_header.sniff_image(bytes(data), complete=complete)
+
+        if (header is None):
+            return None
+
+        if (not header.is_image):
+            return enums.ImageCodes.INVALID_FORMAT
+
+        if (header.size is not None):
+            max_width, max_height = image_ops.MAX_DIMENSIONS
+            width, height = header.size
+
+            if (width > max_width or height > max_height):
+                return enums.ImageCodes.MAX_DIMENSIONS
+
+        return enums.ImageCodes.SUCCESS
     
     # liquify image
     # input: channel, the channel to send the image in
-    #        path, path to the image to liquify
+    #        source, the image to liquify
     # output: return code of the operation
-    async def do_magic(self, ctx: commands.Context, path: str) -> enums.ImageCodes:
-        try:
-            # get a wand image object
-            img = wand.image.Image(filename=path)
-            
-            # no animated gifs
-            # TODO: run gif magic code here too
-            #       be careful of alpha channel though... just in case
-            if (img.animation):
-                utils.remove_file_safe(path)
-                return enums.ImageCodes.INVALID_FORMAT
-            
-            # image dimensions too large
-            if (img.size >= (3000, 3000)):
-                utils.remove_file_safe(path)
-                return enums.ImageCodes.MAX_DIMENSIONS
-            
-            file_path, ext = os.path.splitext(path)
-            
-            # TODO: is it worth converting the image to a better format (like png)?
-            img.format = ext[1:] # drop the "."
-            img.alpha_channel = True
-            
-            # do the magick
-            img.transform(resize="800x800>")
-            img.liquid_rescale(width=int(img.width * 0.5), height=int(img.height * 0.5), delta_x=1)
-            img.liquid_rescale(width=int(img.width * 1.5), height=int(img.height * 1.5), delta_x=2)
-            
-            # before saving, check the size of the output file
-            # note - dex: on windows, this seems to be 'size' instead of 'size on disk'...
-            #             not sure if that matters when it comes to discord's max filesize
-            img_blob = img.make_blob()
-            
-            if (len(img_blob) > enums.DISCORD_MAX_FILESIZE):
-                utils.remove_file_safe(path)
-                return enums.ImageCodes.MAX_FILESIZE
-                
-            magickd_file_path = file_path + "_magickd" + ext
-                
-            # now save the magickd image
-            img.save(filename=magickd_file_path)
-            
-            # upload liquidized image
-            if (ctx.channel.permissions_for(ctx.me).attach_files):
-                await ctx.channel.send(file=discord.File(magickd_file_path))
-            else:
-                utils.remove_file_safe(path)
-                utils.remove_file_safe(magickd_file_path)
-                return self.bot.enum.ImageCodes.NO_PERMISSIONS
-            
-            # just in case
-            await asyncio.sleep(1)
-            
-            # delete leftover file(s)
-            utils.remove_file_safe(path)
-            utils.remove_file_safe(magickd_file_path)
-                
-            return enums.ImageCodes.SUCCESS
-        
-        # TODO: do something with this maybe? convert image to a different format and try again?
-        except wand.exceptions.WandException as e:
-            print("wand exception", e)
-            return enums.ImageCodes.INVALID_FORMAT
-        
-        except Exception as e:
-            print(e)
-            return enums.ImageCodes.MISC_ERROR
+    async def do_magic(self, ctx: commands.Context, source: image_ops.ImageSource) -> enums.ImageCodes:
+        code, result = await self.run_transform(image_ops.liquify, source)
+
+        self.discard_image(source)
+
+        if (code != enums.ImageCodes.SUCCESS):
+            return code
+
+        # upload liquidized image
+        return await self.upload_edited_image(ctx.channel, result)
 
     @commands.command(description="first image results from Google Images",
                       brief="first image results from Google Images",
@@ -316,64 +475,94 @@ class Image(commands.Cog):
     async def img(self, ctx, *, query: str):
         channel = ctx.message.channel
         async with channel.typing():
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/43.0.2357.134 Safari/537.36"}
-            url = f"https://www.google.com/search?q={quote(query)}&tbm=isch&gs_l=img&safe=on" # escape query for url
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as r:
-                    if (r.status != 200):
-                        await ctx.send(f"{ctx.author.mention} Query for `{query}` failed (maybe try again)")
-                        return
-                    
-                    text = await r.text()
-                    
-            if ("did not match any image results" in text):
+            cache_key = query.strip().lower()
+            cached_results = self.search_results_cache.get(cache_key)
+
+            if (cached_results is not None):
+                images, known = cached_results
+            else:
+                images = await self.scrape_image_search(query)
+                known = None
+
+                if (images is None):
+                    await ctx.send(f"{ctx.author.mention} Query for `{query}` failed (maybe try again)")
+                    return
+
+            if (len(images) <= 0):
                 await ctx.send(f"{ctx.author.mention} No results found for `{query}`")
                 return
-        
-            tree = html.fromstring(text)
-                    
-            # count the number of divs that contain images
-            path = tree.xpath("//div[@class='rg_meta notranslate']/text()")
-            images = []
-            
-            for p in path:
-                extracted_image = self.extract_image_url(p)
-                
-                if (extracted_image):
-                    images.append(extracted_image)
 
-            if (len(images) <= 0):
+            search_options = self.bot.CONFIG["image_search"]
+            search = image_search.ImageSearchSession(images, self.check_image_url, self.search_validation_slots, search_options["prefetch_pages"], known=known)
+
+            # show whichever of the first results works first
+            found = await search.start(search_options["max_concurrent_validations"])
+
+            self.save_search_results(cache_key, search)
+
+            if (not found):
+                search.close()
                 await ctx.send(f"{ctx.author.mention} No results found for `{query}`")
                 return
 
-            images_copy = images.copy()
-            img_msg = None
+            page, num_pages = search.page()
+            embed = utils.create_image_embed(ctx.author, title=f"Search results for {query}", footer=f"Page {page}/{num_pages}", image=search.url)
 
-            for image in images_copy:
-                try:
-                    valid_image = await self.validate_image(image)
+            try:
+                img_msg = await channel.send(embed=embed)
+            except discord.HTTPException:
+                search.close()
+                raise
 
-                    if (valid_image is None):
-                        images.remove(image)
-                        continue
+            await self.bot.messaging.add_img_reactions(img_msg)
 
-                    embed = utils.create_image_embed(ctx.author, title=f"Search results for {query}", footer="Page 1/{}".format(len(images)), image=valid_image)
-                    img_msg = await channel.send(embed=embed)
+            # add the search to the cache
+            # remove the search if nobody scrolls it for a while
+            expiry = self.bot.scheduler.schedule(search_options["time_to_wait"], self.remove_img_from_cache, img_msg)
+
+            self.SEARCH_CACHE[img_msg.id] = {"search": search, "query": cache_key, "time": time.time(), "command_msg": ctx.message, "channel": channel, "message": img_msg, "expiry": expiry}
+
+            self.bot.messaging.register_reaction_handler(img_msg.id, self.image_search_reaction_hook)
+
+    # scrapes google images
+    # input: query, what to search for
+    # output: list of image urls, which may be empty, or None if the search failed
+    async def scrape_image_search(self, query: str) -> Optional[List[str]]:
+        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/43.0.2357.134 Safari/537.36"}
+        url = f"https://www.google.com/search?q={quote(query)}&tbm=isch&gs_l=img&safe=on" # escape query for url
         
-                    await self.bot.messaging.add_img_reactions(img_msg)
-                except discord.HTTPException:
-                    images.remove(image)
-                    continue
-                else:
-                    break
+        async with self.bot.session.get(url, headers=headers) as r:
+            if (r.status != 200):
+                return None
+            
+            text = await r.text()
+            
+        if ("did not match any image results" in text):
+            return []
+    
+        tree = html.fromstring(text)
+                
+        # count the number of divs that contain images
+        path = tree.xpath("//div[@class='rg_meta notranslate']/text()")
+        images = []
+        
+        for p in path:
+            extracted_image = self.extract_image_url(p)
+            
+            if (extracted_image):
+                images.append(extracted_image)
 
-            if (len(images) <= 0 or not img_msg):
-                await ctx.send(f"{ctx.author.mention} No results found for `{query}`")
-                return
+        return images
 
-            # add the tree to the cache
-            self.SEARCH_CACHE[img_msg.id] = {"images": images, "index": 0, "time": time.time(), "command_msg": ctx.message, "channel": channel}
+    # remembers what a search found out about its results, so the same query later doesn't check them again
+    # input: cache_key, the normalized query
+    #        search, the search
+    def save_search_results(self, cache_key: str, search: image_search.ImageSearchSession) -> None:
+        results = search.export()
+
+        # keep the original expiry so results don't live forever while they're being browsed
+        if (not self.search_results_cache.update(cache_key, results)):
+            self.search_results_cache.set(cache_key, results)
 
     # gets an image url from a dict
     # input: image_dict, dictionary in string form containing info from google image search
@@ -391,16 +580,33 @@ class Image(commands.Cog):
         
         return image_dict["ou"]
     
-    # checks if an image is one discord can embed
+    # checks if an image is one discord can embed without downloading it
+    # a HEAD request is tried first, then a GET for only the first byte for hosts that don't answer HEAD properly
     # input: image_url, url of image
-    # output: url of the image or None if invalid
-    async def validate_image(self, image_url: str) -> Optional[str]:
-        result = await self.download_image(image_url, simulate=True)
-        
-        if (result == enums.ImageCodes.SUCCESS):
-            return image_url
-        
-        return None
+    # output: if the image is valid
+    async def check_image_url(self, image_url: str) -> bool:
+        url = self.prepare_image_url(image_url)
+
+        if (url is None):
+            return False
+
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        try:
+            async with self.bot.session.head(url, timeout=timeout, allow_redirects=True, ssl=False) as r:
+                # same as download_image, the size is checked while it's downloaded if it isn't known
+                code, _ext = self.check_image_headers(r, require_length=False)
+
+            if (code in [enums.ImageCodes.SUCCESS, enums.ImageCodes.MAX_FILESIZE, enums.ImageCodes.INVALID_FORMAT]):
+                return (code == enums.ImageCodes.SUCCESS)
+
+            async with self.bot.session.get(url, headers={"Range": "bytes=0-0"}, timeout=timeout, ssl=False) as r:
+                code, _ext = self.check_image_headers(r, allow_partial=True, require_length=False)
+
+            return (code == enums.ImageCodes.SUCCESS)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
                 
     # edits a message with the new embed
     # input: user, the user who originally requested the image search
@@ -417,27 +623,18 @@ class Image(commands.Cog):
         if (time.time() < last_time + self.bot.CONFIG["image_search"]["cooldown_between_updates"]):
             return
         
-        images = cached_msg["images"]
-        index = cached_msg["index"] + i
-        length = len(images)
+        search = cached_msg["search"]
         command_msg = cached_msg["command_msg"]
-        channel = cached_msg["channel"]
-        
-        if (index < 0):
-            index = length - 1
-        
-        if (index > length - 1):
-            index = 0
-        
-        img_url = await self.validate_image(images[index])
 
-        # if image is invalid, remove it from the list and go to the next image
-        if (img_url is None):
-            self.SEARCH_CACHE[message.id]["images"].remove(images[index])
-            await self.update_img_search(user, message, index)
+        # stops other reactions from scrolling while we're looking for the next image
+        cached_msg["time"] = time.time()
+
+        # skips images that don't work, the ones around the current page are usually already checked
+        if (not await search.step(i)):
             return
-                
-        embed = utils.create_image_embed(user, title="Search results", footer="Page {}/{}".format(index + 1, length), image=img_url)
+
+        page, num_pages = search.page()
+        embed = utils.create_image_embed(user, title="Search results", footer=f"Page {page}/{num_pages}", image=search.url)
         
         try:
             await message.edit(embed=embed)
@@ -453,16 +650,25 @@ class Image(commands.Cog):
         else:
             await self.bot.messaging.add_img_reactions(message)
         
+            # restart the inactivity timer
+            cached_msg["expiry"].cancel()
+            expiry = self.bot.scheduler.schedule(self.bot.CONFIG["image_search"]["time_to_wait"], self.remove_img_from_cache, message)
+
             # update cache
-            self.SEARCH_CACHE[message.id] = {"images": images, "index": index, "time": time.time(), "command_msg": command_msg, "channel": channel}
+            cached_msg["time"] = time.time()
+            cached_msg["expiry"] = expiry
         
     # remove an image from the cache and prevent it from being scrolled
     # input: message, message to remove
     async def remove_img_from_cache(self, message: discord.Message) -> None:
-        try:
-            del self.SEARCH_CACHE[message.id]
-        except KeyError:
-            pass
+        self.bot.messaging.unregister_reaction_handler(message.id)
+
+        cached_msg = self.SEARCH_CACHE.pop(message.id, None)
+
+        if (cached_msg):
+            cached_msg["expiry"].cancel()
+            cached_msg["search"].close()
+            self.search_results_cache.update(cached_msg["query"], cached_msg["search"].export())
         
         try:
             await message.clear_reactions()
@@ -472,127 +678,89 @@ class Image(commands.Cog):
     # deletes an embed and removes it from the cache
     # input: message, the message to delete
     async def remove_img_search(self, message: discord.Message) -> None:
-        try:
-            await self.SEARCH_CACHE[message.id]["command_msg"].delete()
-        except discord.errors.Forbidden:
-            pass
+        self.bot.messaging.unregister_reaction_handler(message.id)
 
-        try:
-            del self.SEARCH_CACHE[message.id]
-        except KeyError:
-            pass
+        cached_msg = self.SEARCH_CACHE.pop(message.id, None)
+
+        if (cached_msg):
+            cached_msg["expiry"].cancel()
+            cached_msg["search"].close()
+            self.search_results_cache.update(cached_msg["query"], cached_msg["search"].export())
+
+            try:
+                await cached_msg["command_msg"].delete()
+            except discord.errors.Forbidden:
+                pass
         
         await message.delete()
         
-    # handles reactions and calls appropriate functions
-    # input: reaction, the reaction applied to the message
-    #        user, the user that applied the reaction
-    async def image_search_reaction_hook(self, reaction: discord.Reaction, user: discord.User) -> None:
-        message = reaction.message
-          
-        if (user == self.bot.user):
+    # handles reactions and calls appropriate functions, registered with the reaction dispatcher for each image search
+    # input: payload, the raw reaction event
+    async def image_search_reaction_hook(self, payload: discord.RawReactionActionEvent) -> None:
+        if (payload.event_type != "REACTION_ADD"):
             return
 
-        if (message.id not in self.SEARCH_CACHE):
+        cached_msg = self.SEARCH_CACHE.get(payload.message_id)
+
+        if (not cached_msg):
             return
-        
-        if (message.author == self.bot.user):
-            if (message.embeds):
-                embed = message.embeds[0].to_dict()
 
-                if ("author" not in embed or "name" not in embed["author"]):
-                    return
-                        
-                if (embed["author"]["name"] == user.name):
-                    emoji = reaction.emoji
-                    
-                    if (message.reactions and reaction in message.reactions and emoji in self.bot.messaging.EMOJI_CHARS.values()):
-                        if (message.channel.permissions_for(message.author).manage_emojis):
-                            try:
-                                await message.remove_reaction(emoji, user) # remove the reaction so the user can react again
-                            
-                            except Exception:
-                                pass
-                    
-                    if (emoji == self.bot.messaging.EMOJI_CHARS["stop_button"]):
-                        await self.remove_img_search(message) # delete message
-                    elif (emoji == self.bot.messaging.EMOJI_CHARS["arrow_forward"]):
-                        await self.update_img_search(user, message, 1) # increment index
-                    elif (emoji == self.bot.messaging.EMOJI_CHARS["arrow_backward"]):
-                        await self.update_img_search(user, message, -1) # decrement index
-                        
-    async def remove_inactive_image_searches(self) -> None:
-        await self.bot.wait_until_ready()
-        
-        while (not self.bot.is_closed()):
-            try:
-                search_cache_copy = self.SEARCH_CACHE.copy()
-                
-                for message_id, cache in search_cache_copy.items():
-                    if (time.time() > cache["time"] + self.bot.CONFIG["image_search"]["time_to_wait"]):
-                        try:
-                            msg = await cache["channel"].fetch_message(message_id)
-                            
-                        except Exception as e:
-                            self.bot.bot_utils.log_error_to_file(e)
-                        
-                        await self.remove_img_from_cache(msg)
-                
-                search_cache_copy.clear()
+        message = cached_msg["message"]
+        user = cached_msg["command_msg"].author
 
-            except Exception as e:
-                self.bot.bot_utils.log_error_to_file(e)
-            
-            #await asyncio.sleep(self.bot.CONFIG["image_search"]["time_to_wait"] // 2)
-            await asyncio.sleep(20)
-    
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        # call image search hook
-        await self.image_search_reaction_hook(reaction, user)
+        # only the user who searched can browse the results
+        if (payload.user_id != user.id):
+            return
 
+        emoji = str(payload.emoji)
+
+        if (emoji in self.bot.messaging.EMOJI_CHARS.values()):
+            if (not isinstance(message.channel, discord.abc.PrivateChannel) and message.channel.permissions_for(message.guild.me).manage_messages):
+                try:
+                    await message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id)) # remove the reaction so the user can react again
+                
+                except Exception:
+                    pass
+        
+        if (emoji == self.bot.messaging.EMOJI_CHARS["stop_button"]):
+            await self.remove_img_search(message) # delete message
+        elif (emoji == self.bot.messaging.EMOJI_CHARS["arrow_forward"]):
+            await self.update_img_search(user, message, 1) # increment index
+        elif (emoji == self.bot.messaging.EMOJI_CHARS["arrow_backward"]):
+            await self.update_img_search(user, message, -1) # decrement index
+                        
     # pixelates image
     # input: message, command message
     #        pixel_size, how much to pixelate the image
     #        url, url of the image to download
     async def do_pixel(self, message: discord.Message, pixel_size: int, url: str) -> None:
         if (not url):
-            path = await self.find_and_download_image(message)
+            source = await self.find_and_download_image(message)
         else:
-            path = await self.download_image(url)
+            source = await self.download_image(url)
         
-        if (isinstance(path, enums.ImageCodes)):
-            await self.image_error_message(message, path, url)
+        if (isinstance(source, enums.ImageCodes)):
+            await self.image_error_message(message, source, url)
             return
-        elif (not path):
+        elif (not source):
             await self.image_error_message(message, enums.ImageCodes.BAD_URL, url)
             return
         
-        img = Img.open(path) # filename
-        
-        if (img.size >= (3000, 3000)):
-            utils.remove_file_safe(path)
-            await self.image_error_message(message, enums.ImageCodes.MAX_DIMENSIONS, url)
+        code, result = await self.run_transform(image_ops.pixelate, source, pixel_size)
+
+        self.discard_image(source)
+
+        if (code == enums.ImageCodes.SUCCESS):
+            code = await self.upload_edited_image(message.channel, result)
+
+        if (code == enums.ImageCodes.SUCCESS):
             return
-        
-        # no animated gifs
-        if (img.info and ("loop" in img.info or "duration" in img.info)):
-            utils.remove_file_safe(path)
+        elif (code == enums.ImageCodes.ANIMATED):
             await message.channel.send(f"{message.author.mention} Can't pixelate animated gifs")
-            return
-        
-        old_size = img.size
-        new_size = (old_size[0] // pixel_size, old_size[1] // pixel_size)
-        
-        if (new_size > (0, 0)):
-            img = img.resize(new_size, Img.NEAREST)
-            img = img.resize(old_size, Img.NEAREST)
-        else:
-            utils.remove_file_safe(path)
+        elif (code == enums.ImageCodes.INVALID_ARGUMENT):
             await message.channel.send(f"{message.author.mention} Pixel size too large")
-            return
-        
-        await self.save_and_upload(message, path, img, url)
+        else:
+            await self.image_error_message(message, code, url)
                 
     @commands.command(description="pixelates an image",
                       brief="pixelates an image",
@@ -615,52 +783,31 @@ class Image(commands.Cog):
     @commands.cooldown(2, 5, commands.BucketType.channel)
     async def gspeed(self, ctx, image: str = ""):
         if (not image):
-            path = await self.find_and_download_image(ctx.message)
+            source = await self.find_and_download_image(ctx.message)
         else:
-            path = await self.download_image(image)
+            source = await self.download_image(image)
 
-        if (not path):
+        if (not source):
             await ctx.send(f"{ctx.author.mention} No image found")
             return
-        elif (isinstance(path, enums.ImageCodes)):
-            await self.image_error_message(ctx.message, path)
+        elif (isinstance(source, enums.ImageCodes)):
+            await self.image_error_message(ctx.message, source)
             return
 
         async with ctx.channel.typing():
             # process it
-            img = Img.open(path)
+            code, result = await self.run_transform(image_ops.gspeed, source)
 
-            if (img.size >= (3000, 3000)):
-                utils.remove_file_safe(path)
-                await self.image_error_message(ctx.message, enums.ImageCodes.MAX_DIMENSIONS)
-                return
+            self.discard_image(source)
 
-            # only animated gifs
-            if (img.info and ("loop" not in img.info or "duration" not in img.info)):
-                utils.remove_file_safe(path)
+            if (code == enums.ImageCodes.NOT_ANIMATED):
                 await ctx.send(f"{ctx.author.mention} Image must be an animated gif")
                 return
+            elif (code == enums.ImageCodes.SUCCESS):
+                code = await self.upload_edited_image(ctx.channel, result)
 
-            duration = int(img.info.get("duration", 0))
-            img.info["duration"] = max(int(duration / 2), 1) # TODO: remember to change this on july 1st (https://github.com/python-pillow/Pillow/issues/3073#issuecomment-380620206)
-
-            file_path = os.path.splitext(path)[0]
-            edited_file_path = file_path + "_edited.gif"
-
-            img.save(edited_file_path, format="gif", save_all=True, optimize=False)
-
-            # upload liquidized image
-            if (ctx.channel.permissions_for(ctx.me).attach_files):
-                await ctx.channel.send(file=discord.File(edited_file_path))
-            else:
-                await self.image_error_message(ctx.message, enums.ImageCodes.NO_PERMISSIONS)
-            
-            # just in case
-            await asyncio.sleep(1)
-            
-            # delete leftover file(s)
-            utils.remove_file_safe(path)
-            utils.remove_file_safe(edited_file_path)
+            if (code != enums.ImageCodes.SUCCESS):
+                await self.image_error_message(ctx.message, code)
 
     # TODO: rotate each frame in a gif
     @commands.command(description="rotates an image",
@@ -669,58 +816,63 @@ class Image(commands.Cog):
     async def rotate(self, ctx, degrees: int = 90, image: str = ""):
         async with ctx.channel.typing():
             if (not image):
-                path = await self.find_and_download_image(ctx.message)
+                source = await self.find_and_download_image(ctx.message)
             else:
-                path = await self.download_image(image)
+                source = await self.download_image(image)
 
-            if (not path):
+            if (not source):
                 await ctx.send(f"{ctx.author.mention} No image found")
                 return
+            elif (isinstance(source, enums.ImageCodes)):
+                await self.image_error_message(ctx.message, source, image)
+                return
 
             try:
-                im = Img.open(path)
-                im = im.rotate(degrees, expand=True)
-                im.save(path)
+                code, result = await self.run_transform(image_ops.rotate, source, degrees)
 
-                await ctx.channel.send(file=discord.File(path))
+                if (code == enums.ImageCodes.SUCCESS):
+                    code = await self.upload_edited_image(ctx.channel, result)
+
+                if (code != enums.ImageCodes.SUCCESS):
+                    await self.image_error_message(ctx.message, code)
             except Exception as e:
                 await ctx.send(f"{ctx.author.mention} An error occured processing the image: `{e}`")
             finally:
-                utils.remove_file_safe(path)
+                self.discard_image(source)
 
     @commands.command(description="converts an image to specified format",
                       brief="converts an image to specified format")
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def convert(self, ctx, url: str = "", extension = "jpeg"):
         async with ctx.channel.typing():
+            formats = ["jpeg", "png"]
+
+            if (extension not in formats):
+                await ctx.send(f"{ctx.author.mention} Invalid format `{extension}`, valid formats are: {utils.format_code_brackets(formats)}")
+                return
+
             if (not url):
-                path = await self.find_and_download_image(ctx.message)
+                source = await self.find_and_download_image(ctx.message)
 
-                if (not path):
+                if (not source):
                     await ctx.send(f"{ctx.author.mention} No image found")
                     return
             else:
-                path = await self.download_image(url)
+                source = await self.download_image(url)
 
-                if (isinstance(path, enums.ImageCodes)):
-                    await self.image_error_message(ctx.message, path, url)
+                if (isinstance(source, enums.ImageCodes)):
+                    await self.image_error_message(ctx.message, source, url)
                     return
-
-            formats = ["jpeg", "png"]
-
-            if (extension not in formats):
-                await ctx.send(f"{ctx.author.mention} Invalid format `{extension}`, valid formats are: {utils.format_code_brackets(formats)}")
-                return
                 
-            new_filename = f"{path}.{extension}"
+            code, result = await self.run_transform(image_ops.convert, source, extension)
 
-            im = Img.open(path).convert("RGB")
-            im.save(new_filename, extension)
+            self.discard_image(source)
 
-            await ctx.channel.send(file=discord.File(new_filename))
+            if (code == enums.ImageCodes.SUCCESS):
+                code = await self.upload_edited_image(ctx.channel, result)
 
-            utils.remove_file_safe(new_filename)
-            utils.remove_file_safe(path)
+            if (code != enums.ImageCodes.SUCCESS):
+                await self.image_error_message(ctx.message, code, url)
 
     @commands.command(description="extracts text from an image",
                       brief="extracts text from an image")
@@ -729,28 +881,29 @@ class Image(commands.Cog):
         await ctx.trigger_typing()
 
         if (not url):
-            path = await self.find_and_download_image(ctx.message)
+            source = await self.find_and_download_image(ctx.message)
 
-            if (not path):
+            if (not source):
                 await ctx.send(f"{ctx.author.mention} No image found")
                 return
         else:
-            path = await self.download_image(url)
+            source = await self.download_image(url)
 
-            if (isinstance(path, enums.ImageCodes)):
-                await self.image_error_message(ctx.message, path, url)
+            if (isinstance(source, enums.ImageCodes)):
+                await self.image_error_message(ctx.message, source, url)
                 return
 
-        im = Img.open(path).convert("RGB")
-        text = pytesseract.image_to_string(im)
+        code, text = await self.run_transform(image_ops.ocr, source)
+
+        self.discard_image(source)
 
-        if (not text):
+        if (code != enums.ImageCodes.SUCCESS):
+            await self.image_error_message(ctx.message, code, url)
+        elif (not text):
             await ctx.send(f"{ctx.author.mention} No text found")
         else:
             await ctx.send(f"{ctx.author.mention} ```{text}```")
 
-        utils.remove_file_safe(path)
-
     @commands.command(description="needs more jpeg",
                       brief="needs more jpeg",
                       aliases=["jpg"])
@@ -762,30 +915,27 @@ class Image(commands.Cog):
             return
 
         if (not url):
-            path = await self.find_and_download_image(ctx.message)
+            source = await self.find_and_download_image(ctx.message)
 
-            if (not path):
+            if (not source):
                 await ctx.send(f"{ctx.author.mention} No image found")
                 return
         else:
-            path = await self.download_image(url)
+            source = await self.download_image(url)
 
-            if (isinstance(path, enums.ImageCodes)):
-                await self.image_error_message(ctx.message, path, url)
+            if (isinstance(source, enums.ImageCodes)):
+                await self.image_error_message(ctx.message, source, url)
                 return
 
-        filename, ext = os.path.splitext(path)
-
-        new_filename = f"{filename}_jpegged{ext}"
+        code, result = await self.run_transform(image_ops.jpeg, source, quality)
 
-        im = Img.open(path)
-        im = im.convert(im.mode)
-        im.save(new_filename, optimize=True, quality=quality)
+        self.discard_image(source)
 
-        await ctx.channel.send(file=discord.File(new_filename))
+        if (code == enums.ImageCodes.SUCCESS):
+            code = await self.upload_edited_image(ctx.channel, result)
 
-        utils.remove_file_safe(new_filename)
-        utils.remove_file_safe(path)
+        if (code != enums.ImageCodes.SUCCESS):
+            await self.image_error_message(ctx.message, code, url)
 
 def setup(bot):
     bot.add_cog(Image(bot))
@@ -1,7 +1,6 @@
 import discord
 from discord.ext import commands
 
-import asyncio
 import datetime
 from modules import checks, utils
 from random import randint
@@ -12,52 +11,69 @@ class Log(commands.Cog):
 
         self.COOLDOWN = 10 # seconds
 
-        self.update_task = self.bot.loop.create_task(self.update_log())
-
+        # guild id -> log messages waiting to be sent
         self.logs = {}
 
+        # guild id -> scheduled call that sends the guild's waiting log messages
+        self.flushes = {}
+
+        self.enabled = False
+        self.channel_name = ""
+
+        self.apply_config(self.bot.CONFIG)
+        self.bot.config_store.subscribe(self.apply_config, "log")
+
     def cog_unload(self):
-        self.update_task.cancel()
+        self.bot.config_store.unsubscribe(self.apply_config)
 
-    async def update_log(self):
-        await self.bot.wait_until_ready()
+        for flush in self.flushes.values():
+            flush.cancel()
 
-        while (not self.bot.is_closed()):
-            sent_ids = []
+    # keeps the config values used for every voice event up to date
+    # input: config, the new config
+    #        changes, what changed, unused
+    def apply_config(self, config, changes=None):
+        self.enabled = config.log.enabled
+        self.channel_name = config.log.channel_name
 
-            for gid, msgs in self.logs.items():
-                guild = self.bot.get_guild(gid)
+    # sends up to 10 waiting log messages for a guild, and schedules the next batch if there are more
+    # input: gid, id of the guild
+    async def flush_log(self, gid: int):
+        del self.flushes[gid]
 
-                chan = discord.utils.find(lambda c: (c.name == self.bot.CONFIG["log"]["channel_name"]), guild.channels) or None
+        msgs = self.logs.pop(gid, [])
+        guild = self.bot.get_guild(gid)
 
-                if (not chan):
-                    return
+        if (not msgs or not guild):
+            return
 
-                if (not chan.permissions_for(guild.me).send_messages):
-                    return
+        chan = discord.utils.find(lambda c: (c.name == self.channel_name), guild.channels) or None
 
-                await chan.send("\n".join(msgs[:10]))
-                await asyncio.sleep(1)
+        if (not chan):
+            return
 
-                msgs_copy = msgs.copy()
+        if (not chan.permissions_for(guild.me).send_messages):
+            return
 
-                for _i in range(0, (10 if len(msgs_copy) > 10 else len(msgs_copy))):
-                    del self.logs[gid][0]
-                
-                sent_ids.append(gid)
+        # put the rest back for the next batch
+        if (len(msgs) > 10):
+            self.logs[gid] = msgs[10:]
+            self.schedule_flush(gid)
 
-            for gid in sent_ids:
-                if (len(self.logs[gid]) == 0):
-                    del self.logs[gid]
+        await chan.send("\n".join(msgs[:10]))
 
-            await asyncio.sleep(self.COOLDOWN)
+    # schedules a guild's waiting log messages to be sent, if they aren't already
+    # input: gid, id of the guild
+    def schedule_flush(self, gid: int):
+        if (gid not in self.flushes):
+            self.flushes[gid] = self.bot.scheduler.schedule(self.COOLDOWN, self.flush_log, gid)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        if (not self.bot.CONFIG["log"]["enabled"] ):
+        if (not self.enabled):
             return
         
-        chan = discord.utils.find(lambda c: (c.name == self.bot.CONFIG["log"]["channel_name"]), member.guild.channels) or None
+        chan = discord.utils.find(lambda c: (c.name == self.channel_name), member.guild.channels) or None
 
         if (not chan):
             return
@@ -83,6 +99,8 @@ class Log(commands.Cog):
         else:
             self.logs[member.guild.id] = [s]
 
+        self.schedule_flush(member.guild.id)
+
     @commands.Cog.listener()
     async def on_member_join(self, member):
         try:
@@ -157,6 +175,10 @@ class Log(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
+        # with the presences intent this is called for every status and activity change, so skip those quickly
+        if (before.nick == after.nick):
+            return
+
         if (before.nick is None and after.nick is not None):
             await self.bot.messaging.msg_admin_channel(f"{before} added a nickname {after.display_name}", before.guild)
         elif (before.nick is not None and after.nick is None):
@@ -5,16 +5,16 @@ mostly stolen from https://gist.github.com/EvieePy/ab667b74e9758433b3eb806c53a19
 import discord
 from discord.ext import commands
 
-from modules import utils
+from modules import utils, checks, youtubedl
 
 import asyncio
 import itertools
 import re
 import sys
 import traceback
-from functools import partial
+import time
+from urllib.parse import urlparse, parse_qs
 from async_timeout import timeout
-from youtube_dl import YoutubeDL
 from youtube_dl import DownloadError
 
 ytdlopts = {
@@ -32,22 +32,32 @@ ytdlopts = {
     "source_address": "0.0.0.0" # ipv6 addresses cause issues sometimes
 }
 
+# seconds between checks for a new song to prefetch
+PREFETCH_INTERVAL = 5
+
+# refresh a prefetched stream when it's this many seconds from expiring
+PREFETCH_REFRESH_MARGIN = 300
+
+# how long to assume a stream link lasts if it doesn't say
+DEFAULT_STREAM_LIFETIME = 1800
+
 ffmpegopts = {
     "before_options": "-nostdin",
     "options": "-vn"
 }
 
-ytdl = YoutubeDL(ytdlopts)
-
 class VoiceConnectionError(commands.CommandError):
     """Custom Exception class for connection errors."""
 
 class InvalidVoiceChannel(VoiceConnectionError):
     """Exception for cases of invalid Voice Channels."""
 
-class YTDLSource(discord.PCMVolumeTransformer):
+class YTDLSource(discord.AudioSource):
+    """Wraps the audio of a song.
+    If the volume doesn't need to be changed, ffmpeg sends opus straight to discord (copying it from the stream
+    without re-encoding if it's already opus), otherwise it's decoded to pcm so the volume can be changed."""
     def __init__(self, source, *, data, requester):
-        super().__init__(source)
+        self.source = source
         self.requester = requester
 
         self.title = data.get('title')
@@ -65,11 +75,40 @@ class YTDLSource(discord.PCMVolumeTransformer):
         return self.__getattribute__(item)
 
     @classmethod
-    async def create_source(cls, ctx, search: str, *, loop):
-        loop = loop or asyncio.get_event_loop()
+    def create_audio(cls, data: dict, volume: float = 1.0) -> discord.AudioSource:
+        """Creates the audio source for a stream, only decoding it if the volume needs to be changed."""
+        if volume != 1.0:
+            return discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(data['url'], **ffmpegopts), volume=volume)
+
+        codec = "copy" if data.get('acodec') == "opus" else None
+
+        return discord.FFmpegOpusAudio(data['url'], codec=codec, **ffmpegopts)
+
+    def read(self):
+        return self.source.read()
+
+    def is_opus(self):
+        return self.source.is_opus()
 
-        to_run = partial(ytdl.extract_info, url=search, download=False)
-        data = await loop.run_in_executor(None, to_run)
+    def cleanup(self):
+        self.source.cleanup()
+
+    @property
+    def volume(self):
+        """The volume of the song, None if the audio is passed through without being decoded."""
+        if isinstance(self.source, discord.PCMVolumeTransformer):
+            return self.source.volume
+
+        return None
+
+    @volume.setter
+    def volume(self, value: float):
+        if isinstance(self.source, discord.PCMVolumeTransformer):
+            self.source.volume = value
+
+    @classmethod
+    async def create_source(cls, ctx, search: str, *, ytdl: youtubedl.YoutubeDLService):
+        data = await ytdl.extract_info(search)
 
         if 'entries' in data:
             # take first item from a playlist
@@ -78,19 +117,30 @@ class YTDLSource(discord.PCMVolumeTransformer):
         return {'webpage_url': data['webpage_url'], 'requester': ctx.author, 'title': data['title'], "data": data}
 
     @classmethod
-    async def regather_stream(cls, data, *, loop):
+    async def regather_stream(cls, data, *, ytdl: youtubedl.YoutubeDLService, prefetched: dict = None, volume: float = 1.0):
         """Used for preparing a stream, instead of downloading.
-        Since Youtube Streaming links expire."""
-        loop = loop or asyncio.get_event_loop()
+        Since Youtube Streaming links expire, the cached info is only kept for a while.
+        If the stream was already prefetched, its info is used as is."""
         requester = data['requester']
 
-        to_run = partial(ytdl.extract_info, url=data['webpage_url'], download=False)
-        data = await loop.run_in_executor(None, to_run)
+        if prefetched is not None:
+            data = prefetched
+        else:
+            data = await ytdl.extract_info(data['webpage_url'])
 
-        return cls(discord.FFmpegPCMAudio(data['url']), data=data, requester=requester)
+        return cls(cls.create_audio(data, volume=volume), data=data, requester=requester)
+
+    @staticmethod
+    def stream_expiry(data: dict) -> float:
+        """Returns when the stream link in an info dict expires.
+        Youtube puts the expiry time in the link, otherwise assume a default lifetime."""
+        try:
+            return float(parse_qs(urlparse(data['url']).query)['expire'][0])
+        except (KeyError, IndexError, ValueError):
+            return time.time() + DEFAULT_STREAM_LIFETIME
 
 class MusicPlayer:
-    __slots__ = ('bot', '_guild', '_channel', '_cog', 'queue', 'next', 'current')
+    __slots__ = ('bot', '_guild', '_channel', '_cog', 'queue', 'next', 'current', 'prefetched', 'volume')
 
     def __init__(self, ctx):
         self.bot = ctx.bot
@@ -103,6 +153,12 @@ class MusicPlayer:
 
         self.current = None
 
+        # (queued source, its info, when its stream expires) for the song after the current one
+        self.prefetched = None
+
+        # songs are only decoded if this isn't 1
+        self.volume = 1.0
+
         ctx.bot.loop.create_task(self.player_loop())
 
     async def player_loop(self):
@@ -123,7 +179,10 @@ class MusicPlayer:
                 # Source was probably a stream (not downloaded)
                 # So we should regather to prevent stream expiration
                 try:
-                    source = await YTDLSource.regather_stream(source, loop=self.bot.loop)
+                    source = await YTDLSource.regather_stream(source,
+                                                              ytdl=self._cog.ytdl,
+                                                              prefetched=self.take_prefetched(source),
+                                                              volume=self.volume)
                 except Exception as e:
                     await self._channel.send(f'There was an error processing your song.\n'
                                              f'\n`{e}```\n')
@@ -150,12 +209,53 @@ class MusicPlayer:
 
             await self._channel.send(f"Playing **{source.title}**", embed=embed)
 
-            await self.next.wait()
+            # get the next song ready while this one plays
+            prefetch_task = self.bot.loop.create_task(self.prefetch_loop())
+
+            try:
+                await self.next.wait()
+            finally:
+                prefetch_task.cancel()
 
             # Make sure the FFmpeg process is cleaned up.
             source.cleanup()
             self.current = None
 
+    async def prefetch_loop(self):
+        """Resolves the stream of the next song in the queue while the current one plays,
+        so it can start right away. The stream is resolved again if it gets close to expiring."""
+        while True:
+            try:
+                next_source = self.queue._queue[0]
+            except IndexError:
+                next_source = None
+
+            if isinstance(next_source, dict):
+                is_prefetched = (self.prefetched is not None and self.prefetched[0] is next_source)
+
+                if not is_prefetched or self.prefetched[2] - time.time() < PREFETCH_REFRESH_MARGIN:
+                    try:
+                        # skip the cache when refreshing, the cached info has the link that's expiring
+                        data = await self._cog.ytdl.extract_info(next_source['webpage_url'], use_cache=not is_prefetched)
+                    except Exception:
+                        pass # try again next time, or regather normally when the song starts
+                    else:
+                        self.prefetched = (next_source, data, YTDLSource.stream_expiry(data))
+
+            await asyncio.sleep(PREFETCH_INTERVAL)
+
+    def take_prefetched(self, source: dict):
+        """Returns the prefetched info for a source if it's still usable."""
+        prefetched, self.prefetched = self.prefetched, None
+
+        if prefetched is None or prefetched[0] is not source:
+            return None
+
+        if prefetched[2] - time.time() < PREFETCH_REFRESH_MARGIN:
+            return None
+
+        return prefetched[1]
+
     def destroy(self, guild):
         """Disconnect and cleanup the player."""
         return self.bot.loop.create_task(self._cog.cleanup(guild))
@@ -168,6 +268,18 @@ class Media(commands.Cog):
         self.reddit_regex = re.compile(r"((https?:\/\/)?(www.)?)?reddit.com\/r\/\w+\/comments\/([0-9A-Za-z]+)")
         self.reddit_shortlink_regex = re.compile(r"((https?:\/\/)?(www.)?)?redd.it\/([0-9A-Za-z]+)")
 
+        # youtube-dl runs in its own threads and caches what it finds
+        options = self.bot.CONFIG["youtube-dl"]
+        self.ytdl = youtubedl.YoutubeDLService(self.bot.loop,
+                                               ytdlopts,
+                                               options["workers"],
+                                               options["cache_size"],
+                                               options["search_cache_ttl"],
+                                               options["info_cache_ttl"])
+
+    def cog_unload(self):
+        self.ytdl.shutdown()
+
     async def cleanup(self, guild):
         try:
             await guild.voice_client.disconnect()
@@ -254,7 +366,7 @@ class Media(commands.Cog):
         player = self.get_player(ctx)
 
         try:
-            source = await YTDLSource.create_source(ctx, query, loop=self.bot.loop)
+            source = await YTDLSource.create_source(ctx, query, ytdl=self.ytdl)
         except Exception as e:
             error = utils.extract_yt_error(e)
             await ctx.send(f"{ctx.author.mention} Failed to find `{query}`: `{error}`")
@@ -279,6 +391,31 @@ class Media(commands.Cog):
 
         await ctx.send(f"{ctx.author.mention} Skipped **{title}**")
 
+    @commands.command(description="changes the volume of the songs, from 0 to 100",
+                      brief="changes the volume of the songs")
+    async def volume(self, ctx, volume: int = None):
+        vc = ctx.voice_client
+
+        if (not vc or not vc.is_connected()):
+            return await ctx.send(f"{ctx.author.mention} Not connected to voice")
+
+        player = self.get_player(ctx)
+
+        if (volume is None):
+            return await ctx.send(f"{ctx.author.mention} Volume is **{int(player.volume * 100)}%**")
+
+        if (volume < 0 or volume > 100):
+            return await ctx.send(f"{ctx.author.mention} Volume must be between 0 and 100")
+
+        player.volume = volume / 100
+
+        # songs playing without being decoded can't change volume, it'll apply to the next song
+        if (isinstance(vc.source, YTDLSource) and vc.source.volume is not None):
+            vc.source.volume = player.volume
+            await ctx.send(f"{ctx.author.mention} Set the volume to **{volume}%**")
+        else:
+            await ctx.send(f"{ctx.author.mention} Set the volume to **{volume}%**, starting with the next song")
+
     @commands.command(name="queue",
                       description="shows the queued songs",
                       brief="shows the queued songs")
@@ -317,33 +454,40 @@ class Media(commands.Cog):
     async def yt(self, ctx, *, query: str):
         await ctx.trigger_typing()
 
-        search_query = query
+        try:
+            url = await self.ytdl.search(query)
 
-        if (not search_query.startswith("ytsearch:")):
-            search_query = f"ytsearch:{query}"
+            if (not url):
+                await ctx.send(f"{ctx.author.mention} No results found for `{query}`")
+                return
 
-        try:
-            info = ytdl.extract_info(search_query, download=False, process=False)
+            info = await self.ytdl.extract_info(url, process=False)
         except DownloadError as e:
             await ctx.send(f"{ctx.author.mention} Failed to find `{query}`: {e}")
             return
 
-        if (info.get("extractor_key") == "YoutubeSearch"):
-            try:
-                video_id = info.get("entries")[0].get("url")
-
-                if (not video_id):
-                    raise KeyError
-            except (IndexError, KeyError, TypeError):
-                await ctx.send(f"{ctx.author.mention} No results found for `{query}`")
-                return
-            else:
-                url = f"https://youtube.com/watch?v={video_id}"
-                info = ytdl.extract_info(url, download=False, process=False)
-
         embed = utils.create_youtube_embed(info, ctx.author)
         await ctx.send(embed=embed)
 
+    @commands.command(description="youtube-dl stats",
+                      brief="youtube-dl stats",
+                      hidden=True)
+    @commands.check(checks.is_owner)
+    async def ytdlstats(self, ctx):
+        metrics = self.ytdl.get_metrics()
+
+        msg = "```\n"
+
+        for name, value in metrics.items():
+            if (isinstance(value, float)):
+                value = f"{value:.2f}s"
+
+            msg += f"{name.replace('_', ' ')}: {value}\n"
+
+        msg += "```"
+
+        await ctx.send(msg)
+
     @commands.command(description="embeds videos from a reddit post link",
                       brief="embeds videos from a reddit post link",
                       aliases=["rd", "red"])
@@ -13,19 +13,18 @@ class Messages(commands.Cog):
         self.times = {}
         self.cooldown = 2
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if (not message.content or not message.author):
-            return
-        
-        # don't respond to ourselves
-        if (message.author == self.bot.user):
-            return
-
-        # ignore other bots
-        if (message.author.bot):
-            return
-
+        # only messages that might get a reply are passed to on_keyword
+        self.bot.message_router.add_route("Messages",
+                                          r"^\^|^(?:this|f|a)$|thanks for the invite|<@!?[0-9]+>",
+                                          self.on_keyword)
+
+    def cog_unload(self):
+        self.bot.message_router.remove_route("Messages")
+
+    # replies to mentions and keywords
+    # input: message, the message
+    #        content, lowercased content of the message
+    async def on_keyword(self, message: discord.Message, content: str):
         # check if we have perms for the channel
         if (not isinstance(message.channel, discord.channel.DMChannel) and not message.channel.permissions_for(message.channel.guild.me).send_messages):
             return
@@ -45,16 +44,16 @@ class Messages(commands.Cog):
         if (self.bot.user in message.mentions and not message.mention_everyone and not message.content.startswith("!")):
             await self.bot.bot_utils.output_log(message)
             
-            if (self.bot.CONFIG["should_insult"]):
+            if (self.bot.CONFIG.should_insult):
                 insult = await self.bot.misc.get_insult()
                 an = "an" if (insult[0].lower() in "aeiou") else "a"
                 await message.channel.send(f"{message.author.mention} you're {an} {insult}.")
                 return
         
         # respond to "^ this", "this", "^", etc.
-        if (self.bot.CONFIG["should_this"]):
-            if (message.content.startswith("^") or message.content.lower() == "this"):
-                if (message.content == "^" or "this" in message.content.lower()):
+        if (self.bot.CONFIG.should_this):
+            if (message.content.startswith("^") or content == "this"):
+                if (message.content == "^" or "this" in content):
                     this_msg = "^"
                     
                     if (randint(0, 100) < 50):
@@ -64,15 +63,15 @@ class Messages(commands.Cog):
                     await message.channel.send(this_msg)
                     return
 
-        if (message.content.lower() == "f"):
+        if (content == "f"):
             await message.channel.send("F")
             return
 
-        if ("thanks for the invite" in message.content.lower()):
+        if ("thanks for the invite" in content):
             await message.channel.send(f"{message.author.mention} shut the fuck up")
             return
 
-        if (message.content.lower() == "a"):
+        if (content == "a"):
             await message.channel.send(f"{message.author.mention} shut up dex")
             return
 
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 
 from modules import checks, utils
+import asyncio
 import inspect
 import os
 import sys
@@ -10,8 +11,21 @@ import io
 import textwrap
 import traceback
 import humanize
+import re
 from contextlib import redirect_stdout
 from datetime import datetime
+from typing import Optional
+
+# seconds in each unit that !stats windows can use
+STATS_WINDOW_UNITS = {
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60
+}
+
+# max number of commands to list in !stats
+STATS_MAX_ROWS = 25
 
 class Meta(commands.Cog):
     def __init__(self, bot):
@@ -120,7 +134,7 @@ class Meta(commands.Cog):
         await guild.leave()
         await ctx.channel.send("Left `{name}` [{id}]".format(name=guild.name, id=guild.id))
         
-    @cmd.command(description="prints status of cogs",
+    @cmd.command(description="prints status of cogs, with how long each took to import and roughly how much memory it added",
                  brief="prints status of cogs")
     async def cogs(self, ctx):
         loaded_cogs = ""
@@ -128,11 +142,12 @@ class Meta(commands.Cog):
         
         for cog, info in self.bot.loaded_cogs.items():
             if (not info["loaded"]):
-                unloaded_cogs += cog + "\n"
+                deferred = " (waiting for first use)" if (cog in self.bot.cog_loader.deferred) else ""
+                unloaded_cogs += f"{cog}{deferred}\n"
             else:
-                loaded_cogs += cog + "\n"
+                loaded_cogs += f"{cog:<12}{info['import_time'] * 1000:>8.0f}ms {info['rss_delta'] / 1024 / 1024:>+8.1f} MB\n"
                 
-        msg = """Loaded cogs:\n```
+        msg = """Loaded cogs (import time, approx. memory added):\n```
 {loaded_cogs}```
 
 Unloaded cogs:
@@ -142,6 +157,57 @@ Unloaded cogs:
   
         await ctx.send(msg)
 
+    @cmd.command(description="reports memory use and events per second, use it to compare gateway settings in the config",
+                 brief="reports memory use and events per second")
+    async def gateway(self, ctx, seconds: int = 30):
+        seconds = min(max(seconds, 1), 600)
+
+        await ctx.send(f"Counting events for {utils.pluralize(seconds, 'second')}...")
+
+        counter = self.bot.event_counter
+        sample = counter.sample()
+
+        await asyncio.sleep(seconds)
+
+        rates = counter.rates(sample)
+
+        options = self.bot.CONFIG["gateway"]
+        rss = psutil.Process(os.getpid()).memory_info().rss
+
+        lines = [f"intents: {options['intents']} (+{list(options['enable_intents'])}, -{list(options['disable_intents'])})",
+                 f"member cache: {options['member_cache']}, message cache: {options['message_cache_size']}",
+                 f"guilds: {len(self.bot.guilds)}, cached users: {len(self.bot.users)}, cached messages: {len(self.bot.cached_messages)}",
+                 f"memory: {humanize.naturalsize(rss)}",
+                 f"events: {sum(rates.values()):.2f}/s",
+                 ""]
+
+        for name, rate in sorted(rates.items(), key=lambda item: item[1], reverse=True)[:15]:
+            lines.append(f"{name:<28}{rate:>8.2f}/s")
+
+        table = "\n".join(lines)
+
+        await ctx.send(f"```\n{table}```")
+
+    @cmd.command(description="reports how well the image caches are working",
+                 brief="reports image cache hit rates")
+    async def imagecache(self, ctx):
+        image = self.bot.get_cog("Image")
+
+        if (image is None):
+            await ctx.send("Image cog isn't loaded")
+            return
+
+        transforms = image.transform_cache
+        downloads = image.download_cache
+
+        lines = [f"transforms: {len(transforms)} cached, {humanize.naturalsize(transforms.used)} / {humanize.naturalsize(transforms.max_bytes)}",
+                 f"transform hits: {transforms.hits}, misses: {transforms.misses} ({transforms.hit_rate():.1%} hit rate)",
+                 f"downloads: {len(downloads.urls)} urls, {humanize.naturalsize(downloads.memory_used)} in memory, {humanize.naturalsize(downloads.disk_used)} on disk"]
+
+        table = "\n".join(lines)
+
+        await ctx.send(f"```\n{table}```")
+
     @cmd.command(description="load a cog",
                  brief="load a cog")
     async def load(self, ctx, cog: str):
@@ -150,15 +216,12 @@ Unloaded cogs:
             return
         
         try:
-            self.bot.load_extension(self.bot.loaded_cogs[cog]["ext"])
+            await self.bot.cog_loader.load(cog)
             
         except Exception as e:
             await ctx.send("Failed to load cog `{}`: ```{}```".format(cog, e))
             
         else:
-            self.bot.loaded_cogs[cog] = {"ext": self.bot.loaded_cogs[cog]["ext"],
-                                         "loaded": True}
-            
             await ctx.send(f"Loaded `{cog}`")
     
     @cmd.command(description="unload a cog",
@@ -169,15 +232,12 @@ Unloaded cogs:
             return
         
         try:
-            self.bot.unload_extension(self.bot.loaded_cogs[cog]["ext"])
+            self.bot.cog_loader.unload(cog)
             
         except Exception as e:
             await ctx.send(f"Failed to unload cog `{cog}`: ```{e}```")
             
         else:
-            self.bot.loaded_cogs[cog] = {"ext": self.bot.loaded_cogs[cog]["ext"],
-                                         "loaded": False}
-            
             await ctx.send(f"Unloaded `{cog}`")
     
     @cmd.command(description="reload a cog or module",
@@ -186,13 +246,8 @@ Unloaded cogs:
         # reload cog
         if (name in self.bot.loaded_cogs):
             try:
-                self.bot.unload_extension(self.bot.loaded_cogs[name]["ext"])
-                self.bot.loaded_cogs[name] = {"ext": self.bot.loaded_cogs[name]["ext"],
-                                            "loaded": False}
-                
-                self.bot.load_extension(self.bot.loaded_cogs[name]["ext"])
-                self.bot.loaded_cogs[name] = {"ext": self.bot.loaded_cogs[name]["ext"],
-                                            "loaded": True}
+                self.bot.cog_loader.unload(name)
+                await self.bot.cog_loader.load(name)
                 
             except Exception as e:
                 await ctx.send(f"Failed to reload cog `{name}`: ```{e}```")
@@ -342,6 +397,59 @@ Manage Messages **(2FA)**, Read Messages, Send Messages, Embed Links, Attach Fil
 
         await ctx.send(embed=embed)
 
+    # input: window, time span like 30m, 12h, 1d or 2w
+    # output: the span in seconds or None if it's invalid
+    @staticmethod
+    def parse_stats_window(window: str) -> Optional[int]:
+        match = re.match(r"^([0-9]+)([mhdw])$", window.lower())
+
+        if (not match):
+            return None
+
+        return int(match.group(1)) * STATS_WINDOW_UNITS[match.group(2)]
+
+    @commands.command(description="command usage and latency, window is like 30m, 12h, 1d or 2w, scope is guild or all (owner only)",
+                      brief="command usage and latency")
+    @commands.cooldown(1, 5, commands.BucketType.channel)
+    async def stats(self, ctx, window: str = "1d", scope: str = "guild"):
+        seconds = self.parse_stats_window(window)
+
+        if (not seconds):
+            await ctx.send(f"{ctx.author.mention} Invalid window `{window}`, use something like `30m`, `12h`, `1d` or `2w`")
+            return
+
+        # every server's usage is only for the owner
+        if (scope.lower() == "all" and not checks.is_owner(ctx)):
+            await ctx.send(f"{ctx.author.mention} Only the owner can see stats for all servers")
+            return
+
+        if (scope.lower() != "all" and ctx.guild is None):
+            await ctx.send(f"{ctx.author.mention} Use this in a server, or use `all` scope")
+            return
+
+        guild_id = ctx.guild.id if (scope.lower() != "all") else None
+
+        stats = await self.bot.analytics.get_stats(seconds, guild_id)
+
+        if (not stats):
+            await ctx.send(f"{ctx.author.mention} No commands were used in the last {window}")
+            return
+
+        # busiest commands first
+        rows = sorted(stats.items(), key=lambda item: item[1]["count"], reverse=True)[:STATS_MAX_ROWS]
+
+        lines = [f"{'command':<16}{'uses':>6}{'errors':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'ext':>8}"]
+
+        for name, info in rows:
+            lines.append(f"{name[:15]:<16}{info['count']:>6}{info['errors']:>8}"
+                         f"{info['p50'] * 1000:>6.0f}ms{info['p95'] * 1000:>6.0f}ms{info['p99'] * 1000:>6.0f}ms"
+                         f"{info['external_time'] * 1000:>6.0f}ms")
+
+        where = "this server" if (guild_id is not None) else "all servers"
+        table = "\n".join(lines)
+
+        await ctx.send(f"Command stats for the last {window} in {where} (ext is average time spent waiting on external services):\n```\n{table}```")
+
     @commands.command(description="invoke a command and delete the message",
                       brief="invoke a command and delete the message",
                       aliases=["cmd_del", "cd"])
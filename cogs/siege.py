@@ -168,48 +168,79 @@ class UbisoftAPI:
 
         self._rateLimitCooldown = 120
 
-    async def _post(self, url: str, payload: dict, headers: dict = None, is_login: bool = False) -> dict:
+        # caps how many requests can be sent to ubisoft at once
+        self._requestSemaphore = asyncio.Semaphore(kwargs.get("max_concurrent_requests", 8))
+
+        # stops concurrent requests from all logging in again when the session expires
+        self._loginLock = asyncio.Lock()
+
+        # the seasons are loaded the first time they're needed, the lock stops concurrent regions from all loading them
+        self._seasonsData = None
+        self._seasonsLock = asyncio.Lock()
+
+    def _is_rate_limited(self) -> bool:
         if (self.rateLimitedTime > time.time()):
             print(f"Rate limited for {self.rateLimitedTime - time.time():.2f} more seconds")
+            return True
+
+        return False
+
+    # logs in again if the session expired, only once no matter how many requests are waiting
+    async def _refresh_login(self) -> None:
+        async with self._loginLock:
+            if (self._has_expired()):
+                await self.login(relog=True)
+
+    async def _post(self, url: str, payload: dict, headers: dict = None, is_login: bool = False) -> dict:
+        if (self._is_rate_limited()):
             return None
 
         if (self._has_expired() and not is_login):
-            await self.login(relog=True)
+            await self._refresh_login()
         
-        async with self._session.post(url, json=payload, headers=(headers if headers is not None else payload)) as r:
-            try:
-                data = await r.json()
-            except Exception:
+        async with self._requestSemaphore:
+            # we may have been rate limited while waiting for our turn
+            if (self._is_rate_limited()):
                 return None
-            
-            if (r.status == 401):
-                raise UnauthorizedError(data.get("message", "POST Unauthorized error"))
-            
-            return data
+
+            async with self._session.post(url, json=payload, headers=(headers if headers is not None else payload)) as r:
+                try:
+                    data = await r.json()
+                except Exception:
+                    return None
+                
+                if (r.status == 401):
+                    raise UnauthorizedError(data.get("message", "POST Unauthorized error"))
+                
+                return data
 
         return None
 
     async def _get(self, url: str, payload: dict = None, headers: dict = None) -> dict:
-        if (self.rateLimitedTime > time.time()):
-            print(f"Rate limited for {self.rateLimitedTime - time.time():.2f} more seconds")
+        if (self._is_rate_limited()):
             return None
 
+        if (self._has_expired()):
+            await self._refresh_login()
+
+        # read after logging in so the new session headers are used
         if (payload is None):
             payload = self._headers
-
-        if (self._has_expired()):
-            await self.login(relog=True)
         
-        async with self._session.get(url, json=payload, headers=(headers if headers is not None else payload)) as r:
-            try:
-                data = await r.json()
-            except Exception:
+        async with self._requestSemaphore:
+            if (self._is_rate_limited()):
                 return None
-            
-            if (r.status == 401):
-                raise UnauthorizedError(data.get("message", "GET Unauthorized error"))
-            
-            return data
+
+            async with self._session.get(url, json=payload, headers=(headers if headers is not None else payload)) as r:
+                try:
+                    data = await r.json()
+                except Exception:
+                    return None
+                
+                if (r.status == 401):
+                    raise UnauthorizedError(data.get("message", "GET Unauthorized error"))
+                
+                return data
 
         return None
 
@@ -513,8 +544,9 @@ class UbisoftAPI:
         return data
 
     async def getPastSeasonsData(self, profile: dict, region: str="ncsa") -> List[Dict]:
-        if (not hasattr(self, "_seasonsData") or self._seasonsData is None):
-            await self._loadSeasonsData()
+        async with self._seasonsLock:
+            if (self._seasonsData is None):
+                await self._loadSeasonsData()
 
         if (self._seasonsData is None):
             return None
@@ -525,12 +557,17 @@ class UbisoftAPI:
         userID = profile["userId"]
         platform = profile["platformType"]
 
+        # request every season at once, the semaphore in _get keeps this within the concurrency cap
+        season_ids = list(self._seasonsData["seasons"])
+        urls = [f"{self._getRequestUrl(platform)}/r6karma/players?board_id=pvp_ranked&region_id={region}&season_id={season}&profile_ids={userID}"
+                for season in season_ids]
+
+        results = await asyncio.gather(*[self._get(url) for url in urls])
+
         seasons = []
 
-        for season in self._seasonsData["seasons"]:
+        for season, data in zip(season_ids, results):
             season_name = self._seasonsData["seasons"][season]["name"]
-            url = f"{self._getRequestUrl(platform)}/r6karma/players?board_id=pvp_ranked&region_id={region}&season_id={season}&profile_ids={userID}"
-            data = await self._get(url)
 
             if (not data):
                 continue
@@ -555,9 +592,6 @@ class Siege(commands.Cog):
         self.bot = bot
 
         self.SIEGE_CACHE = {}
-        self.siege_think_task = self.bot.loop.create_task(self.siege_think())
-
-        self.paginators = []
 
         try:
             email = self.bot.CONFIG["siege"].get("email")
@@ -567,7 +601,11 @@ class Siege(commands.Cog):
             if (not email and not password and not ticket):
                 raise NoLoginInfo
 
-            self.ubi = UbisoftAPI(self.bot.session, email=email, password=password, ticket=ticket)
+            self.ubi = UbisoftAPI(self.bot.session,
+                                  email=email,
+                                  password=password,
+                                  ticket=ticket,
+                                  max_concurrent_requests=self.bot.CONFIG["siege"]["max_concurrent_requests"])
             self._login_task = self.bot.loop.run_until_complete(self.ubi.login())
         except NoLoginInfo:
             print("No Ubisoft login info provided for Siege stats command, disabling command")
@@ -581,8 +619,19 @@ class Siege(commands.Cog):
             self.siege.enabled = False
 
     def cog_unload(self):
-        self.bot.loop.create_task(self.ubi._session.close())
-        self.siege_think_task.cancel()
+        # the session is owned by the bot, so it's left open for the other cogs
+        for cache in self.SIEGE_CACHE.values():
+            cache["expiry"].cancel()
+
+    # (re)starts the timer that removes a user's cached stats
+    # input: username, the user whose stats are cached
+    def schedule_cache_expiry(self, username: str) -> None:
+        cache = self.SIEGE_CACHE[username]
+
+        if (cache.get("expiry")):
+            cache["expiry"].cancel()
+
+        cache["expiry"] = self.bot.scheduler.schedule(self.bot.CONFIG["siege"]["cache_time"], self.SIEGE_CACHE.pop, username, None)
 
     def create_ranked_embed(self, user: discord.User, profile: dict, rankedData: dict, stats: dict, region_name: str, level: int) -> discord.Embed:
         ranked_embed = discord.Embed(color=discord.Color.red())
@@ -785,8 +834,6 @@ class Siege(commands.Cog):
                 statsData = data["statsData"]
                 operatorData = data["operatorData"]
                 pastSeasonsData = data["pastSeasonsData"]
-
-                self.SIEGE_CACHE[username]["time"] = time.time()
             else:
                 try:
                     profiles = await self.ubi.searchPlayers(username, platform)
@@ -797,18 +844,24 @@ class Siege(commands.Cog):
 
                     profile = profiles[0] # TODO: show list?
 
-                    level = await self.ubi.getLevel(profile)
+                    # everything below only depends on the profile, so fetch it all at once
+                    regions = list(self.ubi._regions)
 
-                    rankedData = {}
-                    pastSeasonsData = {}
+                    results = await asyncio.gather(
+                        self.ubi.getLevel(profile),
+                        self.ubi.getStatsData(profile),
+                        self.ubi.getOperatorStats(profile),
+                        *[self.ubi.getRankData(profile, region) for region in regions],
+                        *[self.ubi.getPastSeasonsData(profile, region) for region in regions]
+                    )
 
-                    for region in self.ubi._regions:
-                        rankedData[region] = await self.ubi.getRankData(profile, region)
-                        pastSeasonsData[region] = await self.ubi.getPastSeasonsData(profile, region)
+                    level, statsData, operatorData = results[:3]
 
-                    statsData = await self.ubi.getStatsData(profile)
+                    rankResults = results[3 : 3 + len(regions)]
+                    pastSeasonsResults = results[3 + len(regions):]
 
-                    operatorData = await self.ubi.getOperatorStats(profile)
+                    rankedData = dict(zip(regions, rankResults))
+                    pastSeasonsData = dict(zip(regions, pastSeasonsResults))
                 except (UnauthorizedError, LoginFailure) as e:
                     await ctx.send(f"{ctx.author.mention} An error occured getting stats for player `{username}` on `{platform}`: {e}")
                     return
@@ -842,7 +895,7 @@ class Siege(commands.Cog):
                 "as": "\N{Regional Indicator Symbol Letter J}\N{Regional Indicator Symbol Letter P}"
             }
             
-            pager = await paginator.create_paginator(
+            await paginator.create_paginator(
                 self.bot,
                 ctx,
                 embeds[list(embeds.keys())[0]],
@@ -855,7 +908,8 @@ class Siege(commands.Cog):
                 expiry_time=60
             )
 
-            self.paginators.append(pager)
+            if (username in self.SIEGE_CACHE):
+                self.SIEGE_CACHE[username]["expiry"].cancel()
 
             self.SIEGE_CACHE[username] = {
                 platform: {
@@ -866,46 +920,10 @@ class Siege(commands.Cog):
                     "operatorData": operatorData,
                     "pastSeasonsData": pastSeasonsData
                 },
-                "time": time.time()
+                "expiry": None
             }
 
-    async def siege_think(self) -> None:
-        await self.bot.wait_until_ready()
-        
-        while (not self.bot.is_closed()):
-            try:
-                # cache
-                siege_cache_copy = self.SIEGE_CACHE.copy()
-                
-                for username, cache in siege_cache_copy.items():
-                    if (time.time() > cache["time"] + self.bot.CONFIG["siege"]["cache_time"]):
-                        del self.SIEGE_CACHE[username]
-                
-                siege_cache_copy.clear()
-
-                # paginator
-                paginator_copy = self.paginators.copy()
-
-                for pager in paginator_copy:
-                    if (pager.has_expired()):
-                        try:
-                            await pager.clear_reactions()
-                        except discord.DiscordException:
-                            pass
-                        
-                        self.paginators.remove(pager)
-
-                paginator_copy.clear()
-
-            except Exception as e:
-                self.bot.bot_utils.log_error_to_file(e)
-            
-            await asyncio.sleep(10)
-
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        for pager in self.paginators:
-            await pager.reaction_hook(reaction, user)
+            self.schedule_cache_expiry(username)
 
 def setup(bot):
     bot.add_cog(Siege(bot))
@@ -3,53 +3,64 @@ from discord.ext import commands
 
 from modules import utils
 
-import aiohttp
 import re
 import random
+import asyncio
 from lxml import html
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 class Steam(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.steam_api_key = self.bot.CONFIG["steam_api_key"]
+        self.steam_api_key = ""
+        self.embeds_enabled = False
+
+        self.apply_config(self.bot.CONFIG)
+        self.bot.config_store.subscribe(self.apply_config, "steam_api_key", "embeds")
 
         self.steam_url_regex = re.compile(r"((https?:\/\/)(www.)?)?(steamcommunity.com\/(?P<type>id|profiles)\/(?P<id>[A-Za-z0-9_-]{2,32}))")
         self.steam_workshop_regex = re.compile(r"((https?:\/\/)(www.)?)?(steamcommunity.com\/sharedfiles\/filedetails\/\?id=([0-9]{10}))")
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if (not self.bot.CONFIG["embeds"]["enabled"] or not self.bot.CONFIG["embeds"]["steam"]):
-            return
-
-        try:
-            if (not message.content or not message.author):
+        # only messages with steam links are passed to on_steam_link
+        self.bot.message_router.add_route("Steam",
+                                          r"steamcommunity\.com/(?:id/|profiles/|sharedfiles/filedetails/)",
+                                          self.on_steam_link,
+                                          enabled=lambda: self.embeds_enabled)
+
+    def cog_unload(self):
+        self.bot.message_router.remove_route("Steam")
+        self.bot.config_store.unsubscribe(self.apply_config)
+
+    # keeps the config values used for every message up to date
+    # input: config, the new config
+    #        changes, what changed, unused
+    def apply_config(self, config, changes=None):
+        self.steam_api_key = config.steam_api_key
+        self.embeds_enabled = config.embeds.enabled and config.embeds.steam
+
+    # embeds steam profiles and workshop items
+    # input: message, the message with the link
+    #        content, lowercased content of the message
+    async def on_steam_link(self, message: discord.Message, content: str):
+        # steam profiles
+        if (self.steam_api_key and self.is_steam_url(content)):
+            embed = await self.create_steam_embed(message.author, content)
+
+            if (embed):
+                await message.channel.send(embed=embed)
+
+        # workshop item
+        if (self.steam_workshop_regex.match(content) is not None):
+            workshop_id = self.steam_workshop_regex.search(content).group(5)
+
+            if (not workshop_id):
                 return
 
-            content = message.content.lower()
-
-            # steam profiles
-            if (self.steam_api_key and self.is_steam_url(content)):
-                embed = await self.create_steam_embed(message.author, content)
-
-                if (embed):
-                    await message.channel.send(embed=embed)
-
-            # workshop item
-            if (self.steam_workshop_regex.match(content) is not None):
-                workshop_id = self.steam_workshop_regex.search(content).group(5)
+            embed = await self.create_workshop_embed(message.author, workshop_id)
 
-                if (not workshop_id):
-                    return
-
-                embed = await self.create_workshop_embed(message.author, workshop_id)
-
-                if (embed):
-                    await message.channel.send(embed=embed)
-
-        except Exception as e:
-            self.bot.bot_utils.log_error_to_file(e, prefix="Steam")
+            if (embed):
+                await message.channel.send(embed=embed)
 
     async def create_workshop_embed(self, author: discord.User, workshop_id: str) -> discord.Embed:
         data = await self.get_workshop_details(workshop_id)
@@ -94,21 +105,20 @@ class Steam(commands.Cog):
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, data=data) as r:
-                    if (r.status != 200):
-                        return None
-                    
-                    summary = await r.json()
-                    
-                    if (summary is None):
-                        return None
+            async with self.bot.session.post(url, data=data) as r:
+                if (r.status != 200):
+                    return None
+                
+                summary = await r.json()
+                
+                if (summary is None):
+                    return None
 
-                    try:
-                        return summary["response"]["publishedfiledetails"][0]
+                try:
+                    return summary["response"]["publishedfiledetails"][0]
 
-                    except KeyError:
-                        return None
+                except KeyError:
+                    return None
         except Exception:
             return None
 
@@ -139,45 +149,43 @@ class Steam(commands.Cog):
 
     async def resolve_vanity_url(self, sid: str) -> Optional[str]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/?key={self.steam_api_key}&vanityurl={sid}") as r:
-                    if (r.status != 200):
+            async with self.bot.session.get(f"http://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/?key={self.steam_api_key}&vanityurl={sid}") as r:
+                if (r.status != 200):
+                    return None
+                
+                summary = await r.json()
+                
+                if (summary is not None):
+                    if ("response" not in summary):
                         return None
                     
-                    summary = await r.json()
+                    if ("steamid" not in summary["response"]):
+                        return None
                     
-                    if (summary is not None):
-                        if ("response" not in summary):
-                            return None
-                        
-                        if ("steamid" not in summary["response"]):
-                            return None
-                        
-                        return summary["response"]["steamid"]
+                    return summary["response"]["steamid"]
             
         except Exception:
             return None
 
     async def get_profile_summary(self, id64: str) -> Optional[str]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/?key={self.steam_api_key}&steamids={id64}") as r:
-                    if (r.status != 200):
+            async with self.bot.session.get(f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/?key={self.steam_api_key}&steamids={id64}") as r:
+                if (r.status != 200):
+                    return None
+                
+                summary = await r.json()
+            
+                if summary is not None:
+                    if ("response" not in summary):
                         return None
                     
-                    summary = await r.json()
-            
-                    if summary is not None:
-                        if ("response" not in summary):
-                            return None
-                        
-                        if ("players" not in summary["response"]):
-                            return None
-                        
-                        if (len(summary["response"]["players"][0]) <= 0):
-                            return None
+                    if ("players" not in summary["response"]):
+                        return None
+                    
+                    if (len(summary["response"]["players"][0]) <= 0):
+                        return None
             
-                        return summary["response"]["players"][0]
+                    return summary["response"]["players"][0]
 
         except Exception:
             return None
@@ -193,12 +201,11 @@ class Steam(commands.Cog):
         return (profile_summary["communityvisibilitystate"] == 3)
 
     async def get_profile_page(self, id64: str) -> Optional[str]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://steamcommunity.com/profiles/%s" % id64) as r:
-                if (r.status != 200):
-                    return None
+        async with self.bot.session.get("https://steamcommunity.com/profiles/%s" % id64) as r:
+            if (r.status != 200):
+                return None
 
-                return await r.text()
+            return await r.text()
 
     async def get_profile_description(self, id64: str, tree: html.HtmlElement) -> Optional[str]:
         try:
@@ -237,72 +244,69 @@ class Steam(commands.Cog):
 
     async def get_games(self, id64: str) -> Optional[List[dict]]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={self.steam_api_key}&steamid={id64}&format=json") as r:
-                    if (r.status != 200):
+            async with self.bot.session.get(f"http://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={self.steam_api_key}&steamid={id64}&format=json") as r:
+                if (r.status != 200):
+                    return None
+                
+                games = await r.json()
+            
+                if games is not None:
+                    if ("response" not in games):
                         return None
                     
-                    games = await r.json()
-            
-                    if games is not None:
-                        if ("response" not in games):
-                            return None
-                        
-                        if ("game_count" not in games["response"] or "games" not in games["response"]):
-                            return None
+                    if ("game_count" not in games["response"] or "games" not in games["response"]):
+                        return None
 
-                        return games["response"]
+                    return games["response"]
 
         except Exception:
             return None
 
     async def get_game_name(self, appid: int) -> Optional[str]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://store.steampowered.com/api/appdetails?appids={appid}") as r:
-                    if (r.status != 200):
-                        return None
+            async with self.bot.session.get(f"http://store.steampowered.com/api/appdetails?appids={appid}") as r:
+                if (r.status != 200):
+                    return None
 
-                    data = await r.json()
+                data = await r.json()
 
-                    if data is None:
-                        return None
+                if data is None:
+                    return None
 
-                    try:
-                        if (not data[appid]["success"]):
-                            return None
-                        
-                        return data[appid]["data"]["name"]
-                    except KeyError:
+                try:
+                    if (not data[appid]["success"]):
                         return None
+                    
+                    return data[appid]["data"]["name"]
+                except KeyError:
+                    return None
 
         except Exception:
             return None
 
     async def get_num_bans(self, id64: str) -> int:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://api.steampowered.com/ISteamUser/GetPlayerBans/v1/?key={self.steam_api_key}&steamids={id64}") as r:
-                    if (r.status != 200):
-                        return 0
-                    
-                    bans = await r.json()
+            async with self.bot.session.get(f"http://api.steampowered.com/ISteamUser/GetPlayerBans/v1/?key={self.steam_api_key}&steamids={id64}") as r:
+                if (r.status != 200):
+                    return 0
+                
+                bans = await r.json()
             
-                    if (bans is None):
-                        return 0
-                    
-                    if (not "players" in bans):
-                        return 0
-                    
-                    if (len(bans) < 1):
-                        return 0
-                    
-                    data = bans["players"][0]
-                    
-                    num_game_bans = int(data["NumberOfGameBans"])
-                    num_vac_bans = int(data["NumberOfVACBans"])
-                            
-                    return (num_game_bans + num_vac_bans)
+                if (bans is None):
+                    return 0
+                
+                if (not "players" in bans):
+                    return 0
+                
+                if (len(bans) < 1):
+                    return 0
+                
+                data = bans["players"][0]
+                
+                num_game_bans = int(data["NumberOfGameBans"])
+                num_vac_bans = int(data["NumberOfVACBans"])
+                        
+                return (num_game_bans + num_vac_bans)
         
         except Exception:
             return 0
@@ -333,27 +337,26 @@ class Steam(commands.Cog):
 
     async def get_account_age(self, id64: str) -> Optional[int]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"https://steamcommunity.com/profiles/{id64}/badges/1") as r:
-                    if (r.status != 200):
-                        return None
-                    
-                    tree = html.fromstring(await r.text())
+            async with self.bot.session.get(f"https://steamcommunity.com/profiles/{id64}/badges/1") as r:
+                if (r.status != 200):
+                    return None
+                
+                tree = html.fromstring(await r.text())
 
-                    path = tree.xpath("//div[@class='badge_description']/text()")
+                path = tree.xpath("//div[@class='badge_description']/text()")
 
-                    if (not path):
-                        return None
+                if (not path):
+                    return None
 
-                    if (isinstance(path, list)):
-                        path = path[0]
+                if (isinstance(path, list)):
+                    path = path[0]
 
-                    date = path.strip().replace("Member since ", "")[:-1]
-                    
-                    now = datetime.now()
-                    age = datetime.strptime(date, "%d %B, %Y")
-                    
-                    return (now.year - age.year) - (1 if now.month < age.month else 0)
+                date = path.strip().replace("Member since ", "")[:-1]
+                
+                now = datetime.now()
+                age = datetime.strptime(date, "%d %B, %Y")
+                
+                return (now.year - age.year) - (1 if now.month < age.month else 0)
         
         except Exception:
             return None
@@ -399,6 +402,72 @@ class Steam(commands.Cog):
 
         return id64
 
+    # loads the profile page and scrapes the info that's only on it
+    # output: dict with the description, number of friends and level or None if the page failed to load
+    async def get_profile_page_info(self, id64: str) -> Optional[dict]:
+        try:
+            profile_page = await self.get_profile_page(id64)
+        except Exception:
+            return None
+
+        if (not profile_page):
+            return None
+
+        tree = html.fromstring(profile_page)
+
+        return {
+            "description": await self.get_profile_description(id64, tree),
+            "num_friends": await self.get_friends(id64, tree),
+            "level": await self.get_level(id64, tree)
+        }
+
+    # finds the number of games owned and the most played game
+    # output: tuple of the number of games, name of the most played game and hours played in it
+    async def get_most_played_game(self, id64: str) -> Tuple[Optional[int], Optional[str], int]:
+        games = await self.get_games(id64)
+
+        game_name = None
+        most_played_game_time = 0
+        num_games = None
+
+        if (not games):
+            return num_games, game_name, most_played_game_time
+
+        # number of games owned
+        if ("game_count" in games):
+            num_games = games["game_count"]
+
+        # find most played  game
+        try:
+            for game in games["games"]:
+                if (int(game["playtime_forever"]) > most_played_game_time):
+                    most_played_game = game["appid"]
+                    most_played_game_time = int(game["playtime_forever"])
+
+            most_played_game_time = round(most_played_game_time / 60) # minutes to hours
+
+            if (most_played_game == 730): # csgo shows as ValveTestApp260 for some reason
+                game_name = "Counter-Strike: Global Offensive"
+            else:
+                game_name = await self.get_game_name(most_played_game)
+        
+        except Exception:
+            game_name = None
+            most_played_game_time = 0
+
+        return num_games, game_name, most_played_game_time
+
+    # gets the result of a finished task
+    # input: task, the task
+    #        default, what to return if the task didn't finish or failed
+    # output: the result or default
+    @staticmethod
+    def get_task_result(task: asyncio.Task, default=None):
+        if (not task.done() or task.cancelled() or task.exception() is not None):
+            return default
+
+        return task.result()
+
     async def create_steam_embed(self, user: discord.User, url: str) -> discord.Embed:
         id64 = await self.extract_id64(url)
 
@@ -408,8 +477,22 @@ class Steam(commands.Cog):
         # get 32-bit steamid
         id32 = self.steamid64_to_32(int(id64))
 
-        # get profile summary
-        profile_summary = await self.get_profile_summary(id64) # profile name gives us "avatarfull" (url to avatar) and "personaname" (username)
+        loop = self.bot.loop
+        deadline = loop.time() + self.bot.CONFIG.embeds.steam_latency_budget
+
+        # everything from here on only needs the id64, so request it all at once
+        # the profile page is requested before we know if the profile is public and thrown away if it isn't
+        summary_task = loop.create_task(self.get_profile_summary(id64)) # profile name gives us "avatarfull" (url to avatar) and "personaname" (username)
+        page_task = loop.create_task(self.get_profile_page_info(id64)) # description, number of friends and account level
+        games_task = loop.create_task(self.get_most_played_game(id64))
+        bans_task = loop.create_task(self.get_num_bans(id64))
+        age_task = loop.create_task(self.get_account_age(id64))
+
+        optional_tasks = [page_task, games_task, bans_task, age_task]
+
+        # the summary is required for the username and avatar, so always wait for it
+        await asyncio.wait([summary_task])
+        profile_summary = self.get_task_result(summary_task)
 
         # get profile username
         if (profile_summary is not None and "personaname" in profile_summary):
@@ -419,58 +502,31 @@ class Steam(commands.Cog):
 
         profile_is_visible = self.is_profile_public(profile_summary)
 
-        description = None
-        num_friends = None
-        level = None
-
         # we can only see this if the profile is public
-        if (profile_is_visible):
-            # load profile page
-            profile_page = await self.get_profile_page(id64)
-
-            tree = html.fromstring(profile_page)
-
-            # get profile description
-            description = await self.get_profile_description(id64, tree) # gives us description
-
-            # get number of friends
-            num_friends = await self.get_friends(id64, tree)
-
-            # account level
-            level = await self.get_level(id64, tree)
+        if (not profile_is_visible):
+            page_task.cancel()
 
-        # get number of games
-        games = await self.get_games(id64)
+        # wait for the rest until the latency budget runs out and leave out whatever is still loading
+        pending = [task for task in optional_tasks if not task.done()]
+        remaining = deadline - loop.time()
 
-        game_name = None
-        most_played_game_time = 0
-        num_games = None
+        if (pending and remaining > 0):
+            await asyncio.wait(pending, timeout=remaining)
 
-        if (games):
-            # number of games owned
-            if ("game_count" in games):
-                num_games = games["game_count"]
+        for task in optional_tasks:
+            if (not task.done()):
+                task.cancel()
 
-            # find most played  game
-            try:
-                for game in games["games"]:
-                    if (int(game["playtime_forever"]) > most_played_game_time):
-                        most_played_game = game["appid"]
-                        most_played_game_time = int(game["playtime_forever"])
+        page_info = self.get_task_result(page_task, {}) or {}
 
-                most_played_game_time = round(most_played_game_time / 60) # minutes to hours
+        description = page_info.get("description")
+        num_friends = page_info.get("num_friends")
+        level = page_info.get("level")
 
-                if (most_played_game == 730): # csgo shows as ValveTestApp260 for some reason
-                    game_name = "Counter-Strike: Global Offensive"
-                else:
-                    game_name = await self.get_game_name(most_played_game)
-            
-            except Exception:
-                game_name = None
-                most_played_game_time = 0
+        num_games, game_name, most_played_game_time = self.get_task_result(games_task, (None, None, 0))
 
         # find number of bans
-        num_bans = await self.get_num_bans(id64)
+        num_bans = self.get_task_result(bans_task, 0)
 
         if (not num_bans):
             num_bans = 0
@@ -478,7 +534,7 @@ class Steam(commands.Cog):
             num_bans = int(num_bans)
 
         # get account age
-        account_age = await self.get_account_age(id64)
+        account_age = self.get_task_result(age_task)
 
         # create the embed
         embed = discord.Embed(color=discord.Color.blue())
@@ -492,7 +548,7 @@ class Steam(commands.Cog):
         if (description):
             embed.description = utils.cap_string_and_ellipsis(description, 240)
 
-        if ("avatarfull" in profile_summary):
+        if (profile_summary and "avatarfull" in profile_summary):
             embed.set_thumbnail(url=profile_summary["avatarfull"])
 
         embed.add_field(name="SteamID64", value=id64)
@@ -4,7 +4,6 @@ from discord.ext import commands
 from modules import checks, utils
 
 import asyncio
-import aiohttp
 from lxml import html
 from urllib.parse import quote
 from http.client import responses
@@ -142,7 +141,7 @@ class Utility(commands.Cog):
                 return
         
         try:
-            result = self.bot.translator.translate(string, dest=language)
+            result = await self.bot.translator.translate(string, dest=language)
         except Exception:
             await ctx.send(f"{ctx.author.mention} Failed to translate text")
             return
@@ -159,15 +158,13 @@ class Utility(commands.Cog):
         headers = {"User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/43.0.2357.134 Safari/537.36"}
         url = f"https://www.google.com/search?q={quote(query)}"  # escape query for url
         
-        conn = aiohttp.TCPConnector(verify_ssl=False) # for https
-        async with aiohttp.ClientSession(connector=conn) as session:
-            async with session.get(url, headers=headers) as r:
-                if (r.status != 200):
-                    await ctx.send(f"{ctx.author.mention} Query for `{query}` failed with status code `{r.status} ({responses[r.status]})` (maybe try again)")
-                    return
-                
-                text = await r.text()
-                
+        async with self.bot.session.get(url, headers=headers, ssl=False) as r: # ssl=False for https
+            if (r.status != 200):
+                await ctx.send(f"{ctx.author.mention} Query for `{query}` failed with status code `{r.status} ({responses[r.status]})` (maybe try again)")
+                return
+            
+            text = await r.text()
+            
         data = {}
         
         tree = html.fromstring(text)
@@ -1,7 +1,6 @@
 import discord
 from discord.ext import commands
 
-import asyncio
 import time
 from enum import Enum
 
@@ -22,17 +21,21 @@ class Vote(commands.Cog):
         self.votes = {}
 
         # dict of muted members where the id is the key
-        # and the time to unmute is the value
+        # and the scheduled unmute is the value
         self.muted_members = {}
 
-        # background task to check when votes expire and when to unmute users
-        self.vote_task = self.bot.loop.create_task(self.vote_think())
-
         # time in seconds to mute users
         self.MUTE_TIME = 60
 
+        # how often in seconds to update the time remaining on a vote
+        self.UPDATE_INTERVAL = 10
+
     def cog_unload(self):
-        self.vote_task.cancel()
+        for vote in self.votes.values():
+            vote["update"].cancel()
+
+        for muted_dict in self.muted_members.values():
+            muted_dict["unmute"].cancel()
 
     @commands.group(description="starts a vote",
                     brief="starts a vote")
@@ -70,20 +73,39 @@ class Vote(commands.Cog):
             await vote_message.add_reaction(emoji)
 
         # add vote to vote list
+        # the deadline uses the scheduler's clock, so the vote closes on the update scheduled for it
+        deadline = time.monotonic() + self.MUTE_TIME
+
         self.votes[vote_message.id] = {
-            "time": time.time() + self.MUTE_TIME,
+            "deadline": deadline,
             "votes": 0,
             "message": vote_message,
             "author": ctx.author,
             "target": user,
-            "type": VoteType.MUTE
+            "type": VoteType.MUTE,
+            "update": self.schedule_vote_update(vote_message.id, deadline)
         }
 
-    def is_valid_reaction(self, emoji: str, message: discord.Message, user: discord.User) -> bool:
-        if (user == self.bot.user):
-            return False
+        self.bot.messaging.register_reaction_handler(vote_message.id, self.vote_reaction_hook)
+
+    # schedules the next update of a vote's time remaining, or when it closes if that comes first
+    # input: message_id, id of the vote message
+    #        deadline, time.monotonic() time the vote closes at
+    # output: the scheduled update
+    def schedule_vote_update(self, message_id: int, deadline: float):
+        return self.bot.scheduler.schedule_at(min(time.monotonic() + self.UPDATE_INTERVAL, deadline), self.update_vote, message_id)
+
+    async def update_vote(self, message_id: int):
+        vote = self.votes.get(message_id)
 
-        if (message.id not in self.votes):
+        if (not vote):
+            return
+
+        if (vote["type"] == VoteType.MUTE):
+            await self.handle_mute(message_id, vote)
+
+    def is_valid_reaction(self, emoji: str, message_id: int) -> bool:
+        if (message_id not in self.votes):
             return False
 
         if (emoji not in self.emojis.values()):
@@ -91,39 +113,34 @@ class Vote(commands.Cog):
 
         return True
 
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
-        message = reaction.message
-        emoji = reaction.emoji
+    # registered with the reaction dispatcher for each vote
+    async def vote_reaction_hook(self, payload: discord.RawReactionActionEvent):
+        message_id = payload.message_id
+        emoji = str(payload.emoji)
 
-        if (not self.is_valid_reaction(emoji, message, user)):
-            return
-
-        if (emoji == self.emojis["yes"]):
-            self.votes[message.id]["votes"] += 1
-        elif (emoji == self.emojis["no"]):
-            self.votes[message.id]["votes"] -= 1
-
-    @commands.Cog.listener()
-    async def on_reaction_remove(self, reaction: discord.Reaction, user: discord.User):
-        message = reaction.message
-        emoji = reaction.emoji
-
-        if (not self.is_valid_reaction(emoji, message, user)):
+        if (not self.is_valid_reaction(emoji, message_id)):
             return
 
         # if the reaction is removed, reverse the vote
+        change = 1 if (payload.event_type == "REACTION_ADD") else -1
+
         if (emoji == self.emojis["yes"]):
-            self.votes[message.id]["votes"] -= 1
+            self.votes[message_id]["votes"] += change
         elif (emoji == self.emojis["no"]):
-            self.votes[message.id]["votes"] += 1
+            self.votes[message_id]["votes"] -= change
 
     async def handle_mute(self, message_id: str, vote: dict):
-        if (vote["time"] < time.time()):
-            await vote["message"].clear_reactions()
+        if (vote["deadline"] <= time.monotonic()):
             total = vote["votes"]
 
+            # close the vote before anything that can fail
             del self.votes[message_id]
+            self.bot.messaging.unregister_reaction_handler(message_id)
+
+            try:
+                await vote["message"].clear_reactions()
+            except discord.HTTPException:
+                pass
 
             embed = self.make_mute_embed(vote["author"], vote["target"], -1)
             await vote["message"].edit(embed=embed)
@@ -138,52 +155,44 @@ class Vote(commands.Cog):
                 except discord.HTTPException as e:
                     await vote["message"].channel.send(f"HTTPException: `{e}`")
 
+                if (vote["target"].id in self.muted_members):
+                    self.muted_members[vote["target"].id]["unmute"].cancel()
+
                 self.muted_members[vote["target"].id] = {
                     "time": time.time() + self.MUTE_TIME,
                     "channel": vote["message"].channel,
-                    "member": vote["target"]
+                    "member": vote["target"],
+                    "unmute": self.bot.scheduler.schedule(self.MUTE_TIME, self.unmute, vote["target"].id)
                 }
             elif (total < 0):
                 await vote["message"].channel.send(f"{vote['author'].mention}'s vote to mute {vote['target'].mention} failed, no action taken")
             else:
                 await vote["message"].channel.send(f"{vote['author'].mention}'s vote to mute {vote['target'].mention} tied, no action taken")
         else:
-            embed = self.make_mute_embed(vote["author"], vote["target"], int(vote["time"] - time.time()))
-            await vote["message"].edit(embed=embed)
+            time_remaining = vote["deadline"] - time.monotonic()
+            vote["update"] = self.schedule_vote_update(message_id, vote["deadline"])
 
-    async def vote_think(self):
-        await self.bot.wait_until_ready()
-
-        while (not self.bot.is_closed()):
-            try:
-                vote_copy = self.votes.copy()
-
-                for message_id, vote in vote_copy.items():
-                    if (vote["type"] == VoteType.MUTE):
-                        await self.handle_mute(message_id, vote)
-
-                vote_copy.clear()
+            embed = self.make_mute_embed(vote["author"], vote["target"], int(time_remaining))
+            await vote["message"].edit(embed=embed)
 
-                muted_members = self.muted_members.copy()
+    async def unmute(self, member_id: int):
+        muted_dict = self.muted_members.pop(member_id, None)
 
-                for member_id, muted_dict in muted_members.items():
-                    if (muted_dict["time"] < time.time()):
-                        await muted_dict["channel"].send(f"{muted_dict['member'].mention}'s mute expired, unmuting")
+        if (not muted_dict):
+            return
 
-                        try:
-                            await vote["target"].edit(mute=False)
-                        except discord.Forbidden:
-                            await muted_dict["channel"].send("I don't have permissions to unmute")
-                        except discord.HTTPException as e:
-                            await muted_dict["channel"].send(f"HTTPException: `{e}`")
-                        except Exception as e:
-                            await muted_dict["channel"].send(f"An error occured unmuting {vote['target']}: ```{e}```")
+        member = muted_dict["member"]
 
-                        del self.muted_members[member_id]
-            except Exception as e:
-                self.bot.bot_utils.log_error_to_file(e)
+        await muted_dict["channel"].send(f"{member.mention}'s mute expired, unmuting")
 
-            await asyncio.sleep(10)
+        try:
+            await member.edit(mute=False)
+        except discord.Forbidden:
+            await muted_dict["channel"].send("I don't have permissions to unmute")
+        except discord.HTTPException as e:
+            await muted_dict["channel"].send(f"HTTPException: `{e}`")
+        except Exception as e:
+            await muted_dict["channel"].send(f"An error occured unmuting {member}: ```{e}```")
 
 def setup(bot):
     bot.add_cog(Vote(bot))
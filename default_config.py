@@ -5,6 +5,22 @@ DEFAULT_CONFIG = {
     # api key for steam (https://steamcommunity.com/dev/apikey)
     "steam_api_key": "",
 
+    # shared http client options
+    "http": {
+        # max number of open connections in total and to a single host
+        "connection_limit": 100,
+        "connection_limit_per_host": 10,
+
+        # time in seconds to keep idle connections open for reuse
+        "keepalive_timeout": 30,
+
+        # time in seconds to cache dns lookups
+        "dns_cache_ttl": 300,
+
+        # default time in seconds before a request is abandoned
+        "timeout": 15
+    },
+
     # image search options
     "image_search": {
         # time in seconds to wait before removing inactive image searches
@@ -12,10 +28,76 @@ DEFAULT_CONFIG = {
 
         # cooldown in seconds in between editing the image search embed when scrolling between pages
         "cooldown_between_updates": 1,
+
+        # max number of search results being checked at once, across every search
+        "max_concurrent_validations": 8,
+
+        # number of pages before and after the current one to check in the background
+        "prefetch_pages": 2,
+
+        # number of searches to remember the results of, and for how long in seconds
+        "results_cache_size": 512,
+        "results_cache_ttl": 3600
+    },
+
+    # image command processing options
+    "image_processing": {
+        # number of worker processes that run image commands
+        "workers": 2,
+
+        # max number of image commands that can wait for a free worker, any more are rejected
+        "max_queued_jobs": 8,
+
+        # time in seconds before an image command is cancelled
+        "job_timeout": 30,
+
+        # max memory in megabytes each worker can use on top of what it uses when it starts, 0 for no limit
+        "worker_memory_limit": 1024,
+
+        # downloaded images are kept in memory unless they're larger than this many megabytes,
+        # then they're written to a temp file instead, 0 to always use temp files
+        "spill_to_disk_size": 4,
+
+        # max megabytes of edited images to keep, so the same edit of the same image is only done once, 0 to disable
+        "transform_cache_size": 64
+    },
+
+    # downloaded images are kept so running several commands on the same image only downloads it once
+    "download_cache": {
+        # max megabytes of images to keep in memory, images smaller than image_processing.spill_to_disk_size are kept here
+        "memory_size": 32,
+
+        # max megabytes of larger images to keep in a temp directory
+        "disk_size": 256,
+
+        # number of urls to remember, 0 to disable the cache
+        "max_urls": 1000,
+
+        # time in seconds before a cached url is checked with the server again,
+        # it's only downloaded again if the server says it changed
+        "revalidate_after": 300
+    },
+
+    # recent messages are remembered so commands that use the last image, text or video in a channel
+    # don't have to search the channel's history
+    "message_index": {
+        # number of channels to remember messages in
+        "max_channels": 1000,
+
+        # number of messages to remember in each channel
+        "messages_per_channel": 100
+    },
+
+    "translation": {
+        # max number of translations to run at once
+        "workers": 8,
+
+        # number of translations to remember
+        "cache_size": 4096
     },
 
     # max number of messages to purge at once
-    "max_purge": 20,
+    "max_purge": 300,
 
     # youtube-dl options
     "youtube-dl": {
@@ -26,7 +108,19 @@ DEFAULT_CONFIG = {
         "max_video_length": 1800,
 
         # where to temporarily store the downloaded mp3s
-        "download_directory": "/tmp/cbot"
+        "download_directory": "/tmp/cbot",
+
+        # max number of videos to look up at once
+        "workers": 4,
+
+        # number of searches and videos to remember
+        "cache_size": 512,
+
+        # seconds to remember which video a search found
+        "search_cache_ttl": 3600,
+
+        # seconds to remember a video's info, keep this well under how long youtube's stream links last (~6 hours)
+        "info_cache_ttl": 1800
     },
 
     # can other people use the !invite command to invite the bot to their own servers
@@ -46,7 +140,11 @@ DEFAULT_CONFIG = {
         "steam": True,
 
         # amazon embeds when a product is linked
-        "amazon": True
+        "amazon": True,
+
+        # max time in seconds to wait for optional steam profile info (friends, level, account age, etc.),
+        # anything that hasn't loaded by then is left out of the embed
+        "steam_latency_budget": 3
     },
 
     # siege cog options
@@ -54,6 +152,9 @@ DEFAULT_CONFIG = {
         # how long to keep siege stats cached in seconds
         "cache_time": 90,
 
+        # max number of requests to send to ubisoft at the same time
+        "max_concurrent_requests": 8,
+
         # email and password for uplay account, used to get ticket
         "email": "",
         "password": "",
@@ -68,6 +169,83 @@ DEFAULT_CONFIG = {
         "log_channel": "admin",
     },
 
+    # error alerts sent to the developer
+    "alerts": {
+        # time in seconds between sending digests of the errors that happened
+        "digest_interval": 60,
+
+        # min time in seconds before the same error is sent again, it's still counted in the meantime
+        "rate_limit": 900,
+
+        # max number of different errors to keep track of
+        "max_alerts": 500
+    },
+
+    # what the bot receives from discord and keeps in memory, changes need a restart
+    "gateway": {
+        # base intents: all, default (everything except members and presences) or none
+        # presences are the biggest source of events and memory, but only !info uses them (to show what someone's playing)
+        "intents": "all",
+
+        # intents to turn on or off on top of the base, e.g. ["presences"]
+        # see https://discordpy.readthedocs.io/en/latest/api.html#discord.Intents
+        "enable_intents": [],
+        "disable_intents": [],
+
+        # which members to keep in memory: all (whatever the intents allow), voice (only members in voice channels),
+        # joined (voice plus members that joined while running) or none
+        "member_cache": "all",
+
+        # number of messages to keep in memory, 0 to disable
+        "message_cache_size": 1000,
+
+        # request every guild's members when connecting, needs the members intent
+        "chunk_guilds_at_startup": True
+    },
+
+    # log options
+    "logging": {
+        # minimum level of discord.py messages to write to discord.log: DEBUG, INFO, WARNING, ERROR or CRITICAL
+        "discord_level": "INFO",
+
+        # max size in MB of discord.log and error.log before they're rotated
+        "max_file_size": 10,
+
+        # number of rotated log files to keep
+        "backup_count": 3,
+
+        # print used commands to the console
+        "console": True
+    },
+
+    # cog loading options
+    "cogs": {
+        # only add a cog's commands at startup and import the cog the first time one is used,
+        # cogs with event listeners are always loaded at startup
+        "lazy_load": False,
+
+        # import the cogs that haven't been used yet in the background after connecting
+        "warm_up": True,
+
+        # time in seconds after connecting to start importing them
+        "warm_up_delay": 10
+    },
+
+    # command stats for !stats
+    "analytics": {
+        # max time in seconds before recorded commands are written to the database
+        "flush_interval": 30,
+
+        # number of recorded commands that are written right away instead of waiting
+        "batch_size": 100,
+
+        # max number of recorded commands to keep in memory if the database can't be written to
+        "max_buffered": 10000,
+
+        # days to keep recorded commands for
+        "retention_days": 30
+    },
+
     "log": {
         "enabled": False,
         "channel_name": "vclog"
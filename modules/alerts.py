@@ -0,0 +1,186 @@
+from modules import enums, utils
+
+import hashlib
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+# this file is for telling the developer about errors without spamming them
+# errors are grouped by a fingerprint of where they happened and what they were,
+# each group is counted and sent in a digest every so often instead of a message per error,
+# and a group is only sent again once its rate limit has passed
+
+# numbers (ids, ports, counts, etc) are replaced so the same error with different values has the same fingerprint
+NUMBER_REGEX = re.compile(r"[0-9]+")
+
+# max characters of an error to include in a digest
+MAX_ERROR_LENGTH = 300
+
+class Alert:
+    __slots__ = ["fingerprint", "caller", "extra", "error", "pending", "total", "last_sent"]
+
+    def __init__(self, fingerprint: str, caller: str, extra: str, error: str):
+        self.fingerprint = fingerprint
+        self.caller = caller
+        self.extra = extra
+
+        # the first error seen with this fingerprint
+        self.error = error
+
+        # number of times it happened since it was last sent
+        self.pending = 0
+        self.total = 0
+
+        self.last_sent: Optional[float] = None
+
+# finds the function that called into the alerts, only looks at one frame instead of the whole stack
+# input: depth, how many frames above the caller of this function to look
+# output: tuple of function name, file name and line number
+def find_caller(depth: int = 1) -> Tuple[str, str, int]:
+    try:
+        frame = sys._getframe(depth + 1)
+    except ValueError:
+        return ("main", "", 0)
+
+    name = frame.f_code.co_name
+
+    if (name == "<module>"):
+        name = "main"
+
+    return (name, os.path.basename(frame.f_code.co_filename), frame.f_lineno)
+
+# input: caller, tuple from find_caller
+#        error, the exception or traceback
+# output: short hash that's the same for the same error from the same place
+def get_fingerprint(caller: Tuple[str, str, int], error: Union[Exception, str]) -> str:
+    if (isinstance(error, BaseException)):
+        kind = type(error).__name__
+        text = str(error)
+    else:
+        # tracebacks end with the exception
+        lines = str(error).strip().splitlines()
+        kind = "str"
+        text = lines[-1] if (lines) else ""
+
+    _name, filename, line = caller
+    key = f"{filename}:{line}:{kind}:{NUMBER_REGEX.sub('#', text)}"
+
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+
+class AlertDigest:
+    # input: bot, the bot
+    #        interval, seconds between digests
+    #        rate_limit, min seconds between sending the same error again
+    #        max_alerts, max number of different errors to remember
+    def __init__(self, bot, interval: float, rate_limit: float, max_alerts: int):
+        self.bot = bot
+
+        self.interval = interval
+        self.rate_limit = rate_limit
+        self.max_alerts = max_alerts
+
+        # fingerprint -> alert, oldest first
+        self.alerts: Dict[str, Alert] = OrderedDict()
+
+        self.scheduled_digest = None
+
+    # counts an error, it's sent with the next digest
+    # input: caller, tuple from find_caller
+    #        error, the exception or traceback
+    #        extra, any extra information to include
+    def add(self, caller: Tuple[str, str, int], error: Union[Exception, str], extra: str = "") -> Alert:
+        fingerprint = get_fingerprint(caller, error)
+        alert = self.alerts.get(fingerprint)
+
+        if (alert is None):
+            alert = Alert(fingerprint, caller[0], extra, str(error))
+            self.alerts[fingerprint] = alert
+
+            if (len(self.alerts) > self.max_alerts):
+                self.alerts.popitem(last=False)
+        else:
+            self.alerts.move_to_end(fingerprint)
+
+        alert.pending += 1
+        alert.total += 1
+
+        if (self.scheduled_digest is None):
+            self.scheduled_digest = self.bot.scheduler.schedule(self.interval, self.send_digest)
+
+        return alert
+
+    # output: the alerts that can be sent now, and if any have to wait for their rate limit
+    def _take_due_alerts(self) -> Tuple[List[Alert], bool]:
+        now = time.monotonic()
+
+        due = []
+        waiting = False
+
+        for fingerprint, alert in list(self.alerts.items()):
+            can_send = (alert.last_sent is None or now - alert.last_sent >= self.rate_limit)
+
+            if (alert.pending == 0):
+                # forget it once it could be sent again anyway
+                if (can_send):
+                    del self.alerts[fingerprint]
+
+                continue
+
+            if (not can_send):
+                waiting = True
+                continue
+
+            due.append(alert)
+
+        return due, waiting
+
+    # output: the digest split into messages short enough to send
+    @staticmethod
+    def format_digest(alerts: List[Alert]) -> List[str]:
+        total = sum(alert.pending for alert in alerts)
+
+        messages = []
+        current = f"Error digest ({utils.pluralize(total, 'error')}, {len(alerts)} unique):"
+
+        for alert in sorted(alerts, key=lambda alert: alert.pending, reverse=True):
+            extra = f" ({alert.extra})" if (alert.extra) else ""
+            error = utils.cap_string_and_ellipsis(alert.error, length=MAX_ERROR_LENGTH, num_lines=10)
+
+            entry = f"\n**{alert.pending}x** {alert.caller}{extra} `[{alert.fingerprint}]`:\n```{error}```"
+
+            if (len(current) + len(entry) > enums.DISCORD_MAX_MESSAGE_LENGTH):
+                messages.append(current)
+                current = entry.lstrip("\n")
+            else:
+                current += entry
+
+        messages.append(current)
+
+        return messages
+
+    # sends the errors that happened since the last digest to the developer
+    async def send_digest(self) -> None:
+        self.scheduled_digest = None
+
+        alerts, waiting = self._take_due_alerts()
+
+        # check again later for errors that were held back by their rate limit
+        if (waiting):
+            self.scheduled_digest = self.bot.scheduler.schedule(self.interval, self.send_digest)
+
+        if (not alerts):
+            return
+
+        messages = self.format_digest(alerts)
+
+        now = time.monotonic()
+
+        for alert in alerts:
+            alert.pending = 0
+            alert.last_sent = now
+
+        for msg in messages:
+            await self.bot.messaging.message_developer(msg)
@@ -0,0 +1,255 @@
+import aiohttp
+
+import asyncio
+import contextvars
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# this file is for recording how long commands take, for !stats
+# every command invocation becomes a record that's kept in memory and written to the database in batches,
+# the database is only touched from one worker thread so the event loop never waits on disk
+
+class CommandRecord:
+    __slots__ = ["time", "guild_id", "command", "started", "wall_time", "external_time", "outcome", "_external_active", "_external_since"]
+
+    def __init__(self, guild_id: Optional[int], command: str):
+        self.time = time.time()
+        self.guild_id = guild_id
+        self.command = command
+
+        self.started = time.monotonic()
+        self.wall_time = 0.0
+
+        # time spent waiting on http requests, translations, youtube-dl, etc
+        # concurrent waits overlap and are only counted once, so it's never more than the wall time
+        self.external_time = 0.0
+
+        self.outcome: Optional[str] = None
+
+        # number of external waits in progress, and when the first of them started
+        self._external_active = 0
+        self._external_since = 0.0
+
+    def begin_external(self) -> None:
+        if (self._external_active == 0):
+            self._external_since = time.monotonic()
+
+        self._external_active += 1
+
+    def end_external(self) -> None:
+        if (self._external_active <= 0):
+            return
+
+        self._external_active -= 1
+
+        if (self._external_active == 0):
+            self.external_time += time.monotonic() - self._external_since
+
+    # stops counting external time, waits that haven't ended are counted up to now
+    def close(self) -> None:
+        if (self._external_active > 0):
+            self._external_active = 1
+            self.end_external()
+
+    def as_row(self) -> tuple:
+        return (self.time, self.guild_id, self.command, self.wall_time, self.external_time, self.outcome)
+
+# record of the command running in the current task, tasks created by the command inherit it
+current_record: contextvars.ContextVar[Optional[CommandRecord]] = contextvars.ContextVar("current_record", default=None)
+
+# adds the time spent in the block to the running command's external time
+@contextmanager
+def track_external():
+    record = current_record.get()
+
+    if (record is None):
+        yield
+        return
+
+    record.begin_external()
+
+    try:
+        yield
+    finally:
+        record.end_external()
+
+async def _on_request_start(session, trace_config_ctx, params):
+    trace_config_ctx.record = current_record.get()
+
+    if (trace_config_ctx.record is not None):
+        trace_config_ctx.record.begin_external()
+
+async def _on_request_done(session, trace_config_ctx, params):
+    record = getattr(trace_config_ctx, "record", None)
+
+    if (record is not None):
+        record.end_external()
+
+# output: trace config that counts the http session's requests as external time
+def create_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_done)
+    trace_config.on_request_exception.append(_on_request_done)
+
+    return trace_config
+
+# input: values, sorted list of values
+#        percent, percentile to find, 0-100
+# output: the value at the percentile, using the nearest rank
+def percentile(values: List[float], percent: float) -> float:
+    if (not values):
+        return 0.0
+
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+
+    return values[rank - 1]
+
+class CommandAnalytics:
+    # input: bot, the bot
+    #        db, sqlite connection, it has to allow being used from other threads
+    #        flush_interval, max seconds a record waits in memory before being written
+    #        batch_size, number of records that causes an early write
+    #        max_buffered, most records to keep in memory if writes are failing, the oldest are dropped
+    #        retention_days, records older than this are deleted
+    def __init__(self, bot, db: sqlite3.Connection, flush_interval: float, batch_size: int, max_buffered: int, retention_days: float):
+        self.bot = bot
+        self.db = db
+
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.retention_days = retention_days
+
+        # one thread, so database access is never concurrent
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics")
+
+        self.buffer: List[CommandRecord] = []
+        self.scheduled_flush = None
+
+        self._flush_lock = asyncio.Lock()
+
+        self.db.execute("""CREATE TABLE IF NOT EXISTS command_stats (
+                           time REAL NOT NULL,
+                           guild_id INTEGER,
+                           command TEXT NOT NULL,
+                           wall_time REAL NOT NULL,
+                           external_time REAL NOT NULL,
+                           outcome TEXT NOT NULL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS command_stats_time ON command_stats (time)")
+        self.db.commit()
+
+    # starts recording a command, the record is used by everything the command awaits
+    # input: ctx, context of the command
+    # output: the record
+    def start(self, ctx) -> CommandRecord:
+        guild_id = ctx.guild.id if (ctx.guild is not None) else None
+
+        record = CommandRecord(guild_id, ctx.command.qualified_name)
+
+        ctx.command_record = record
+        current_record.set(record)
+
+        return record
+
+    # stops recording a command and queues it to be written
+    # input: ctx, context of the command
+    #        outcome, how the command ended (success, error, etc)
+    def finish(self, ctx, outcome: str) -> None:
+        record = getattr(ctx, "command_record", None)
+
+        if (record is None or record.outcome is not None):
+            return
+
+        record.close()
+        record.wall_time = time.monotonic() - record.started
+        record.outcome = outcome
+
+        self.buffer.append(record)
+
+        if (len(self.buffer) > self.max_buffered):
+            del self.buffer[:len(self.buffer) - self.max_buffered]
+
+        if (len(self.buffer) >= self.batch_size):
+            self.bot.loop.create_task(self.flush())
+        elif (self.scheduled_flush is None):
+            self.scheduled_flush = self.bot.scheduler.schedule(self.flush_interval, self.flush)
+
+    def _write_sync(self, rows: List[tuple]) -> None:
+        cutoff = time.time() - self.retention_days * 24 * 60 * 60
+
+        with self.db:
+            self.db.executemany("INSERT INTO command_stats VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.execute("DELETE FROM command_stats WHERE time < ?", (cutoff,))
+
+    # writes the buffered records to the database in one transaction
+    async def flush(self) -> None:
+        if (self.scheduled_flush is not None):
+            self.scheduled_flush.cancel()
+            self.scheduled_flush = None
+
+        async with self._flush_lock:
+            if (not self.buffer):
+                return
+
+            records, self.buffer = self.buffer, []
+
+            try:
+                await self.bot.loop.run_in_executor(self.executor, self._write_sync, [record.as_row() for record in records])
+
+            except Exception as e:
+                # put them back to try again with the next batch
+                self.buffer[:0] = records[-self.max_buffered:]
+                self.bot.bot_utils.log_error_to_file(e, prefix="Analytics")
+
+                if (self.scheduled_flush is None):
+                    self.scheduled_flush = self.bot.scheduler.schedule(self.flush_interval, self.flush)
+
+    def _get_stats_sync(self, since: float, guild_id: Optional[int]) -> Dict[str, dict]:
+        query = "SELECT command, wall_time, external_time, outcome FROM command_stats WHERE time >= ?"
+        params: Tuple = (since,)
+
+        if (guild_id is not None):
+            query += " AND guild_id = ?"
+            params += (guild_id,)
+
+        commands: Dict[str, dict] = {}
+
+        for command, wall_time, external_time, outcome in self.db.execute(query, params):
+            stats = commands.setdefault(command, {"wall_times": [], "external_time": 0.0, "errors": 0})
+
+            stats["wall_times"].append(wall_time)
+            stats["external_time"] += external_time
+
+            if (outcome != "success"):
+                stats["errors"] += 1
+
+        for stats in commands.values():
+            wall_times = sorted(stats.pop("wall_times"))
+
+            stats["count"] = len(wall_times)
+            stats["p50"] = percentile(wall_times, 50)
+            stats["p95"] = percentile(wall_times, 95)
+            stats["p99"] = percentile(wall_times, 99)
+            stats["external_time"] /= len(wall_times)
+
+        return commands
+
+    # input: window, seconds back from now to include
+    #        guild_id, only include commands from this guild, or None for every guild
+    # output: dict of command name -> dict of count, errors, p50, p95, p99 and average external_time
+    async def get_stats(self, window: float, guild_id: Optional[int] = None) -> Dict[str, dict]:
+        # write what's buffered first so the stats are up to date
+        await self.flush()
+
+        return await self.bot.loop.run_in_executor(self.executor, self._get_stats_sync, time.time() - window, guild_id)
+
+    async def close(self) -> None:
+        await self.flush()
+
+        self.executor.shutdown(wait=True)
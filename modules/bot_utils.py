@@ -1,40 +1,46 @@
 import discord
 from discord.ext import commands
 
-from modules import utils
+from modules import utils, message_index, enums, log_queue
 
-from typing import Optional, List
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List, Callable, Tuple
 
 # this file is for utility functions that require access to discord
 
+# seconds to wait between deleting messages that are too old to be bulk deleted
+PURGE_SINGLE_DELETE_DELAY = 1
+
 class BotUtils:
     def __init__(self, bot):
         self.bot = bot
 
-    # writes to a file
-    # input: filename, filename to write to
-    #        mode, what mode to open the file in, r, w, or a
-    #        string, what should be written
-    #        add_time, if should the current time be prepended
-    @staticmethod
-    def write_to_file(filename: str, mode: str, string: str, add_time: bool = False) -> None:
-        if (add_time):
-            string = f"[{utils.get_cur_time()}] {string}"
-        
-        with open(filename, mode) as f:
-            f.write(f"{string}\n")
-        
+        # recent messages in each channel, fed by the message events in cbot.py
+        options = self.bot.CONFIG["message_index"]
+        self.message_index = message_index.MessageIndex(options["max_channels"], options["messages_per_channel"])
+
+        # written to error.log and the console by the log queue's thread, see log_queue.py
+        self.error_logger = logging.getLogger(log_queue.ERROR_LOGGER)
+        self.command_logger = logging.getLogger(log_queue.COMMAND_LOGGER)
+        self.alert_logger = logging.getLogger(log_queue.ALERT_LOGGER)
+
     # logs an error to file
     def log_error_to_file(self, error: str, prefix: str = "") -> None:
         if (prefix):
-            error = f"[{prefix}] {error}"
-
-        self.write_to_file(self.bot.ERROR_FILEPATH, "a", error, add_time=True)
+            self.error_logger.error("[%s] %s", prefix, error)
+        else:
+            self.error_logger.error("%s", error)
         
+    # logs an error the developer is alerted about to file and the console
+    def log_alert(self, error: str, prefix: str) -> None:
+        self.alert_logger.error("[%s] %s", prefix, error)
+
     # prints a message
     async def output_log(self, message: discord.Message) -> None:
         try:
-            print(utils.format_log_message(message))
+            self.command_logger.info("%s", utils.format_log_message(message))
         
         except Exception as e:
             await self.bot.messaging.error_alert(e, extra="on_command")
@@ -59,12 +65,40 @@ class BotUtils:
         guild = str(guild)
         return discord.utils.get(self.bot.get_all_channels(), guild__name=guild, name=name)
     
+    # searches the recent message index before a message
+    # input: channel, channel to search
+    #        before, message to search before or None to search from the newest message
+    #        check, function that returns what we're looking for from an indexed message or None
+    #        limit, max number of messages to search or None for no limit
+    # output: a tuple of what was found or None, where a search of the channel's history should continue from,
+    #         and how many messages can still be searched (None for no limit)
+    def search_message_index(self, channel: discord.abc.Messageable, before: Optional[discord.Message],
+                             check: Callable[[message_index.IndexedMessage], Optional[str]],
+                             limit: Optional[int] = None) -> Tuple[Optional[str], Optional[discord.abc.Snowflake], Optional[int]]:
+        result, oldest, num_searched = self.message_index.search(channel.id, before.id if (before) else None, check, limit=limit)
+
+        if (oldest is not None):
+            before = discord.Object(id=oldest)
+
+        if (limit is not None):
+            limit -= num_searched
+
+        return result, before, limit
+
     # find last embed in channel
     # input: channel, channel to search for embeds
     #        embed_type, type of embed to search for, video or image
     # output: url of the embed or None if not found
     async def find_last_embed(self, channel: discord.abc.GuildChannel) -> Optional[str]:
-        async for message in channel.history():
+        embed, before, limit = self.search_message_index(channel, None, lambda m: m.image_embed, limit=100)
+
+        if (embed):
+            return embed
+
+        if (limit <= 0):
+            return None
+
+        async for message in channel.history(before=before, limit=limit):
             embed = utils.find_image_embed(message)
     
             if (embed):
@@ -75,8 +109,16 @@ class BotUtils:
     # finds last image in channel
     # input: message, message from which channel will be extracted and point to search before
     # output: url of image found or None if no images were found
-    async def find_last_image(self, message: discord.Message) -> Optional[str]:        
-        async for message in message.channel.history(before=message):
+    async def find_last_image(self, message: discord.Message) -> Optional[str]:
+        image, before, limit = self.search_message_index(message.channel, message, lambda m: m.image, limit=100)
+
+        if (image):
+            return image
+
+        if (limit <= 0):
+            return None
+
+        async for message in message.channel.history(before=before, limit=limit):
             attachments = utils.find_attachment(message)
             
             if (attachments):
@@ -93,7 +135,15 @@ class BotUtils:
     # input: message, message from which channel will be used as point to search before
     # output: text of message or None if no text messages were found
     async def find_last_text(self, message: discord.Message) -> Optional[str]:
-        async for message in message.channel.history(before=message):
+        text, before, limit = self.search_message_index(message.channel, message, lambda m: m.content, limit=100)
+
+        if (text):
+            return text
+
+        if (limit <= 0):
+            return None
+
+        async for message in message.channel.history(before=before, limit=limit):
             if (message.content):
                 return message.content
             
@@ -101,20 +151,40 @@ class BotUtils:
     # input: message, message from which channel will be used as point to search before
     # output: url of youtube embed or None if no youtube video embeds were found
     async def find_last_youtube_embed(self, message: discord.Message) -> Optional[str]:
-        async for message in message.channel.history(before=message, limit=50):
-            if (message.embeds):
-                for embed in message.embeds:                    
-                    if (embed.type == "video" or embed.video):
-                        if (embed.provider.name == "YouTube"):
-                            return embed.url
-                    elif (utils.youtube_url_validation(embed.url)):
-                        return embed.url
+        url, before, limit = self.search_message_index(message.channel, message, lambda m: m.youtube, limit=50)
+
+        if (url):
+            return url
+
+        if (limit <= 0):
+            return None
+
+        async for message in message.channel.history(before=before, limit=limit):
+            url = utils.find_youtube_in_embeds(message.embeds)
+
+            if (url):
+                return url
 
     # finds the last message sent before the command message
     # input: message, the message to search before
     # output: the message if found or None
     async def find_last_message(self, message: discord.Message) -> Optional[discord.Message]:
-        async for message in message.channel.history(before=message, limit=1):
+        message_id, before, limit = self.search_message_index(message.channel, message, lambda m: m.id, limit=1)
+
+        # the index only knows the id, try to get the full message from the client's message cache
+        if (message_id):
+            cached = discord.utils.find(lambda m: m.id == message_id, reversed(self.bot.cached_messages))
+
+            if (cached):
+                return cached
+
+            before = discord.Object(id=message_id + 1)
+            limit = 1
+
+        if (limit <= 0):
+            return None
+
+        async for message in message.channel.history(before=before, limit=limit):
             return message
 
         return None
@@ -123,40 +193,112 @@ class BotUtils:
     # input: message, message to delete
     # output: success of the operation
     async def delete_message(self, message: discord.Message) -> bool:
-        channel = message.channel
-                
-        if (isinstance(channel, discord.abc.PrivateChannel) and message.author != self.bot.user):
+        if (not self.can_delete_message(message)):
             return False
-        elif (channel.permissions_for(message.guild.me).manage_messages):
-            try:
-                await message.delete()
-                return True
-            
-            except Exception:
-                return False
+
+        try:
+            await message.delete()
+            return True
         
-        return False
+        except Exception:
+            return False
+
+    # checks if we're allowed to delete a message, without making a request
+    # input: message, the message
+    # output: if delete_message would try to delete it
+    def can_delete_message(self, message: discord.Message) -> bool:
+        channel = message.channel
+
+        if (isinstance(channel, discord.abc.PrivateChannel)):
+            return (message.author == self.bot.user)
+
+        return channel.permissions_for(message.guild.me).manage_messages
             
     # deletes a number messages from a channel by user
+    # messages newer than 14 days are deleted in bulk, older ones have to be deleted one at a time
     # input: ctx, context to reference
     #        num_to_delete, number of messages to delete
     #        users, list of users to delete messages from or None to delete regardless of author
     # output: number of messages successfully deleted
     async def purge(self, ctx: commands.Context, num_to_delete: int, users: List[discord.User]) -> int:
         num_to_delete = abs(num_to_delete)
+        num_found = 0
         num_deleted = 0
-    
-        async for message in ctx.channel.history(before=ctx.message, limit=500):
-            if (num_deleted >= num_to_delete):
+
+        channel = ctx.channel
+        can_bulk_delete = (isinstance(channel, discord.TextChannel) and channel.permissions_for(channel.guild.me).manage_messages)
+
+        # messages with ids lower than this are too old to bulk delete, leave a minute of leeway for clock drift
+        min_bulk_id = discord.utils.time_snowflake(datetime.utcnow() - timedelta(seconds=enums.DISCORD_MAX_BULK_DELETE_AGE - 60))
+
+        batch = []
+        old_messages = []
+
+        # search further back if only some messages can be deleted
+        search_limit = num_to_delete if (can_bulk_delete and not users) else max(500, num_to_delete * 5)
+
+        # messages are deleted while we search, deleting ones we've already passed doesn't affect the search
+        async for message in channel.history(before=ctx.message, limit=search_limit):
+            if (num_found >= num_to_delete):
                 break
             
-            if (not users or message.author in users):
-                success = await self.delete_message(message)
-                
-                if (success):
-                    num_deleted += 1
+            if (users and message.author not in users):
+                continue
+
+            # we can only delete our own messages in private channels
+            if (isinstance(channel, discord.abc.PrivateChannel) and message.author != self.bot.user):
+                continue
+
+            num_found += 1
+
+            if (can_bulk_delete and message.id > min_bulk_id):
+                batch.append(message)
+
+                if (len(batch) >= enums.DISCORD_MAX_BULK_DELETE):
+                    num_deleted += await self.bulk_delete_messages(channel, batch)
+                    batch = []
+            else:
+                old_messages.append(message)
+
+        if (batch):
+            num_deleted += await self.bulk_delete_messages(channel, batch)
+
+        for message in old_messages:
+            # only wait after deletes that make a request
+            if (not self.can_delete_message(message)):
+                continue
+
+            if (await self.delete_message(message)):
+                num_deleted += 1
+
+            # pace single deletes so we don't run straight into the rate limit
+            await asyncio.sleep(PURGE_SINGLE_DELETE_DELAY)
             
         return num_deleted
+
+    # deletes up to 100 messages from a channel in one request, falling back to deleting them one at a time if it fails
+    # input: channel, channel the messages are in
+    #        messages, messages to delete
+    # output: number of messages successfully deleted
+    async def bulk_delete_messages(self, channel: discord.TextChannel, messages: List[discord.Message]) -> int:
+        try:
+            # delete_messages needs at least 2 messages to use the bulk endpoint, it deletes a single message normally
+            await channel.delete_messages(messages)
+            return len(messages)
+
+        except discord.errors.HTTPException:
+            num_deleted = 0
+
+            for message in messages:
+                if (not self.can_delete_message(message)):
+                    continue
+
+                if (await self.delete_message(message)):
+                    num_deleted += 1
+
+                await asyncio.sleep(PURGE_SINGLE_DELETE_DELAY)
+
+            return num_deleted
     
     # find a guild from the ones we are currently in
     # input: search, string to search for, either part/all of guild name or index in list of guilds
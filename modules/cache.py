@@ -0,0 +1,166 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# this file is for in-memory caches shared by the cogs and modules
+
+# least recently used cache with an optional time to live
+# when the cache is full, the entry that was used the longest time ago is removed
+class LRUCache:
+    # input: max_size, max number of entries to keep
+    #        ttl, seconds before an entry expires or None to keep entries until they're evicted
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # key -> (expiry time, value), ordered from least to most recently used
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._get_entry(key) is not None
+
+    # gets an entry if it exists and hasn't expired
+    # input: key, key of the entry
+    # output: the (expiry, value) tuple of the entry or None
+    def _get_entry(self, key: Hashable) -> Optional[tuple]:
+        entry = self._entries.get(key)
+
+        if (entry is None):
+            return None
+
+        expiry = entry[0]
+
+        if (expiry is not None and expiry <= time.monotonic()):
+            del self._entries[key]
+            return None
+
+        return entry
+
+    # gets a value from the cache and marks it as recently used
+    # input: key, key of the value
+    #        default, what to return if the key isn't cached
+    # output: the cached value or default
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._get_entry(key)
+
+        if (entry is None):
+            return default
+
+        self._entries.move_to_end(key)
+
+        return entry[1]
+
+    # adds a value to the cache, evicting the least recently used values if it's full
+    # input: key, key of the value
+    #        value, value to cache
+    def set(self, key: Hashable, value: Any) -> None:
+        if (self.max_size <= 0):
+            return
+
+        expiry = (time.monotonic() + self.ttl) if (self.ttl is not None) else None
+
+        self._entries[key] = (expiry, value)
+        self._entries.move_to_end(key)
+
+        while (len(self._entries) > self.max_size):
+            self._entries.popitem(last=False)
+
+    # replaces a value that's already cached without changing when it expires
+    # input: key, key of the value
+    #        value, the new value
+    # output: if the value was cached
+    def update(self, key: Hashable, value: Any) -> bool:
+        entry = self._get_entry(key)
+
+        if (entry is None):
+            return False
+
+        self._entries[key] = (entry[0], value)
+
+        return True
+
+    # removes a value from the cache
+    # input: key, key of the value
+    # output: the removed value or None if it wasn't cached
+    def pop(self, key: Hashable) -> Any:
+        entry = self._entries.pop(key, None)
+
+        return entry[1] if (entry is not None) else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+# least recently used cache limited by the total size of its values instead of the number of entries
+# it counts hits and misses, to see if it's worth its memory
+class SizedLRUCache:
+    # input: max_bytes, max total size of the values to keep
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+        # key -> (size, value), ordered from least to most recently used
+        self._entries = OrderedDict()
+
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # gets a value from the cache and marks it as recently used
+    # input: key, key of the value
+    # output: the cached value or None
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+
+        if (entry is None):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+
+        return entry[1]
+
+    # adds a value to the cache, evicting the least recently used values until it fits
+    # input: key, key of the value
+    #        value, value to cache
+    #        size, size of the value in bytes, values larger than the whole cache aren't added
+    def set(self, key: Hashable, value: Any, size: int) -> None:
+        if (size > self.max_bytes):
+            return
+
+        self.pop(key)
+
+        self._entries[key] = (size, value)
+        self.used += size
+
+        while (self.used > self.max_bytes):
+            _key, (old_size, _value) = self._entries.popitem(last=False)
+            self.used -= old_size
+
+    # removes a value from the cache
+    # input: key, key of the value
+    # output: the removed value or None if it wasn't cached
+    def pop(self, key: Hashable) -> Any:
+        entry = self._entries.pop(key, None)
+
+        if (entry is None):
+            return None
+
+        self.used -= entry[0]
+
+        return entry[1]
+
+    # output: fraction of lookups that were hits
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+
+        return (self.hits / lookups) if (lookups > 0) else 0.0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.used = 0
@@ -0,0 +1,294 @@
+import discord
+from discord.ext import commands
+
+from modules import utils
+
+import ast
+import asyncio
+import glob
+import importlib
+import os
+import psutil
+import time
+from typing import Dict, List, Optional, Set
+
+# this file is for loading cogs, either all at startup or lazily
+# when loading lazily, each cog's source is parsed (not imported) to find its commands and placeholder commands are added,
+# the cog and its heavy dependencies (nltk, wand, youtube-dl, etc) are only imported when one of its commands is used
+# or in the background once the bot has connected
+# cogs with event listeners or message routes are always loaded at startup since they need to see events right away,
+# and so are cogs that run the event loop themselves when they're created, since that only works before it's running
+
+# the kwargs of a command decorator that are copied to its placeholder
+STUB_COMMAND_KWARGS = ["name", "aliases", "description", "brief", "hidden"]
+
+class CogMetadata:
+    __slots__ = ["name", "ext", "commands", "imports", "needs_eager"]
+
+    def __init__(self, name: str, ext: str):
+        self.name = name
+        self.ext = ext
+
+        # kwargs to create a placeholder for each top level command
+        self.commands: List[dict] = []
+
+        # modules the cog imports at the top level
+        self.imports: List[str] = []
+
+        # does the cog need to be loaded at startup
+        self.needs_eager = False
+
+# top level statements of a module, including the ones in try and if blocks
+def _top_level_statements(body: List[ast.stmt]) -> List[ast.stmt]:
+    statements = []
+
+    for node in body:
+        statements.append(node)
+
+        if (isinstance(node, ast.Try)):
+            statements.extend(_top_level_statements(node.body))
+        elif (isinstance(node, ast.If)):
+            statements.extend(_top_level_statements(node.body + node.orelse))
+
+    return statements
+
+# reads what's needed to lazily load a cog from its source, without running it
+# input: path, path to the cog's file
+#        ext, the cog's extension name
+# output: the cog's metadata
+def read_metadata(path: str, ext: str) -> CogMetadata:
+    metadata = CogMetadata(os.path.basename(path).replace(".py", ""), ext)
+
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    for node in _top_level_statements(tree.body):
+        if (isinstance(node, ast.Import)):
+            metadata.imports.extend(alias.name for alias in node.names)
+
+        elif (isinstance(node, ast.ImportFrom) and node.level == 0 and node.module):
+            metadata.imports.append(node.module)
+
+            # the names could be submodules, e.g. from modules import utils
+            metadata.imports.extend(f"{node.module}.{alias.name}" for alias in node.names)
+
+    for node in ast.walk(tree):
+        # listeners, message routes, loop.run_until_complete, etc
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in ["listener", "add_route", "add_listener", "run_until_complete"]):
+            metadata.needs_eager = True
+
+        if (not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))):
+            continue
+
+        for decorator in node.decorator_list:
+            if (not isinstance(decorator, ast.Call) or not isinstance(decorator.func, ast.Attribute)):
+                continue
+
+            # only top level commands, subcommands are decorated with their group instead (e.g. @cmd.command)
+            func = decorator.func
+
+            if (func.attr not in ["command", "group"] or not isinstance(func.value, ast.Name) or func.value.id != "commands"):
+                continue
+
+            kwargs = {"name": node.name}
+
+            for keyword in decorator.keywords:
+                if (keyword.arg not in STUB_COMMAND_KWARGS):
+                    continue
+
+                try:
+                    kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+                except ValueError:
+                    pass
+
+            metadata.commands.append(kwargs)
+
+    return metadata
+
+# imports a module if it exists, used to import a cog's dependencies in a thread
+def _try_import(name: str) -> None:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        pass
+
+async def _stub_callback(ctx, *args):
+    raise commands.CommandError(f"Command `{ctx.command}` isn't loaded yet")
+
+class CogLoader:
+    def __init__(self, bot, cog_path: str, lazy: bool):
+        self.bot = bot
+        self.lazy = lazy
+
+        self.process = psutil.Process(os.getpid())
+
+        self.metadata: Dict[str, CogMetadata] = {}
+
+        # cog name -> dict of ext, loaded, import_time and rss_delta
+        # rss_delta is only approximate, it's how much the whole process grew while the cog was loaded
+        self.cogs: Dict[str, dict] = {}
+
+        # stops a cog from being loaded twice when its commands are used at the same time
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+        # cogs waiting to be loaded on first use or by the warm up
+        self.deferred: Set[str] = set()
+
+        self.warmed_up = False
+
+        for path in sorted(glob.glob(cog_path + "*.py")):
+            cog_name = os.path.basename(path).replace(".py", "")
+            ext = "cogs." + cog_name
+
+            self.cogs[cog_name] = {"ext": ext, "loaded": False, "import_time": None, "rss_delta": None}
+
+            if (not self.lazy):
+                continue
+
+            try:
+                self.metadata[cog_name] = read_metadata(path, ext)
+            except Exception as e:
+                print("\tFailed to read cog \"{}\" ({}), it will be loaded now".format(ext, e))
+
+    # loads every cog, or only the ones that can't wait when loading lazily
+    def load_startup_cogs(self) -> None:
+        for i, (cog_name, info) in enumerate(self.cogs.items()):
+            metadata = self.metadata.get(cog_name)
+
+            if (metadata is not None and not metadata.needs_eager):
+                self.add_stubs(cog_name)
+                self.deferred.add(cog_name)
+                print("\tDeferred cog {}/{}: {} ({})".format(i + 1, len(self.cogs), info["ext"], utils.pluralize(len(metadata.commands), "command")))
+                continue
+
+            rss = self.process.memory_info().rss
+            started = time.perf_counter()
+
+            try:
+                self.bot.load_extension(info["ext"])
+            except Exception as e:
+                print("\tFailed to load cog \"{}\" ({})".format(info["ext"], e))
+            else:
+                self._set_loaded(cog_name, time.perf_counter() - started, rss)
+                print("\tLoaded cog {}/{}: {}".format(i + 1, len(self.cogs), info["ext"]))
+
+    # input: cog_name, name of the cog
+    #        import_time, seconds spent importing and loading it
+    #        rss, the process's rss before it was loaded
+    def _set_loaded(self, cog_name: str, import_time: float, rss: int) -> None:
+        info = self.cogs[cog_name]
+
+        info["loaded"] = True
+        info["import_time"] = import_time
+        info["rss_delta"] = self.process.memory_info().rss - rss
+
+    # input: command, the command
+    # output: name of the cog the command is a placeholder for, or None if it's a real command
+    @staticmethod
+    def get_stub_cog(command: commands.Command) -> Optional[str]:
+        return getattr(command, "lazy_cog", None)
+
+    # adds placeholder commands for a cog that hasn't been loaded
+    # input: cog_name, name of the cog
+    def add_stubs(self, cog_name: str) -> None:
+        for kwargs in self.metadata[cog_name].commands:
+            command = commands.Command(_stub_callback, **kwargs)
+            command.lazy_cog = cog_name
+
+            try:
+                self.bot.add_command(command)
+            except discord.ClientException:
+                pass
+
+    # removes a cog's placeholder commands
+    # input: cog_name, name of the cog
+    def remove_stubs(self, cog_name: str) -> None:
+        metadata = self.metadata.get(cog_name)
+
+        if (metadata is None):
+            return
+
+        for kwargs in metadata.commands:
+            command = self.bot.get_command(kwargs["name"])
+
+            if (command is not None and self.get_stub_cog(command) == cog_name):
+                self.bot.remove_command(command.name)
+
+    # loads a cog, its dependencies are imported in a thread first so the event loop isn't blocked for long
+    # input: cog_name, name of the cog
+    async def load(self, cog_name: str) -> None:
+        lock = self._locks.setdefault(cog_name, asyncio.Lock())
+
+        async with lock:
+            info = self.cogs[cog_name]
+
+            if (info["loaded"]):
+                return
+
+            rss = self.process.memory_info().rss
+            import_time = 0.0
+
+            metadata = self.metadata.get(cog_name)
+
+            if (metadata is not None):
+                # timed in the thread, so time spent waiting for the executor isn't counted
+                import_time = await self.bot.loop.run_in_executor(None, self._import_dependencies, metadata)
+
+            self.remove_stubs(cog_name)
+
+            started = time.perf_counter()
+
+            try:
+                self.bot.load_extension(info["ext"])
+            except Exception:
+                # put the placeholders back so the commands are still there to try again
+                if (cog_name in self.deferred):
+                    self.add_stubs(cog_name)
+
+                raise
+
+            self.deferred.discard(cog_name)
+            self._set_loaded(cog_name, import_time + time.perf_counter() - started, rss)
+
+    # output: seconds it took to import them
+    @staticmethod
+    def _import_dependencies(metadata: CogMetadata) -> float:
+        started = time.perf_counter()
+
+        for name in metadata.imports:
+            _try_import(name)
+
+        return time.perf_counter() - started
+
+    # unloads a cog, its commands are gone until it's loaded again
+    # input: cog_name, name of the cog
+    def unload(self, cog_name: str) -> None:
+        info = self.cogs[cog_name]
+
+        self.remove_stubs(cog_name)
+        self.deferred.discard(cog_name)
+
+        if (info["loaded"]):
+            self.bot.unload_extension(info["ext"])
+
+        info["loaded"] = False
+
+    # loads the cogs that haven't been used yet, one at a time
+    # input: delay, seconds to wait before starting
+    async def warm_up(self, delay: float) -> None:
+        if (self.warmed_up):
+            return
+
+        self.warmed_up = True
+
+        await asyncio.sleep(delay)
+
+        for cog_name in sorted(self.deferred):
+            # it may have been loaded or unloaded while waiting
+            if (cog_name not in self.deferred):
+                continue
+
+            try:
+                await self.load(cog_name)
+            except Exception as e:
+                self.bot.bot_utils.log_error_to_file(e, prefix="CogLoader")
@@ -0,0 +1,289 @@
+import default_config
+
+import asyncio
+import importlib
+import os
+import tempfile
+import yaml
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# this file is for the bot's config
+# the config is an immutable snapshot that's read with attributes (config.embeds.enabled) or keys (config["youtube-dl"]),
+# changing it builds a new snapshot that shares the unchanged sections with the old one and swaps it in all at once,
+# so a snapshot that's been read never changes halfway through being used
+# cogs that keep values from the config can subscribe to be told when they change
+
+# config key, e.g. embeds.enabled -> (old value, new value)
+ConfigChanges = Dict[str, Tuple[Any, Any]]
+
+class ConfigSnapshot:
+    # input: data, dict of the config values, nested dicts become snapshots too
+    def __init__(self, data: dict):
+        for key, value in data.items():
+            object.__setattr__(self, key, _freeze(value))
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError("The config can't be changed directly, use ConfigStore.patch")
+
+    def __delattr__(self, key: str):
+        raise AttributeError("The config can't be changed directly, use ConfigStore.patch")
+
+    # for keys that aren't valid attribute names, e.g. config["youtube-dl"]
+    def __getitem__(self, key: str) -> Any:
+        return self.__dict__[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__dict__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__dict__)
+
+    def __len__(self) -> int:
+        return len(self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot({self.to_dict()})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.__dict__.get(key, default)
+
+    def keys(self):
+        return self.__dict__.keys()
+
+    def items(self):
+        return self.__dict__.items()
+
+    # output: a mutable copy as plain dicts and lists
+    def to_dict(self) -> dict:
+        return {key: _thaw(value) for key, value in self.__dict__.items()}
+
+def _freeze(value: Any) -> Any:
+    if (isinstance(value, dict)):
+        return ConfigSnapshot(value)
+    elif (isinstance(value, (list, tuple))):
+        return tuple(_freeze(v) for v in value)
+
+    return value
+
+def _thaw(value: Any) -> Any:
+    if (isinstance(value, ConfigSnapshot)):
+        return value.to_dict()
+    elif (isinstance(value, tuple)):
+        return [_thaw(v) for v in value]
+
+    return value
+
+# input: data, a snapshot or dict
+# output: dict of every value's full key (e.g. embeds.enabled) -> value, sections aren't included
+def flatten(data, parent: str = "") -> Dict[str, Any]:
+    values = {}
+
+    for key, value in data.items():
+        if (isinstance(value, (dict, ConfigSnapshot))):
+            values.update(flatten(value, parent=f"{parent}{key}."))
+        else:
+            values[f"{parent}{key}"] = value
+
+    return values
+
+# input: config, the snapshot
+#        key, full key of the value, e.g. embeds.enabled
+# output: the value, raises KeyError if it doesn't exist
+def get_path(config: ConfigSnapshot, key: str) -> Any:
+    value = config
+
+    for k in key.split("."):
+        if (not isinstance(value, ConfigSnapshot)):
+            raise KeyError(key)
+
+        value = value[k]
+
+    return value
+
+# builds a new snapshot with some values changed, sections without changes are reused
+# input: config, the snapshot to change
+#        changes, dict of key parts (e.g. ("embeds", "enabled")) -> new value
+# output: the new snapshot
+def _with_changes(config: ConfigSnapshot, changes: Dict[Tuple[str, ...], Any]) -> ConfigSnapshot:
+    data = dict(config.items())
+    sections: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+
+    for path, value in changes.items():
+        if (len(path) == 1):
+            data[path[0]] = value
+        else:
+            sections.setdefault(path[0], {})[path[1:]] = value
+
+    for key, section_changes in sections.items():
+        data[key] = _with_changes(data[key], section_changes)
+
+    return ConfigSnapshot(data)
+
+# combines the default config with the saved one, keeping the saved values for keys that still exist
+# input: defaults, the default config
+#        saved, the config read from disk
+# output: the combined config, and if it's different from the saved one's keys and should be written
+def merge_with_defaults(defaults: dict, saved: dict) -> Tuple[dict, bool]:
+    saved_values = flatten(saved)
+    default_values = flatten(defaults)
+
+    data = ConfigSnapshot(defaults)
+    changes = {tuple(key.split(".")): saved_values[key] for key in default_values if (key in saved_values)}
+
+    return _with_changes(data, changes).to_dict(), (set(saved_values) != set(default_values))
+
+class ConfigStore:
+    # input: bot, the bot
+    #        path, path of the config file
+    def __init__(self, bot, path: str):
+        self.bot = bot
+        self.path = path
+
+        self.snapshot = ConfigSnapshot({})
+
+        # list of (key prefixes, callback)
+        self.subscribers: List[Tuple[Tuple[str, ...], Callable[[ConfigSnapshot, ConfigChanges], None]]] = []
+
+        # only one write at a time, so an older snapshot can't be written over a newer one
+        self._write_lock = asyncio.Lock()
+
+    # reads the config file, adds new default keys to it and removes outdated ones
+    # output: the config and if the file should be written
+    def _read_sync(self) -> Tuple[Optional[dict], bool]:
+        importlib.reload(default_config)
+
+        defaults = default_config.DEFAULT_CONFIG
+
+        if (not os.path.exists(self.path)):
+            print("Saving config file to {}".format(self.path))
+            return defaults, True
+
+        try:
+            with open(self.path, "r") as f:
+                saved = yaml.safe_load(f)
+
+        except yaml.scanner.ScannerError as e:
+            print("Config file could not be loaded (scanner error), make sure config.yml is formatted properly: {}".format(e))
+            saved = None
+
+        except Exception as e:
+            print("Config file could not be loaded (general error): {}".format(e))
+            saved = None
+
+        if (not saved):
+            # don't overwrite the file, it can be fixed and reloaded
+            print("Failed to load disk config, falling back to default config")
+            return defaults, False
+
+        data, outdated = merge_with_defaults(defaults, saved)
+
+        if (outdated):
+            print("Updating config....")
+        else:
+            print("Loaded config from file")
+
+        return data, outdated
+
+    # writes the config to a temp file and moves it over the config file, so it's never left half written
+    def _write_sync(self, data: dict) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".config.", suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                yaml.dump(data, f, default_flow_style=False)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(temp_path, self.path)
+
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    # loads the config when the bot starts, before the event loop is running
+    def load(self) -> None:
+        data, should_write = self._read_sync()
+
+        if (should_write):
+            self._write_sync(data)
+            print("Saved config")
+
+        self.snapshot = ConfigSnapshot(data)
+
+    # loads the config from disk again
+    # output: the values that changed
+    async def reload(self) -> ConfigChanges:
+        data, should_write = await self.bot.loop.run_in_executor(None, self._read_sync)
+
+        changes = self._swap(ConfigSnapshot(data))
+
+        if (should_write):
+            await self.save()
+
+        return changes
+
+    # changes some values and saves the config
+    # input: values, dict of full key (e.g. embeds.enabled) -> new value
+    # output: the values that changed
+    async def patch(self, values: Dict[str, Any]) -> ConfigChanges:
+        for key in values:
+            # raises KeyError if it doesn't exist
+            if (isinstance(get_path(self.snapshot, key), ConfigSnapshot)):
+                raise KeyError(f"{key} is a section, not a value")
+
+        changes = self._swap(_with_changes(self.snapshot, {tuple(key.split(".")): value for key, value in values.items()}))
+
+        if (changes):
+            await self.save()
+
+        return changes
+
+    # writes the current config to disk
+    async def save(self) -> None:
+        async with self._write_lock:
+            await self.bot.loop.run_in_executor(None, self._write_sync, self.snapshot.to_dict())
+
+    # replaces the current snapshot and tells subscribers what changed
+    # output: the values that changed
+    def _swap(self, snapshot: ConfigSnapshot) -> ConfigChanges:
+        old_values = flatten(self.snapshot)
+        new_values = flatten(snapshot)
+
+        changes = {}
+
+        for key in set(old_values) | set(new_values):
+            old = old_values.get(key)
+            new = new_values.get(key)
+
+            if (old != new):
+                changes[key] = (old, new)
+
+        self.snapshot = snapshot
+
+        if (changes):
+            self._notify(changes)
+
+        return changes
+
+    def _notify(self, changes: ConfigChanges) -> None:
+        for prefixes, callback in list(self.subscribers):
+            relevant = {key: change for key, change in changes.items()
+                        if (any(key == prefix or key.startswith(f"{prefix}.") for prefix in prefixes))}
+
+            if (not relevant):
+                continue
+
+            try:
+                callback(self.snapshot, relevant)
+            except Exception as e:
+                self.bot.bot_utils.log_error_to_file(e, prefix="Config")
+
+    # calls a function when config values change
+    # input: callback, function that takes the new config and the changes to the keys it's interested in
+    #        prefixes, keys or sections to watch, e.g. embeds or embeds.steam
+    def subscribe(self, callback: Callable[[ConfigSnapshot, ConfigChanges], None], *prefixes: str) -> None:
+        self.subscribers.append((prefixes, callback))
+
+    # input: callback, function that was passed to subscribe
+    def unsubscribe(self, callback: Callable[[ConfigSnapshot, ConfigChanges], None]) -> None:
+        self.subscribers = [(prefixes, cb) for prefixes, cb in self.subscribers if (cb != callback)]
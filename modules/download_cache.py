@@ -0,0 +1,272 @@
+from modules import image_ops, utils
+
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# this file is for remembering downloaded images, so running several commands on the same image only downloads it once
+# images are stored by the hash of their content, so the same image posted under different urls is only stored once,
+# small images are kept in memory and large ones in a temp directory, and each tier has its own size limit
+# urls remember the ETag and Last-Modified of their response, so once they're old they're checked
+# with a conditional request instead of being downloaded again
+# an image's size and url were checked when it was downloaded, so nothing is checked again when it's reused
+
+class CachedObject:
+    __slots__ = ["digest", "data", "path", "size", "users", "evicted"]
+
+    def __init__(self, digest: str, data: Optional[bytes], path: Optional[str], size: int):
+        self.digest = digest
+
+        # one of these is set, data for the memory tier and path for the disk tier
+        self.data = data
+        self.path = path
+
+        self.size = size
+
+        # number of commands using the file, it's only deleted once they're done with it
+        self.users = 0
+        self.evicted = False
+
+class CachedUrl:
+    __slots__ = ["digest", "etag", "last_modified", "checked"]
+
+    def __init__(self, digest: str, etag: Optional[str], last_modified: Optional[str]):
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+
+        # when the url was last downloaded or revalidated
+        self.checked = time.monotonic()
+
+class DownloadCache:
+    # input: memory_size, max bytes of images to keep in memory
+    #        disk_size, max bytes of images to keep on disk
+    #        max_urls, max number of urls to remember
+    #        revalidate_after, seconds before a url is checked with the server again
+    def __init__(self, memory_size: int, disk_size: int, max_urls: int, revalidate_after: float):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.max_urls = max_urls
+        self.revalidate_after = revalidate_after
+
+        # content hash -> object, ordered from least to most recently used
+        self.memory: Dict[str, CachedObject] = OrderedDict()
+        self.disk: Dict[str, CachedObject] = OrderedDict()
+
+        self.memory_used = 0
+        self.disk_used = 0
+
+        # id of the bytes -> content hash, for every image in memory, so an image's hash can be found without hashing it again
+        self.memory_ids: Dict[int, str] = {}
+
+        # path -> object, for every file the cache owns, including evicted ones that are still being used
+        self.files: Dict[str, CachedObject] = {}
+
+        # url -> what it downloaded last time
+        self.urls: Dict[str, CachedUrl] = OrderedDict()
+
+        # created when the first large image is downloaded
+        self.directory: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return (self.max_urls > 0 and (self.memory_size > 0 or self.disk_size > 0))
+
+    def _get_object(self, digest: str) -> Optional[CachedObject]:
+        for tier in [self.memory, self.disk]:
+            obj = tier.get(digest)
+
+            if (obj is not None):
+                tier.move_to_end(digest)
+                return obj
+
+        return None
+
+    # input: url, the url
+    # output: what the url downloaded last time, or None if it isn't cached or the image was evicted
+    def lookup(self, url: str) -> Optional[CachedUrl]:
+        entry = self.urls.get(url)
+
+        if (entry is None):
+            return None
+
+        if (entry.digest not in self.memory and entry.digest not in self.disk):
+            del self.urls[url]
+            return None
+
+        self.urls.move_to_end(url)
+
+        return entry
+
+    # output: if the url was checked recently enough to be used without asking the server
+    def is_fresh(self, entry: CachedUrl) -> bool:
+        return (time.monotonic() - entry.checked < self.revalidate_after)
+
+    # output: headers for a conditional request, empty if the response had no validators
+    @staticmethod
+    def revalidation_headers(entry: CachedUrl) -> Dict[str, str]:
+        headers = {}
+
+        if (entry.etag):
+            headers["If-None-Match"] = entry.etag
+
+        if (entry.last_modified):
+            headers["If-Modified-Since"] = entry.last_modified
+
+        return headers
+
+    # gets a url's image, pass it to release() when done with it
+    # input: entry, from lookup()
+    #        revalidated, if the server just said the image hasn't changed
+    # output: the image, or None if it was evicted since lookup()
+    def acquire(self, entry: CachedUrl, revalidated: bool = False) -> Optional[image_ops.ImageSource]:
+        obj = self._get_object(entry.digest)
+
+        if (obj is None):
+            return None
+
+        if (revalidated):
+            entry.checked = time.monotonic()
+
+        return self._use(obj)
+
+    # input: url, a url to stop remembering
+    def forget(self, url: str) -> None:
+        self.urls.pop(url, None)
+
+    def _use(self, obj: CachedObject) -> image_ops.ImageSource:
+        if (obj.data is not None):
+            return obj.data
+
+        obj.users += 1
+
+        return obj.path
+
+    # input: source, an image from acquire() or add()
+    # output: hex hash of the image's content, or None for images that aren't in the cache
+    def get_digest(self, source: image_ops.ImageSource) -> Optional[str]:
+        if (isinstance(source, bytes)):
+            digest = self.memory_ids.get(id(source))
+            obj = self.memory.get(digest) if (digest is not None) else None
+
+            # ids are reused once the bytes are freed, so make sure it's the same object
+            return digest if (obj is not None and obj.data is source) else None
+
+        obj = self.files.get(source)
+
+        return obj.digest if (obj is not None) else None
+
+    # output: path of a new file in the cache's directory to download a large image to
+    def create_file(self, ext: str) -> str:
+        if (self.directory is None):
+            self.directory = tempfile.mkdtemp(prefix="cbot-images-")
+
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix="." + ext)
+        os.close(fd)
+
+        return path
+
+    # adds a downloaded image, pass the returned image to release() when done with it
+    # input: url, the url it was downloaded from
+    #        source, the image's bytes or the path to its file
+    #        digest, hex hash of the image's content
+    #        headers, the response's headers
+    # output: the image to use, it's the cached copy if the same content was already downloaded
+    def add(self, url: str, source: image_ops.ImageSource, digest: str, headers) -> image_ops.ImageSource:
+        if (not self.enabled):
+            return source
+
+        obj = self._get_object(digest)
+
+        if (obj is None):
+            obj = self._store(source, digest)
+
+            # too large for its tier
+            if (obj is None):
+                return source
+
+        elif (isinstance(source, str)):
+            # already have it, the new copy isn't needed
+            utils.remove_file_safe(source)
+
+        self.urls[url] = CachedUrl(digest, headers.get("ETag"), headers.get("Last-Modified"))
+        self.urls.move_to_end(url)
+
+        while (len(self.urls) > self.max_urls):
+            self.urls.popitem(last=False)
+
+        return self._use(obj)
+
+    def _store(self, source: image_ops.ImageSource, digest: str) -> Optional[CachedObject]:
+        if (isinstance(source, bytes)):
+            if (len(source) > self.memory_size):
+                return None
+
+            obj = CachedObject(digest, source, None, len(source))
+
+            self.memory[digest] = obj
+            self.memory_used += obj.size
+            self.memory_ids[id(source)] = digest
+
+            while (self.memory_used > self.memory_size):
+                _digest, old = self.memory.popitem(last=False)
+                self.memory_used -= old.size
+                self.memory_ids.pop(id(old.data), None)
+
+            return obj
+
+        size = os.path.getsize(source)
+
+        # files the cache didn't create might be on another drive, so they aren't moved into it
+        if (size > self.disk_size or self.directory is None or os.path.dirname(source) != self.directory):
+            return None
+
+        obj = CachedObject(digest, None, source, size)
+
+        self.disk[digest] = obj
+        self.disk_used += size
+        self.files[source] = obj
+
+        while (self.disk_used > self.disk_size):
+            _digest, old = self.disk.popitem(last=False)
+            self.disk_used -= old.size
+
+            old.evicted = True
+            self._remove_if_unused(old)
+
+        return obj
+
+    def _remove_if_unused(self, obj: CachedObject) -> None:
+        if (obj.evicted and obj.users <= 0):
+            self.files.pop(obj.path, None)
+            utils.remove_file_safe(obj.path)
+
+    # frees an image from acquire() or add(), files that aren't in the cache are deleted
+    # input: source, the image
+    def release(self, source: Optional[image_ops.ImageSource]) -> None:
+        if (not isinstance(source, str)):
+            return
+
+        obj = self.files.get(source)
+
+        if (obj is None):
+            utils.remove_file_safe(source)
+            return
+
+        obj.users -= 1
+        self._remove_if_unused(obj)
+
+    # deletes every file, images that are still being used can't be released afterwards
+    def close(self) -> None:
+        self.memory.clear()
+        self.memory_ids.clear()
+        self.disk.clear()
+        self.files.clear()
+        self.urls.clear()
+
+        if (self.directory is not None):
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -5,6 +5,9 @@ DISCORD_MAX_FILESIZE = 10 * 1024 * 1024
 DISCORD_MAX_MESSAGE_LENGTH = 2000 # max characters in a discord message
 DISCORD_MAX_MENTION_LENGTH = 21 # max length a mention of a user can be ("<@id>") where id is the 18 digit id of the user
 
+DISCORD_MAX_BULK_DELETE = 100 # max messages that can be deleted in one bulk delete request
+DISCORD_MAX_BULK_DELETE_AGE = 14 * 24 * 60 * 60 # messages older than this many seconds can't be bulk deleted
+
 class ImageCodes(Enum):
     SUCCESS = 1
     MAX_FILESIZE = 2
@@ -13,3 +16,8 @@ class ImageCodes(Enum):
     BAD_URL = 5
     MISC_ERROR = 6
     NO_PERMISSIONS = 7
+    ANIMATED = 8
+    NOT_ANIMATED = 9
+    INVALID_ARGUMENT = 10
+    TIMED_OUT = 11
+    BUSY = 12
@@ -0,0 +1,84 @@
+import discord
+
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+# this file is for choosing what the bot receives from discord and what it keeps in memory
+# memory use grows with the number of guilds, mostly from cached members and presences,
+# so the intents and member cache can be cut down in the config to what's actually used
+
+# member cache options, see discord.MemberCacheFlags
+# all: whatever the intents allow
+# voice: only members in voice channels
+# joined: members in voice channels and members that joined while the bot was running
+# none: no members besides the ones in events
+MEMBER_CACHE_POLICIES = ["all", "voice", "joined", "none"]
+
+# input: options, the gateway section of the config
+# output: the intents to connect with
+def create_intents(options) -> discord.Intents:
+    profile = options["intents"]
+
+    if (profile == "all"):
+        intents = discord.Intents.all()
+    elif (profile == "default"):
+        intents = discord.Intents.default()
+    elif (profile == "none"):
+        intents = discord.Intents.none()
+    else:
+        raise ValueError(f"Unknown intents profile \"{profile}\", use all, default or none")
+
+    for names, value in [(options["enable_intents"], True), (options["disable_intents"], False)]:
+        for name in names:
+            if (name not in discord.Intents.VALID_FLAGS):
+                raise ValueError(f"Unknown intent \"{name}\"")
+
+            setattr(intents, name, value)
+
+    return intents
+
+# input: options, the gateway section of the config
+#        intents, the intents being used
+# output: which members to cache
+def create_member_cache_flags(options, intents: discord.Intents) -> discord.MemberCacheFlags:
+    policy = options["member_cache"]
+
+    if (policy == "all"):
+        return discord.MemberCacheFlags.from_intents(intents)
+
+    if (policy not in MEMBER_CACHE_POLICIES):
+        raise ValueError(f"Unknown member cache policy \"{policy}\", use {', '.join(MEMBER_CACHE_POLICIES)}")
+
+    flags = discord.MemberCacheFlags.none()
+
+    # each one needs its intent, otherwise discord.py refuses to start
+    if (policy in ["voice", "joined"] and intents.voice_states):
+        flags.voice = True
+
+    if (policy == "joined" and intents.members):
+        flags.joined = True
+
+    return flags
+
+# counts every event the bot dispatches, to compare how busy each intents profile is
+class EventCounter:
+    def __init__(self):
+        self.counts = Counter()
+        self.started = time.monotonic()
+
+    def add(self, event_name: str) -> None:
+        self.counts[event_name] += 1
+
+    # output: time it was taken and a copy of the counts, pass to rates() later
+    def sample(self) -> Tuple[float, Dict[str, int]]:
+        return (time.monotonic(), dict(self.counts))
+
+    # input: since, a sample from before
+    # output: events per second of each event since the sample
+    def rates(self, since: Tuple[float, Dict[str, int]]) -> Dict[str, float]:
+        then, old_counts = since
+        elapsed = max(time.monotonic() - then, 0.001)
+
+        return {name: (count - old_counts.get(name, 0)) / elapsed for name, count in self.counts.items()
+                if (count > old_counts.get(name, 0))}
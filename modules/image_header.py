@@ -0,0 +1,177 @@
+import struct
+from typing import Optional, Tuple
+
+# this file is for recognizing images from the first bytes of a download,
+# so files that aren't images or are too large to edit can be rejected before the rest of them is downloaded
+
+# max number of bytes to look through for the dimensions, jpegs can have large metadata before them
+SNIFF_LIMIT = 256 * 1024
+
+# jpeg start of frame markers, they have the image's dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# sizes of the bmp info headers, bmps have one right after the file header
+BMP_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+# major brands of the heic and avif image formats, other files with an ftyp box (mp4, mov, etc) are videos
+IMAGE_FTYP_BRANDS = {b"avif", b"avis", b"heic", b"heix", b"mif1"}
+
+# formats that are recognized but whose dimensions aren't read, they're checked after they're downloaded
+OTHER_SIGNATURES = [(b"II*\x00", "tiff"),
+                    (b"MM\x00*", "tiff"),
+                    (b"\x00\x00\x01\x00", "ico")]
+
+class ImageHeader:
+    __slots__ = ["format", "size"]
+
+    def __init__(self, fmt: Optional[str], size: Optional[Tuple[int, int]] = None):
+        # None if it isn't an image
+        self.format = fmt
+
+        # (width, height) or None if it isn't known
+        self.size = size
+
+    @property
+    def is_image(self) -> bool:
+        return (self.format is not None)
+
+# input: data, the first bytes of a file
+# output: the jpeg's dimensions, or None if more data is needed
+#         raises ValueError if the data isn't a valid jpeg
+def _jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    offset = 2
+
+    while (offset + 4 <= len(data)):
+        if (data[offset] != 0xFF):
+            raise ValueError("Invalid jpeg marker")
+
+        marker = data[offset + 1]
+
+        # padding
+        if (marker == 0xFF):
+            offset += 1
+            continue
+
+        # markers without a length
+        if (marker == 0x01 or 0xD0 <= marker <= 0xD7):
+            offset += 2
+            continue
+
+        length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+
+        if (marker in JPEG_SOF_MARKERS):
+            if (offset + 9 > len(data)):
+                return None
+
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return (width, height)
+
+        # start of scan, the image data starts without a frame
+        if (marker == 0xDA):
+            raise ValueError("No jpeg frame")
+
+        offset += 2 + length
+
+    return None
+
+# recognizes an image from the start of its file
+# input: data, the first bytes of the file
+#        complete, if that's all of the file
+# output: the image's header, or None if more data is needed to tell
+def sniff_image(data: bytes, complete: bool = False) -> Optional[ImageHeader]:
+    try:
+        header = _sniff_image(data)
+    except (ValueError, struct.error):
+        # it starts like an image but its dimensions couldn't be read, it's checked after it's downloaded
+        return ImageHeader(_get_format(data))
+
+    if (header is not None):
+        return header
+
+    # give up looking for the dimensions once there's enough data
+    if (complete or len(data) >= SNIFF_LIMIT):
+        return ImageHeader(_get_format(data))
+
+    return None
+
+# output: the format if the data starts with an image signature or None
+def _get_format(data: bytes) -> Optional[str]:
+    if (data.startswith(b"\x89PNG\r\n\x1a\n")):
+        return "png"
+    elif (data.startswith((b"GIF87a", b"GIF89a"))):
+        return "gif"
+    elif (data.startswith(b"\xFF\xD8\xFF")):
+        return "jpeg"
+    elif (data[:4] == b"RIFF" and data[8:12] == b"WEBP"):
+        return "webp"
+    elif (data.startswith(b"BM") and len(data) >= 18 and struct.unpack("<I", data[14:18])[0] in BMP_HEADER_SIZES):
+        return "bmp"
+    elif (data[4:8] == b"ftyp" and data[8:12] in IMAGE_FTYP_BRANDS):
+        # heic, avif
+        return "isobmff"
+
+    for signature, fmt in OTHER_SIGNATURES:
+        if (data.startswith(signature)):
+            return fmt
+
+    return None
+
+# output: the image's header, or None if more data is needed
+def _sniff_image(data: bytes) -> Optional[ImageHeader]:
+    # every signature fits in 12 bytes, except that bmps are recognized by their info header
+    if (len(data) < 12 or (data.startswith(b"BM") and len(data) < 26)):
+        return None
+
+    fmt = _get_format(data)
+
+    if (fmt is None):
+        return ImageHeader(None)
+
+    if (fmt == "png"):
+        # the IHDR chunk is always first
+        if (len(data) < 24):
+            return None
+
+        width, height = struct.unpack(">II", data[16:24])
+        return ImageHeader(fmt, (width, height))
+
+    elif (fmt == "gif"):
+        width, height = struct.unpack("<HH", data[6:10])
+        return ImageHeader(fmt, (width, height))
+
+    elif (fmt == "jpeg"):
+        size = _jpeg_size(data)
+        return ImageHeader(fmt, size) if (size is not None) else None
+
+    elif (fmt == "webp"):
+        if (len(data) < 30):
+            return None
+
+        chunk = data[12:16]
+
+        if (chunk == b"VP8 "):
+            width, height = struct.unpack("<HH", data[26:30])
+            return ImageHeader(fmt, (width & 0x3FFF, height & 0x3FFF))
+
+        elif (chunk == b"VP8L"):
+            bits = struct.unpack("<I", data[21:25])[0]
+            return ImageHeader(fmt, ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1))
+
+        elif (chunk == b"VP8X"):
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return ImageHeader(fmt, (width, height))
+
+        return ImageHeader(fmt)
+
+    elif (fmt == "bmp"):
+        # old os/2 bmps have a smaller header with 16 bit dimensions
+        if (struct.unpack("<I", data[14:18])[0] == 12):
+            width, height = struct.unpack("<HH", data[18:22])
+        else:
+            width, height = struct.unpack("<ii", data[18:26])
+
+        # the height is negative for images stored top down
+        return ImageHeader(fmt, (abs(width), abs(height)))
+
+    return ImageHeader(fmt)
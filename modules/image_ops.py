@@ -0,0 +1,176 @@
+from modules import enums
+
+import io
+import pytesseract
+from PIL import Image as Img
+from typing import Tuple, Optional, Union
+
+try:
+    import wand, wand.image, wand.exceptions
+
+except Exception:
+    wand = None
+
+# this file is for cpu heavy image transforms
+# they are run in worker processes (see workers.py), so they can't use discord or the bot
+# each one takes an image source, either the image's bytes or the path to a temp file if it was too large
+# to keep in memory, and returns a tuple of the return code and the result
+# the result of an edit is a tuple of the encoded image and its file extension
+
+MAX_DIMENSIONS = (3000, 3000)
+
+ImageSource = Union[bytes, str]
+EditResult = Tuple[enums.ImageCodes, Optional[Tuple[bytes, str]]]
+
+# opens an image source with pillow
+def open_image(source: ImageSource) -> Img.Image:
+    if (isinstance(source, bytes)):
+        return Img.open(io.BytesIO(source))
+
+    return Img.open(source)
+
+# encodes a pillow image
+# input: img, the image
+#        fmt, format to encode the image in
+#        kwargs, extra options for the encoder
+# output: the encoded image
+def encode_image(img: Img.Image, fmt: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+
+    return buffer.getvalue()
+
+# checks if a pillow image is animated
+def is_animated(img: Img.Image) -> bool:
+    return bool(img.info and ("loop" in img.info or "duration" in img.info))
+
+# liquify image
+# input: source, the image to liquify
+# output: return code of the operation and the liquidized image
+def liquify(source: ImageSource) -> EditResult:
+    if (wand is None):
+        return enums.ImageCodes.MISC_ERROR, None
+
+    try:
+        # get a wand image object
+        if (isinstance(source, bytes)):
+            img = wand.image.Image(blob=source)
+        else:
+            img = wand.image.Image(filename=source)
+
+        # no animated gifs
+        # TODO: run gif magic code here too
+        #       be careful of alpha channel though... just in case
+        if (img.animation):
+            return enums.ImageCodes.INVALID_FORMAT, None
+
+        # image dimensions too large
+        if (img.size >= MAX_DIMENSIONS):
+            return enums.ImageCodes.MAX_DIMENSIONS, None
+
+        # TODO: is it worth converting the image to a better format (like png)?
+        ext = img.format.lower()
+        img.alpha_channel = True
+
+        # do the magick
+        img.transform(resize="800x800>")
+        img.liquid_rescale(width=int(img.width * 0.5), height=int(img.height * 0.5), delta_x=1)
+        img.liquid_rescale(width=int(img.width * 1.5), height=int(img.height * 1.5), delta_x=2)
+
+        # before uploading, check the size of the output file
+        img_blob = img.make_blob()
+
+        if (len(img_blob) > enums.DISCORD_MAX_FILESIZE):
+            return enums.ImageCodes.MAX_FILESIZE, None
+
+        return enums.ImageCodes.SUCCESS, (img_blob, ext)
+
+    # TODO: do something with this maybe? convert image to a different format and try again?
+    except wand.exceptions.WandException as e:
+        print("wand exception", e)
+        return enums.ImageCodes.INVALID_FORMAT, None
+
+# pixelates image
+# input: source, the image
+#        pixel_size, how much to pixelate the image
+# output: return code of the operation and the pixelated image
+def pixelate(source: ImageSource, pixel_size: int) -> EditResult:
+    img = open_image(source)
+
+    if (img.size >= MAX_DIMENSIONS):
+        return enums.ImageCodes.MAX_DIMENSIONS, None
+
+    # no animated gifs
+    if (is_animated(img)):
+        return enums.ImageCodes.ANIMATED, None
+
+    old_size = img.size
+    new_size = (old_size[0] // pixel_size, old_size[1] // pixel_size)
+
+    if (new_size > (0, 0)):
+        img = img.resize(new_size, Img.NEAREST)
+        img = img.resize(old_size, Img.NEAREST)
+    else:
+        return enums.ImageCodes.INVALID_ARGUMENT, None
+
+    return enums.ImageCodes.SUCCESS, (encode_image(img, "PNG"), "png")
+
+# speeds up a gif
+# input: source, the gif
+# output: return code of the operation and the sped up gif
+def gspeed(source: ImageSource) -> EditResult:
+    img = open_image(source)
+
+    if (img.size >= MAX_DIMENSIONS):
+        return enums.ImageCodes.MAX_DIMENSIONS, None
+
+    # only animated gifs
+    if (img.info and ("loop" not in img.info or "duration" not in img.info)):
+        return enums.ImageCodes.NOT_ANIMATED, None
+
+    duration = int(img.info.get("duration", 0))
+    img.info["duration"] = max(int(duration / 2), 1) # TODO: remember to change this on july 1st (https://github.com/python-pillow/Pillow/issues/3073#issuecomment-380620206)
+
+    return enums.ImageCodes.SUCCESS, (encode_image(img, "gif", save_all=True, optimize=False), "gif")
+
+# rotates an image
+# input: source, the image
+#        degrees, how many degrees to rotate it counter clockwise
+# output: return code of the operation and the rotated image
+def rotate(source: ImageSource, degrees: int) -> EditResult:
+    im = open_image(source)
+    fmt = im.format or "PNG"
+
+    im = im.rotate(degrees, expand=True)
+
+    return enums.ImageCodes.SUCCESS, (encode_image(im, fmt), fmt.lower())
+
+# converts an image to another format
+# input: source, the image
+#        extension, the format to convert to
+# output: return code of the operation and the converted image
+def convert(source: ImageSource, extension: str) -> EditResult:
+    im = open_image(source).convert("RGB")
+
+    return enums.ImageCodes.SUCCESS, (encode_image(im, extension), extension)
+
+# saves an image as a low quality jpeg
+# input: source, the image
+#        quality, jpeg quality from 0 to 100
+# output: return code of the operation and the jpegged image
+def jpeg(source: ImageSource, quality: int) -> EditResult:
+    im = open_image(source)
+    fmt = im.format or "JPEG"
+
+    im = im.convert(im.mode)
+
+    return enums.ImageCodes.SUCCESS, (encode_image(im, fmt, optimize=True, quality=quality), fmt.lower())
+
+# extracts text from an image
+# input: source, the image
+# output: return code of the operation and the text found
+def ocr(source: ImageSource) -> Tuple[enums.ImageCodes, str]:
+    im = open_image(source).convert("RGB")
+    text = pytesseract.image_to_string(im)
+
+    return enums.ImageCodes.SUCCESS, text
@@ -0,0 +1,167 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+# this file is for browsing image search results
+# results are checked concurrently instead of one at a time, the first one that works is shown right away,
+# and the pages around the one being shown are checked in the background so scrolling doesn't have to wait
+
+# checks if a url is an image that can be embedded
+ImageValidator = Callable[[str], Awaitable[bool]]
+
+# what's known about each url of a search, one byte each when saved with export()
+UNKNOWN = 0
+VALID = 1
+
+class ImageSearchSession:
+    # input: urls, the search results in order
+    #        validate, function that checks a url
+    #        semaphore, limits how many urls are checked at once, shared by every search
+    #        prefetch, number of pages in each direction to check in the background
+    #        known, from export(), which urls are already known to be valid
+    def __init__(self, urls: Sequence[str], validate: ImageValidator, semaphore: asyncio.Semaphore, prefetch: int, known: Optional[bytes] = None):
+        self.urls = urls
+        self.validate = validate
+        self.semaphore = semaphore
+        self.prefetch = prefetch
+
+        # index of the url being shown
+        self.index = 0
+
+        # set by close(), the checks that were running are cancelled
+        self.closed = False
+
+        # index -> task checking the url, started when it's first needed
+        self.checks: List[Optional[asyncio.Future]] = [None] * len(urls)
+
+        if (known is not None):
+            loop = asyncio.get_event_loop()
+
+            for index, status in enumerate(known):
+                if (status == VALID):
+                    self.checks[index] = loop.create_future()
+                    self.checks[index].set_result(True)
+
+    @property
+    def url(self) -> str:
+        return self.urls[self.index]
+
+    async def _validate(self, url: str) -> bool:
+        async with self.semaphore:
+            try:
+                return await self.validate(url)
+            except Exception:
+                return False
+
+    # input: index, index of a url
+    # output: the task checking it, it's started if it hasn't been already
+    def _check(self, index: int) -> asyncio.Future:
+        task = self.checks[index]
+
+        if (task is None):
+            task = asyncio.ensure_future(self._validate(self.urls[index]))
+            self.checks[index] = task
+
+        return task
+
+    def _is_invalid(self, index: int) -> bool:
+        task = self.checks[index]
+
+        return (task is not None and task.done() and not task.cancelled() and not task.result())
+
+    # starts checking the urls around the current one
+    def _prefetch(self) -> None:
+        length = len(self.urls)
+
+        for offset in range(1, min(self.prefetch, length - 1) + 1):
+            self._check((self.index + offset) % length)
+            self._check((self.index - offset) % length)
+
+    # finds a url to show first, checks a batch of them at once and uses whichever works first
+    # input: batch_size, number of urls to check at once
+    # output: if one was found, it's the new current url
+    async def start(self, batch_size: int) -> bool:
+        for batch_start in range(0, len(self.urls), batch_size):
+            pending = {self._check(index) for index in range(batch_start, min(batch_start + batch_size, len(self.urls)))}
+
+            while (pending):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                if (self.closed):
+                    return False
+
+                # of the ones that finished, use the earliest result
+                valid = [index for index, task in enumerate(self.checks) if (task in done and not task.cancelled() and task.result())]
+
+                if (valid):
+                    self.index = valid[0]
+                    self._prefetch()
+
+                    return True
+
+        return False
+
+    # moves to the next url that works in a direction, wrapping around the results
+    # input: direction, 1 for forwards or -1 for backwards
+    # output: if one was found, it's the new current url
+    async def step(self, direction: int) -> bool:
+        length = len(self.urls)
+        index = self.index
+
+        for _i in range(length - 1):
+            index = (index + direction) % length
+
+            if (self._is_invalid(index)):
+                continue
+
+            if (self.closed):
+                return False
+
+            try:
+                valid = await self._check(index)
+
+            except asyncio.CancelledError:
+                # the check was cancelled because the search was closed while waiting for it
+                if (self.closed):
+                    return False
+
+                raise
+
+            if (valid):
+                self.index = index
+                self._prefetch()
+
+                return True
+
+        return False
+
+    # output: the current page number and number of pages, urls that are known to be broken aren't counted
+    def page(self) -> Tuple[int, int]:
+        number = sum(1 for index in range(self.index + 1) if (not self._is_invalid(index)))
+        total = sum(1 for index in range(len(self.urls)) if (not self._is_invalid(index)))
+
+        return number, total
+
+    # output: the urls without the ones known to be broken, and which of them are known to work,
+    #         pass both to a new session to continue without checking them again
+    def export(self) -> Tuple[Tuple[str, ...], bytes]:
+        urls = []
+        known = bytearray()
+
+        for index, url in enumerate(self.urls):
+            if (self._is_invalid(index)):
+                continue
+
+            task = self.checks[index]
+
+            urls.append(url)
+            known.append(VALID if (task is not None and task.done() and not task.cancelled() and task.result()) else UNKNOWN)
+
+        return tuple(urls), bytes(known)
+
+    # stops checking urls
+    def close(self) -> None:
+        self.closed = True
+
+        for task in self.checks:
+            if (task is not None and not task.done()):
+                task.cancel()
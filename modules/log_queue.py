@@ -0,0 +1,82 @@
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import List
+
+# this file is for writing logs without blocking the event loop
+# loggers only put records in a queue, a background thread formats them and writes them to the log files and console
+# the log files are rotated once they get too big
+
+# error.log, written by BotUtils.log_error_to_file
+ERROR_LOGGER = "cbot.errors"
+
+# errors the developer is alerted about, written by BotUtils.log_alert
+# it's under the error logger, so they're written to error.log and also shown on the console
+ALERT_LOGGER = f"{ERROR_LOGGER}.alerts"
+
+# commands that were used, written by BotUtils.output_log
+COMMAND_LOGGER = "cbot.commands"
+
+# output: if a record should be shown on the console
+def _is_console_record(record: logging.LogRecord) -> bool:
+    return any(record.name == name or record.name.startswith(f"{name}.") for name in [COMMAND_LOGGER, ALERT_LOGGER])
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler formats records before queueing them so they can be sent to other processes,
+    # the listener is a thread in this process so that's left to it
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class LogQueue:
+    # input: options, the logging section of the config
+    #        discord_path, path to write discord.py's log to
+    #        error_path, path to write errors to
+    def __init__(self, options: dict, discord_path: str, error_path: str):
+        self.queue = queue.SimpleQueue()
+
+        max_bytes = int(options["max_file_size"] * 1024 * 1024)
+        backup_count = options["backup_count"]
+
+        discord_handler = logging.handlers.RotatingFileHandler(discord_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        discord_handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s"))
+        discord_handler.addFilter(logging.Filter("discord"))
+
+        error_handler = logging.handlers.RotatingFileHandler(error_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        error_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%m/%d/%y %H:%M:%S"))
+        error_handler.addFilter(logging.Filter(ERROR_LOGGER))
+
+        handlers: List[logging.Handler] = [discord_handler, error_handler]
+
+        if (options["console"]):
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter("%(message)s"))
+            console_handler.addFilter(_is_console_record)
+
+            handlers.append(console_handler)
+
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers)
+        self.running = False
+
+        queue_handler = DeferredQueueHandler(self.queue)
+
+        discord_logger = logging.getLogger("discord")
+        discord_logger.setLevel(options["discord_level"].upper())
+
+        cbot_logger = logging.getLogger("cbot")
+        cbot_logger.setLevel(logging.INFO)
+
+        for logger in [discord_logger, cbot_logger]:
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+
+    def start(self) -> None:
+        if (not self.running):
+            self.listener.start()
+            self.running = True
+
+    # writes everything that's queued and stops the thread
+    def stop(self) -> None:
+        if (self.running):
+            self.listener.stop()
+            self.running = False
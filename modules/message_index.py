@@ -0,0 +1,153 @@
+import discord
+
+from modules import utils
+
+from collections import OrderedDict
+from typing import Optional, List, Dict, Callable, Tuple
+
+# this file keeps an index of the most recent messages in each channel, built from gateway events,
+# so commands that act on "the last image" or "the last message" don't have to page through the channel's history
+
+# what we remember about a message
+class IndexedMessage:
+    __slots__ = ["id", "content", "attachment", "image_embed", "youtube"]
+
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+        self.content: Optional[str] = None
+        self.attachment: Optional[str] = None
+        self.image_embed: Optional[str] = None
+        self.youtube: Optional[str] = None
+
+    # updates the fields from a list of attachment urls
+    def set_attachments(self, urls: List[str]) -> None:
+        self.attachment = urls[0] if (urls) else None
+
+    # updates the fields from a list of embeds
+    def set_embeds(self, embeds: List[discord.Embed]) -> None:
+        self.image_embed = utils.find_image_in_embeds(embeds)
+        self.youtube = utils.find_youtube_in_embeds(embeds)
+
+    # the image in the message, attachments take priority over embeds
+    @property
+    def image(self) -> Optional[str]:
+        return self.attachment or self.image_embed
+
+class MessageIndex:
+    # input: max_channels, number of channels to remember, the least recently active channel is dropped first
+    #        messages_per_channel, number of messages to remember in each channel
+    def __init__(self, max_channels: int, messages_per_channel: int):
+        self.max_channels = max_channels
+        self.messages_per_channel = messages_per_channel
+
+        # channel id -> (message id -> IndexedMessage), both ordered oldest to newest
+        self.channels: Dict[int, Dict[int, IndexedMessage]] = OrderedDict()
+
+    # forgets everything, used when we may have missed events (e.g. a new gateway session)
+    def clear(self) -> None:
+        self.channels.clear()
+
+    # gets a channel's messages, creating them if needed
+    # input: channel_id, id of the channel
+    # output: the channel's messages
+    def _get_channel(self, channel_id: int) -> Dict[int, IndexedMessage]:
+        messages = self.channels.get(channel_id)
+
+        if (messages is None):
+            messages = OrderedDict()
+            self.channels[channel_id] = messages
+
+            while (len(self.channels) > self.max_channels):
+                self.channels.popitem(last=False)
+        else:
+            self.channels.move_to_end(channel_id)
+
+        return messages
+
+    # adds a new message to the index
+    # input: message, the message that was sent
+    def add(self, message: discord.Message) -> None:
+        if (self.max_channels <= 0 or self.messages_per_channel <= 0):
+            return
+
+        messages = self._get_channel(message.channel.id)
+
+        entry = IndexedMessage(message.id)
+        entry.content = message.content
+        entry.set_attachments([a.url for a in message.attachments])
+        entry.set_embeds(message.embeds)
+
+        messages[message.id] = entry
+
+        while (len(messages) > self.messages_per_channel):
+            messages.popitem(last=False)
+
+    # updates an indexed message from the (possibly partial) data of a raw edit event
+    # input: payload, the edit event
+    def edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        messages = self.channels.get(payload.channel_id)
+
+        if (not messages or payload.message_id not in messages):
+            return
+
+        entry = messages[payload.message_id]
+        data = payload.data
+
+        if ("content" in data):
+            entry.content = data["content"]
+
+        if ("attachments" in data):
+            entry.set_attachments([a["url"] for a in data["attachments"] if ("url" in a)])
+
+        if ("embeds" in data):
+            entry.set_embeds([discord.Embed.from_dict(e) for e in data["embeds"]])
+
+    # removes deleted messages from the index
+    # input: channel_id, id of the channel the messages were deleted from
+    #        message_ids, ids of the deleted messages
+    def delete(self, channel_id: int, message_ids: List[int]) -> None:
+        messages = self.channels.get(channel_id)
+
+        if (not messages):
+            return
+
+        for message_id in message_ids:
+            messages.pop(message_id, None)
+
+    # searches a channel's indexed messages from newest to oldest
+    # input: channel_id, id of the channel to search
+    #        before, only search messages older than this message id, or None to search all of them
+    #        check, function that returns what we're looking for from an indexed message or None
+    #        limit, max number of messages to search or None for no limit
+    # output: a tuple of:
+    #         whatever check found or None if nothing matched,
+    #         the id of the oldest message searched, which is where a search of the channel's history should continue from on a miss
+    #         (None if no messages were searched),
+    #         and the number of messages searched
+    def search(self, channel_id: int, before: Optional[int], check: Callable[[IndexedMessage], Optional[object]],
+               limit: Optional[int] = None) -> Tuple[Optional[object], Optional[int], int]:
+        messages = self.channels.get(channel_id)
+
+        if (not messages):
+            return None, None, 0
+
+        oldest = None
+        num_searched = 0
+
+        for entry in reversed(messages.values()):
+            if (before is not None and entry.id >= before):
+                continue
+
+            if (limit is not None and num_searched >= limit):
+                break
+
+            num_searched += 1
+            oldest = entry.id
+
+            result = check(entry)
+
+            if (result):
+                return result, oldest, num_searched
+
+        return None, oldest, num_searched
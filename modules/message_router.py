@@ -0,0 +1,97 @@
+import discord
+
+import re
+from typing import Callable, Awaitable, Dict, Optional, Pattern
+
+# this file is for passing messages to the cogs that react to what's in them (link embeds, replies to keywords, etc)
+# instead of every cog checking every message, each one registers a pattern here
+# the patterns are combined into one regex, so each message is lowercased and scanned once
+# and only the cogs whose patterns matched are called
+
+RouteHandler = Callable[[discord.Message, str], Awaitable[None]]
+
+class Route:
+    __slots__ = ["name", "pattern", "handler", "enabled"]
+
+    def __init__(self, name: str, pattern: str, handler: RouteHandler, enabled: Optional[Callable[[], bool]]):
+        self.name = name
+        self.pattern = pattern
+        self.handler = handler
+        self.enabled = enabled
+
+class MessageRouter:
+    def __init__(self, bot):
+        self.bot = bot
+
+        self.routes: Dict[str, Route] = {}
+
+        # all the patterns combined, rebuilt when a route is added or removed
+        self._scanner: Optional[Pattern] = None
+
+        # scanner group name -> route
+        self._groups: Dict[str, Route] = {}
+
+    # adds a route
+    # input: name, unique name of the route
+    #        pattern, regex to search lowercased message content for, it shouldn't have named groups
+    #                 and shouldn't match at the same spot as another route's pattern, since only one can match there
+    #        handler, coroutine function called with the message and its lowercased content when the pattern matches
+    #        enabled, function that returns if the route should be used right now, e.g. checking the config
+    def add_route(self, name: str, pattern: str, handler: RouteHandler, enabled: Optional[Callable[[], bool]] = None) -> None:
+        self.routes[name] = Route(name, pattern, handler, enabled)
+        self._scanner = None
+
+    # removes a route
+    # input: name, name of the route
+    def remove_route(self, name: str) -> None:
+        if (self.routes.pop(name, None) is not None):
+            self._scanner = None
+
+    def _build_scanner(self) -> None:
+        self._groups = {f"route{i}": route for i, route in enumerate(self.routes.values())}
+        self._scanner = re.compile("|".join(f"(?P<{group}>{route.pattern})" for group, route in self._groups.items()))
+
+    # finds which routes match a message
+    # input: content, lowercased content of the message
+    # output: the matched routes
+    def match(self, content: str) -> Dict[str, Route]:
+        if (not self.routes):
+            return {}
+
+        if (self._scanner is None):
+            self._build_scanner()
+
+        matched = {}
+
+        for match in self._scanner.finditer(content):
+            route = self._groups[match.lastgroup]
+            matched[route.name] = route
+
+            if (len(matched) == len(self._groups)):
+                break
+
+        return matched
+
+    # passes a message to every route it matches, each one runs in its own task
+    # input: message, the message
+    def route(self, message: discord.Message) -> None:
+        if (not message.content):
+            return
+
+        content = message.content.lower()
+
+        for route in self.match(content).values():
+            if (route.enabled is not None and not route.enabled()):
+                continue
+
+            self.bot.loop.create_task(self._run(route, message, content))
+
+    async def _run(self, route: Route, message: discord.Message, content: str) -> None:
+        try:
+            await route.handler(message, content)
+
+        except discord.errors.Forbidden:
+            pass
+
+        except Exception as e:
+            self.bot.bot_utils.log_error_to_file(e, prefix=route.name)
@@ -1,14 +1,15 @@
 import discord
 from discord.ext import commands
 
-from modules import enums
+from modules import enums, alerts
 
 import asyncio
-import inspect
 import re
 import math
 from collections import OrderedDict
-from typing import Union, List
+from typing import Union, List, Dict, Callable, Awaitable, Optional
+
+ReactionHandler = Callable[[discord.RawReactionActionEvent], Awaitable[None]]
 
 class Messaging:
     def __init__(self, bot):
@@ -19,6 +20,15 @@ class Messaging:
         self.EMOJI_CHARS["arrow_backward"] = "\N{BLACK LEFT-POINTING TRIANGLE}"
         self.EMOJI_CHARS["arrow_forward"] = "\N{BLACK RIGHT-POINTING TRIANGLE}"
         self.EMOJI_CHARS["stop_button"] = "\N{BLACK SQUARE FOR STOP}"
+
+        # interactive messages (paginators, image searches, votes, etc) register here to be told when they're reacted to,
+        # reactions on every other message are ignored with one lookup
+        # message id -> handler
+        self.reaction_handlers: Dict[int, ReactionHandler] = {}
+
+        # errors are grouped and sent to the developer every so often
+        options = self.bot.CONFIG["alerts"]
+        self.alert_digest = alerts.AlertDigest(self.bot, options["digest_interval"], options["rate_limit"], options["max_alerts"])
     
     # private message the developer
     # input: msg, message to send
@@ -37,14 +47,16 @@ class Messaging:
     # input: msg, content of message to send
     #        guild, guild to send message in
     async def msg_admin_channel(self, msg: str, guild: discord.Guild) -> None:
-        if (not self.bot.CONFIG["admin"]["log_channel"]):
+        log_channel = self.bot.CONFIG.admin.log_channel
+
+        if (not log_channel):
             return
 
         try:
             if (not guild):
                 return
             
-            channel = discord.utils.find(lambda c: (c.name == self.bot.CONFIG["admin"]["log_channel"]), guild.channels)
+            channel = discord.utils.find(lambda c: (c.name == log_channel), guild.channels)
             
             if (not channel):
                 return
@@ -61,24 +73,17 @@ class Messaging:
             await self.error_alert(e)
             
     # alerts the developer if an error occurs
+    # the same error from the same place is only logged and counted until the next digest is sent
     # input: e, the error to output
-    #        uid, the user's unique id
     #        extra, any extra information to include
-    async def error_alert(self, e: Exception, extra: str = "") -> None:              
-        function_name = inspect.stack()[1][3]
-            
-        caller_func = function_name or "NULL_FUNC"
-        if (caller_func == "<module>"):
-            caller_func = "main"
-            
+    async def error_alert(self, e: Union[Exception, str], extra: str = "") -> None:
+        caller = alerts.find_caller()
+        alert = self.alert_digest.add(caller, e, extra)
+
         if (extra):
             extra = f" ({extra})"
-    
-        err = "{func}{extra}:\n```{error}```".format(func=caller_func,
-                                                        error=str(e),
-                                                        extra=extra)
-        print(err)
-        await self.message_developer(err)
+
+        self.bot.bot_utils.log_alert(f"{caller[0]}{extra}: {e}", prefix=f"Alert {alert.fingerprint}")
             
     # add reaction to message if any keyword is in message
     # input: message, message to react to
@@ -158,4 +163,54 @@ class Messaging:
         except discord.errors.NotFound:
             pass
         except Exception as e:
-            await self.error_alert(e)
\ No newline at end of file
+            await self.error_alert(e)
+
+    # registers a function to be called when a message is reacted to or a reaction is removed from it
+    # input: message_id, id of the message
+    #        handler, coroutine function that takes the raw reaction event, check its event_type for REACTION_ADD or REACTION_REMOVE
+    def register_reaction_handler(self, message_id: int, handler: ReactionHandler) -> None:
+        self.reaction_handlers[message_id] = handler
+
+    # stops a message's reactions from being handled
+    # input: message_id, id of the message
+    def unregister_reaction_handler(self, message_id: int) -> None:
+        self.reaction_handlers.pop(message_id, None)
+
+    # calls the handler of the message that was reacted to, called from the raw reaction events in cbot.py
+    # raw events are used so messages that aren't in the client's message cache still work
+    # input: payload, the raw reaction event
+    async def dispatch_reaction(self, payload: discord.RawReactionActionEvent) -> None:
+        handler = self.reaction_handlers.get(payload.message_id)
+
+        if (handler is None):
+            return
+
+        # ignore our own reactions
+        if (payload.user_id == self.bot.user.id):
+            return
+
+        await handler(payload)
+
+    # waits for a user to react to a message with an emoji
+    # input: message, message to wait for reactions on
+    #        user, user who has to react
+    #        emoji, emoji to wait for
+    #        timeout, seconds to wait
+    # output: True if the user reacted, False if the time ran out
+    async def wait_for_reaction(self, message: discord.Message, user: discord.abc.User, emoji: str, timeout: Optional[float] = None) -> bool:
+        future = self.bot.loop.create_future()
+
+        async def handler(payload: discord.RawReactionActionEvent) -> None:
+            if (payload.event_type == "REACTION_ADD" and payload.user_id == user.id and str(payload.emoji) == emoji and not future.done()):
+                future.set_result(True)
+
+        self.register_reaction_handler(message.id, handler)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+
+        except asyncio.TimeoutError:
+            return False
+
+        finally:
+            self.unregister_reaction_handler(message.id)
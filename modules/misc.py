@@ -1,4 +1,3 @@
-import aiohttp
 from lxml import html
 
 class Misc:
@@ -9,28 +8,26 @@ class Misc:
     # output: string; the insult if found or "fucker"
     async def get_insult(self) -> str:
         try:
-            conn = aiohttp.TCPConnector(verify_ssl=False) # for https
-            async with aiohttp.ClientSession(connector=conn) as session:
-                async with session.get("https://www.insult-generator.org/") as r:
-                    if (r.status != 200):
-                        return "fucker"
-                    
-                    tree = html.fromstring(await r.text())
-                    p = tree.xpath("//div[@class='insult-text']/text()")
-                    
-                    if (isinstance(p, list)):
-                        ret = p[0]
-                    elif (isinstance(p, str)):
-                        ret = p
-                    else:
-                        return "fucker"
-                    
-                    ret = ret.strip()
-                        
-                    if (not ret):
-                        return "fucker"
+            async with self.bot.session.get("https://www.insult-generator.org/", ssl=False) as r: # ssl=False for https
+                if (r.status != 200):
+                    return "fucker"
                 
-                    return ret
+                tree = html.fromstring(await r.text())
+                p = tree.xpath("//div[@class='insult-text']/text()")
+                
+                if (isinstance(p, list)):
+                    ret = p[0]
+                elif (isinstance(p, str)):
+                    ret = p
+                else:
+                    return "fucker"
+                
+                ret = ret.strip()
+                    
+                if (not ret):
+                    return "fucker"
+            
+                return ret
         
         except Exception:
             return "fucker"
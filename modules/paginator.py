@@ -17,6 +17,8 @@ class Paginator:
 
         self.message = None # embed message
 
+        self.expiry = None # scheduled call that stops the paginator once it's inactive
+
         # kwargs
         self.expiry_time = kwargs.get("expiry_time", 120) # time until the embed expires
         self.paging_cooldown = kwargs.get("paging_cooldown", 1) # 1 second cooldown in between paging
@@ -58,6 +60,8 @@ class Paginator:
         
         if (not self.message):
             self.message = await self.ctx.send(embed=embed)
+
+            self.bot.messaging.register_reaction_handler(self.message.id, self.reaction_hook)
             
             await self.bot.messaging.add_img_reactions(self.message)
 
@@ -69,10 +73,25 @@ class Paginator:
 
         self.last_updated = time.time()
 
+        # restart the inactivity timer
+        if (self.expiry):
+            self.expiry.cancel()
+
+        self.expiry = self.bot.scheduler.schedule(self.expiry_time, self.expire)
+
+    # stops the paginator from being used anymore
+    async def expire(self):
+        try:
+            await self.clear_reactions()
+        except discord.DiscordException:
+            pass
+
     # call when the embed has passed its expiry time
     async def clear_reactions(self):
         if (not self.message):
             return
+
+        self.bot.messaging.unregister_reaction_handler(self.message.id)
         
         await self.message.clear_reactions()
 
@@ -85,35 +104,35 @@ class Paginator:
             await self.ctx.message.delete()
         except discord.errors.Forbidden:
             pass
+
+        self.bot.messaging.unregister_reaction_handler(self.message.id)
+
+        if (self.expiry):
+            self.expiry.cancel()
         
         await self.message.delete()
 
         self.message = None
 
-    # call in on_reaction_add to update the paginator on reactions
-    async def reaction_hook(self, reaction: discord.Reaction, user: discord.User):
+    # registered with the reaction dispatcher to update the paginator on reactions
+    async def reaction_hook(self, payload: discord.RawReactionActionEvent):
         if (not self.message):
             return
-        
-        message = reaction.message
-
-        if (user == self.bot.user):
-            return
 
-        if (message.id != self.message.id):
+        if (payload.event_type != "REACTION_ADD"):
             return
 
-        if (self.ctx.author != user):
+        if (self.ctx.author.id != payload.user_id):
             return
 
-        emoji = reaction.emoji
+        message = self.message
+        emoji = str(payload.emoji)
 
-        if (message.reactions and reaction in message.reactions):
-            if (not isinstance(message.channel, discord.abc.PrivateChannel) and message.channel.permissions_for(message.guild.me).manage_emojis):
-                try:
-                    await message.remove_reaction(emoji, user) # remove the reaction so the user can react again
-                except discord.DiscordException:
-                    pass
+        if (not isinstance(message.channel, discord.abc.PrivateChannel) and message.channel.permissions_for(message.guild.me).manage_messages):
+            try:
+                await message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id)) # remove the reaction so the user can react again
+            except discord.DiscordException:
+                pass
 
         if (not self.can_be_updated()):
             return
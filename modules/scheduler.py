@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, List, Optional
+
+# this file is for running things at a certain time, e.g. expiring image searches, closing votes, unmuting users
+# instead of every cog polling its state every few seconds, cogs schedule each deadline here
+# deadlines are kept in a heap and only the earliest one has a timer on the event loop, so nothing runs while idle
+
+class ScheduledCall:
+    __slots__ = ["when", "callback", "args", "cancelled", "_scheduler"]
+
+    def __init__(self, scheduler: "Scheduler", when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+        self._scheduler = scheduler
+
+    # stops the call from running, it's removed from the heap later
+    def cancel(self) -> None:
+        if (self.cancelled):
+            return
+
+        self.cancelled = True
+        self._scheduler._on_cancel()
+
+    # seconds until the call runs
+    def remaining(self) -> float:
+        return max(self.when - time.monotonic(), 0)
+
+class Scheduler:
+    def __init__(self, bot):
+        self.bot = bot
+
+        # heap of (when, order added, call)
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._num_cancelled = 0
+
+        # timer for the earliest call in the heap
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_when: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._num_cancelled
+
+    # schedules a function to be called after a delay
+    # input: delay, seconds to wait
+    #        callback, function or coroutine function to call
+    #        args, arguments to call it with
+    # output: the scheduled call, which can be cancelled
+    def schedule(self, delay: float, callback: Callable, *args) -> ScheduledCall:
+        return self.schedule_at(time.monotonic() + max(delay, 0), callback, *args)
+
+    # schedules a function to be called at a time
+    # input: when, time.monotonic() time to call it at
+    #        callback, function or coroutine function to call
+    #        args, arguments to call it with
+    # output: the scheduled call, which can be cancelled
+    def schedule_at(self, when: float, callback: Callable, *args) -> ScheduledCall:
+        call = ScheduledCall(self, when, callback, args)
+
+        heapq.heappush(self._heap, (when, next(self._counter), call))
+
+        if (self._timer_when is None or when < self._timer_when):
+            self._set_timer(when)
+
+        return call
+
+    def _on_cancel(self) -> None:
+        self._num_cancelled += 1
+
+        # rebuild the heap if it's mostly cancelled calls
+        if (self._num_cancelled > 64 and self._num_cancelled > len(self._heap) // 2):
+            self._heap = [entry for entry in self._heap if (not entry[2].cancelled)]
+            heapq.heapify(self._heap)
+            self._num_cancelled = 0
+
+    def _set_timer(self, when: float) -> None:
+        if (self._timer is not None):
+            self._timer.cancel()
+
+        # the loop's clock is monotonic too, but it isn't guaranteed to be the same clock
+        delay = max(when - time.monotonic(), 0)
+
+        self._timer = self.bot.loop.call_later(delay, self._run_due)
+        self._timer_when = when
+
+    def _run_due(self) -> None:
+        self._timer = None
+        self._timer_when = None
+
+        now = time.monotonic()
+
+        while (self._heap and self._heap[0][0] <= now):
+            _when, _order, call = heapq.heappop(self._heap)
+
+            if (call.cancelled):
+                self._num_cancelled -= 1
+                continue
+
+            self._call(call)
+
+        # throw away cancelled calls at the front so we don't wake up for them
+        while (self._heap and self._heap[0][2].cancelled):
+            heapq.heappop(self._heap)
+            self._num_cancelled -= 1
+
+        if (self._heap):
+            self._set_timer(self._heap[0][0])
+
+    def _call(self, call: ScheduledCall) -> None:
+        # mark it so cancelling it from inside the callback does nothing
+        call.cancelled = True
+
+        try:
+            result = call.callback(*call.args)
+
+            if (asyncio.iscoroutine(result)):
+                task = self.bot.loop.create_task(result)
+                task.add_done_callback(self._on_task_done)
+
+        except Exception as e:
+            self.bot.bot_utils.log_error_to_file(e, prefix="Scheduler")
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        if (task.cancelled()):
+            return
+
+        e = task.exception()
+
+        if (e is not None):
+            self.bot.bot_utils.log_error_to_file(e, prefix="Scheduler")
+
+    # cancels everything
+    def clear(self) -> None:
+        for _when, _order, call in self._heap:
+            call.cancelled = True
+
+        self._heap.clear()
+        self._num_cancelled = 0
+
+        if (self._timer is not None):
+            self._timer.cancel()
+
+        self._timer = None
+        self._timer_when = None
@@ -0,0 +1,104 @@
+from modules import cache, analytics
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+from googletrans import Translator
+from typing import Dict, List, Optional, Callable, Hashable, Any
+
+# this file is for translating text without blocking the event loop
+# googletrans makes blocking http requests, so every call is run in a small pool of threads
+
+Translation = namedtuple("Translation", ["text", "src", "dest"])
+
+class TranslationService:
+    # input: loop, the bot's event loop
+    #        max_workers, max number of translations running at once
+    #        cache_size, number of translations to remember
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_workers: int, cache_size: int):
+        self.loop = loop
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translation")
+
+        # each thread gets its own translator since they aren't safe to share between threads
+        self._local = threading.local()
+
+        self.cache = cache.LRUCache(cache_size)
+
+        # requests that are running right now, identical requests wait for the same result instead of making another one
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+
+    def _get_translator(self) -> Translator:
+        translator = getattr(self._local, "translator", None)
+
+        if (translator is None):
+            translator = Translator()
+            self._local.translator = translator
+
+        return translator
+
+    def _translate_sync(self, text: str, dest: str, src: str) -> Translation:
+        result = self._get_translator().translate(text, dest=dest, src=src)
+
+        return Translation(result.text, result.src, result.dest)
+
+    def _detect_sync(self, text: str) -> str:
+        return self._get_translator().detect(text).lang
+
+    # runs a blocking function in the pool, sharing the result with identical requests and caching it
+    # input: key, what identifies the request
+    #        func, the blocking function
+    #        args, arguments to call it with
+    # output: the result of the function
+    async def _run(self, key: Hashable, func: Callable, *args) -> Any:
+        result = self.cache.get(key)
+
+        if (result is not None):
+            return result
+
+        future = self._pending.get(key)
+
+        if (future is None):
+            future = self.loop.run_in_executor(self.executor, func, *args)
+            self._pending[key] = future
+
+            future.add_done_callback(lambda f: self._on_done(key, f))
+
+        # shield it so a cancelled command doesn't cancel the request for everyone else waiting on it
+        with analytics.track_external():
+            return await asyncio.shield(future)
+
+    # caches the result of a finished request
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+
+        if (not future.cancelled() and future.exception() is None):
+            self.cache.set(key, future.result())
+
+    # translates text
+    # input: text, the text to translate
+    #        dest, language code to translate to
+    #        src, language code to translate from, or "auto" to detect it
+    # output: the translation
+    async def translate(self, text: str, dest: str = "en", src: str = "auto") -> Translation:
+        return await self._run(("translate", text, dest, src), self._translate_sync, text, dest, src)
+
+    # translates text into multiple languages at once
+    # input: text, the text to translate
+    #        dests, language codes to translate to
+    #        src, language code to translate from, or "auto" to detect it
+    # output: dict of language code to translation, languages that failed are left out
+    async def translate_many(self, text: str, dests: List[str], src: str = "auto") -> Dict[str, Translation]:
+        results = await asyncio.gather(*[self.translate(text, dest=dest, src=src) for dest in dests], return_exceptions=True)
+
+        return {dest: result for dest, result in zip(dests, results) if (isinstance(result, Translation) and result.text)}
+
+    # detects the language of text
+    # input: text, the text to check
+    # output: language code of the text
+    async def detect(self, text: str) -> Optional[str]:
+        return await self._run(("detect", text), self._detect_sync, text)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
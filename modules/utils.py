@@ -5,7 +5,7 @@ import datetime
 import time
 import re
 from youtube_dl import utils as ytutils
-from typing import Optional, Union
+from typing import Optional, Union, List
 
 # this file is for utility functions that do NOT require access to discord,
 # e.g. general utility functions
@@ -57,8 +57,14 @@ def find_attachment(message: discord.Message) -> Optional[str]:
 # input: message, message to search for image embeds
 # output: url of the embed or None if not found
 def find_image_embed(message: discord.Message) -> Optional[str]:
-    if (message.embeds):
-        for embed in message.embeds:
+    return find_image_in_embeds(message.embeds)
+
+# find the first image in a list of embeds
+# input: embeds, embeds to search
+# output: url of the image or None if not found
+def find_image_in_embeds(embeds: List[discord.Embed]) -> Optional[str]:
+    if (embeds):
+        for embed in embeds:
             if (embed):
                 if (embed.type == "image"):
                     return embed.url
@@ -67,6 +73,20 @@ def find_image_embed(message: discord.Message) -> Optional[str]:
                     
     return None
 
+# find the first youtube video in a list of embeds
+# input: embeds, embeds to search
+# output: url of the video or None if not found
+def find_youtube_in_embeds(embeds: List[discord.Embed]) -> Optional[str]:
+    if (embeds):
+        for embed in embeds:
+            if (embed.type == "video" or embed.video):
+                if (embed.provider.name == "YouTube"):
+                    return embed.url
+            elif (embed.url and youtube_url_validation(embed.url)):
+                return embed.url
+
+    return None
+
 # format member name as user#discriminator
 # input: user, the user to format
 # output: formatted string in the form username#discriminator (ex. CBot#8071)
@@ -0,0 +1,137 @@
+import asyncio
+import concurrent.futures
+import importlib
+import multiprocessing
+import os
+import resource
+import signal
+import psutil
+from typing import Callable, Iterable, Any, Tuple
+
+# this file is for running cpu heavy work in a pool of worker processes
+# so it doesn't block the event loop (and the gateway heartbeat)
+# the workers are started by a forkserver instead of forking the bot, the bot has threads running
+# and forking it could copy a lock one of them was holding into a worker, which would then hang forever
+
+class WorkerPoolError(Exception):
+    pass
+
+class PoolBusy(WorkerPoolError):
+    pass
+
+class JobTimeout(WorkerPoolError):
+    pass
+
+# runs once in every worker process when it starts
+# input: memory_limit, max bytes of address space the worker can use on top of what it uses after starting, 0 for no limit
+#        preload, names of modules to import so the first job doesn't pay for it
+#        pids, queue to tell the pool the worker's pid so it can kill it
+def _init_worker(memory_limit: int, preload: Iterable[str], pids) -> None:
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+    if (memory_limit > 0):
+        # the interpreter and preloaded modules already use some, only limit what jobs use
+        limit = psutil.Process().memory_info().vms + memory_limit
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    pids.put(os.getpid())
+
+def _warm_up() -> int:
+    return os.getpid()
+
+class WorkerPool:
+    def __init__(self, loop: asyncio.AbstractEventLoop, *args, **kwargs):
+        self.loop = loop
+
+        self.max_workers = kwargs.get("max_workers", 2)
+        self.max_queued = kwargs.get("max_queued", 8) # jobs that can wait for a free worker before new ones are rejected
+        self.job_timeout = kwargs.get("job_timeout", 30) # seconds before a job is killed
+        self.memory_limit = kwargs.get("memory_limit", 0) # extra bytes per worker, 0 for no limit
+        self.preload = tuple(kwargs.get("preload", ()))
+
+        # jobs waiting or running, anything past this is rejected
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queued)
+
+        # jobs running, so a job's timeout starts when it gets a worker and not when it's queued
+        self._running = asyncio.Semaphore(self.max_workers)
+
+        if ("forkserver" in multiprocessing.get_all_start_methods()):
+            self._context = multiprocessing.get_context("forkserver")
+
+            # workers are forked from the server, so import everything there once instead of in every worker
+            # __main__ is cbot.py, new processes always import it, it doesn't start the bot unless it's run directly
+            self._context.set_forkserver_preload(["__main__", *self.preload])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+
+        self._executor, self._pids = self._create_executor()
+
+    # output: the executor, and the queue its workers put their pids in
+    def _create_executor(self) -> Tuple[concurrent.futures.ProcessPoolExecutor, Any]:
+        pids = self._context.SimpleQueue()
+
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                          mp_context=self._context,
+                                                          initializer=_init_worker,
+                                                          initargs=(self.memory_limit, self.preload, pids))
+
+        # start the workers now so they're warm when the first job comes in
+        for _i in range(self.max_workers):
+            executor.submit(_warm_up)
+
+        return executor, pids
+
+    # kills an executor's workers, the executor can't be used afterwards
+    # input: executor, the executor
+    #        pids, the queue its workers put their pids in
+    @staticmethod
+    def _terminate(executor: concurrent.futures.ProcessPoolExecutor, pids) -> None:
+        # the executor has no public way to stop a running job, so kill the workers directly
+        while (not pids.empty()):
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+        executor.shutdown(wait=False)
+        pids.close()
+
+    # kills the workers and replaces them with new ones
+    # any other jobs running at the time will fail
+    # input: executor, the executor to replace, nothing is done if it was already replaced
+    def _restart(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        if (executor is not self._executor):
+            return
+
+        self._terminate(self._executor, self._pids)
+        self._executor, self._pids = self._create_executor()
+
+    # runs a function in a worker process
+    # input: func, the function to run, must be defined at the top level of a module so it can be pickled
+    #        args, arguments to pass to the function
+    # output: what the function returned
+    # raises: PoolBusy if the queue is full, JobTimeout if the job took too long,
+    #         WorkerPoolError if the worker died
+    async def run(self, func: Callable, *args) -> Any:
+        if (self._slots.locked()):
+            raise PoolBusy("Too many jobs queued")
+
+        async with self._slots, self._running:
+            executor = self._executor
+
+            try:
+                future = executor.submit(func, *args)
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.job_timeout)
+            except asyncio.TimeoutError:
+                self._restart(executor)
+                raise JobTimeout(f"Job took longer than {self.job_timeout} seconds")
+            except concurrent.futures.process.BrokenProcessPool as e:
+                self._restart(executor)
+                raise WorkerPoolError(f"Worker process died: {e}")
+
+    def shutdown(self) -> None:
+        self._terminate(self._executor, self._pids)
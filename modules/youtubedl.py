@@ -0,0 +1,164 @@
+from modules import cache, analytics
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from youtube_dl import YoutubeDL
+from typing import Optional
+
+# this file is for running youtube-dl without blocking the event loop
+# extraction makes blocking http requests, so it's run in its own pool of threads instead of the default executor
+# results are cached, so popular videos don't have to be extracted again
+
+class YoutubeDLService:
+    # input: loop, the bot's event loop
+    #        options, options to create YoutubeDL objects with
+    #        max_workers, max number of extractions running at once
+    #        cache_size, number of searches and videos to remember
+    #        search_ttl, seconds to remember which video a search found
+    #        info_ttl, seconds to remember a video's info, should be shorter than how long stream links last
+    def __init__(self, loop: asyncio.AbstractEventLoop, options: dict, max_workers: int, cache_size: int, search_ttl: float, info_ttl: float):
+        self.loop = loop
+        self.options = options
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="youtube-dl")
+
+        # YoutubeDL objects keep state while extracting, so each thread gets its own
+        self._local = threading.local()
+
+        # search query -> video url
+        self.search_cache = cache.LRUCache(cache_size, ttl=search_ttl)
+
+        # (url, processed) -> info dict
+        self.info_cache = cache.LRUCache(cache_size, ttl=info_ttl)
+
+        self.metrics = {
+            "extractions": 0,
+            "errors": 0,
+            "running": 0,
+            "queued": 0,
+            "search_cache_hits": 0,
+            "info_cache_hits": 0,
+            "total_wait_time": 0.0,
+            "total_extract_time": 0.0,
+            "max_extract_time": 0.0,
+        }
+
+        self._metrics_lock = threading.Lock()
+
+    def _get_ytdl(self) -> YoutubeDL:
+        ytdl = getattr(self._local, "ytdl", None)
+
+        if (ytdl is None):
+            ytdl = YoutubeDL(self.options)
+            self._local.ytdl = ytdl
+
+        return ytdl
+
+    # updates metrics, they're changed from both the worker threads and the event loop
+    def _update_metrics(self, **changes) -> None:
+        with self._metrics_lock:
+            for name, change in changes.items():
+                self.metrics[name] += change
+
+    # runs in a worker thread
+    def _extract_sync(self, url: str, process: bool, queued_at: float) -> dict:
+        started_at = time.monotonic()
+
+        self._update_metrics(queued=-1, running=1, total_wait_time=(started_at - queued_at))
+
+        try:
+            return self._get_ytdl().extract_info(url, download=False, process=process)
+
+        finally:
+            elapsed = time.monotonic() - started_at
+
+            self._update_metrics(running=-1, total_extract_time=elapsed)
+
+            with self._metrics_lock:
+                self.metrics["max_extract_time"] = max(self.metrics["max_extract_time"], elapsed)
+
+    # extracts a video's info
+    # input: url, url or search to extract
+    #        process, should the info be fully processed (resolves stream urls, playlists, etc)
+    #        use_cache, can a cached result be used, the new result is cached either way
+    # output: the info dict
+    async def extract_info(self, url: str, process: bool = True, use_cache: bool = True) -> dict:
+        key = (url, process)
+        info = self.info_cache.get(key) if (use_cache) else None
+
+        if (info is not None):
+            self._update_metrics(info_cache_hits=1)
+            return info
+
+        self._update_metrics(extractions=1, queued=1)
+
+        try:
+            with analytics.track_external():
+                info = await self.loop.run_in_executor(self.executor, self._extract_sync, url, process, time.monotonic())
+
+        except Exception:
+            self._update_metrics(errors=1)
+            raise
+
+        self.info_cache.set(key, info)
+
+        # also remember each video by its url, so regathering the stream later doesn't extract it again
+        entries = info.get("entries")
+        videos = [info] + (entries if (isinstance(entries, list)) else [])
+
+        for video in videos:
+            webpage_url = video.get("webpage_url") if (isinstance(video, dict)) else None
+
+            if (webpage_url and webpage_url != url):
+                self.info_cache.set((webpage_url, process), video)
+
+        return info
+
+    # finds the first youtube video for a search
+    # input: query, what to search for
+    # output: url of the video or None if nothing was found
+    async def search(self, query: str) -> Optional[str]:
+        url = self.search_cache.get(query)
+
+        if (url is not None):
+            self._update_metrics(search_cache_hits=1)
+            return url
+
+        search_query = query
+
+        if (not search_query.startswith("ytsearch:")):
+            search_query = f"ytsearch:{query}"
+
+        info = await self.extract_info(search_query, process=False)
+
+        try:
+            video_id = info.get("entries")[0].get("url")
+
+        except (IndexError, KeyError, TypeError):
+            return None
+
+        if (not video_id):
+            return None
+
+        url = f"https://youtube.com/watch?v={video_id}"
+
+        self.search_cache.set(query, url)
+
+        return url
+
+    # output: the metrics with averages added
+    def get_metrics(self) -> dict:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+
+        finished = max(metrics["extractions"] - metrics["running"] - metrics["queued"], 1)
+
+        metrics["average_wait_time"] = metrics["total_wait_time"] / finished
+        metrics["average_extract_time"] = metrics["total_extract_time"] / finished
+
+        return metrics
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)